@@ -0,0 +1,150 @@
+"""
+Arm trajectory streaming: JointTrajectory chunks instead of one
+JointTrajectoryPoint per control frame.
+
+The handler's per-frame arm commands are collected by TrajectoryStreamer;
+tick() (once per control cycle) publishes a trajectory_msgs/JointTrajectory
+whose points run from the current command to `horizon` seconds ahead,
+every `point_period` seconds, with positions, velocities and
+time_from_start. The future points come from IKSolver.predict(): the joint
+blend toward the IK goal is deterministic, so the chunk is the motion the
+arm will make if the input stays as it is. A goal that moved by the same
+step in the last two cycles (a held jog key, servo) keeps moving in the
+prediction; one that jumped (reset) or stopped stays put.
+
+A chunk is published every 1 / `rate` seconds, and early when the
+commands leave the published plan by more than `tolerance` degrees (new
+input), so the lower message rate does not add latency. Timing uses the
+control period, so a replayed input log gives the same chunks.
+"""
+import math
+
+
+class TrajectoryStreamer:
+    def __init__(self, ik, publish, dt, rate=10.0, horizon=0.3, point_period=0.05, tolerance_deg=0.5):
+        """
+        ik: IKSolver whose update() output the handler publishes
+        publish: callable(points) with the JointTrajectory points (dicts)
+        dt: control period (s)
+        rate: chunks per second while the arm follows the published plan
+        horizon: lookahead of each chunk (s)
+        point_period: time between trajectory points (s), rounded to control periods
+        tolerance_deg: republish early when the command leaves the plan by more
+        """
+        self.ik = ik
+        self.publish = publish
+        self.dt = dt
+        self.publish_steps = max(1, int(round(1.0 / (rate * dt)))) if rate > 0 else 1
+        self.point_steps = max(1, int(round(point_period / dt)))
+        # whole points, at least one step beyond the current command
+        self.horizon_steps = max(self.point_steps,
+                                 int(round(horizon / (self.point_steps * dt))) * self.point_steps)
+        self.tolerance = math.radians(tolerance_deg)
+        self.latest = None
+        self.fresh = False      # a command arrived since the last tick
+        self.plan = None        # expected commands for the control steps after the last chunk
+        self.goals = None       # IK goals of the previous cycle
+        self.goal_step = None   # their change in the previous cycle
+        self.goal_rate = None   # goal change per cycle assumed by the prediction
+        self.since_publish = 0
+        self.chunks = 0
+
+    def __call__(self, arm_msg):
+        self.latest = list(arm_msg["positions"])
+        self.fresh = True
+
+    def tick(self):
+        """Advance one control period; publish a chunk when one is due."""
+        if not self.fresh:
+            # no arm command this cycle (e.g. teleop disabled)
+            return
+        self.fresh = False
+        self._track_goals()
+        self.since_publish += 1
+        if self.plan is not None and self.since_publish < self.publish_steps:
+            # past the horizon the robot holds the last point
+            expected = self.plan[min(self.since_publish, len(self.plan)) - 1]
+            if max(abs(a - b) for a, b in zip(self.latest, expected)) <= self.tolerance:
+                return
+        points, self.plan = self.chunk()
+        self.since_publish = 0
+        self.chunks += 1
+        self.publish(points)
+
+    def _track_goals(self):
+        goals = self.ik.goals
+        step = None
+        if goals is not None and self.goals is not None:
+            step = [a - b for a, b in zip(goals, self.goals)]
+        self.goal_rate = None
+        if step is not None and self.goal_step is not None and any(step):
+            # steady motion: this cycle's change within half of the last one
+            largest = max(abs(d) for d in self.goal_step)
+            if max(abs(a - b) for a, b in zip(step, self.goal_step)) <= 0.5 * largest:
+                self.goal_rate = step
+        self.goals = list(goals) if goals is not None else None
+        self.goal_step = step
+
+    def chunk(self):
+        """
+        (points, plan) from the latest command: points are JointTrajectory
+        points, plan the predicted command of every following control step.
+        """
+        current = self.latest
+        n = len(current)
+        raw = list(self.ik.prev_joint_angles)
+        # the handler's command differs from the IK angles only by fixed offsets
+        offsets = [c - r for c, r in zip(current, raw)]
+        plan = [[angles[j] + offsets[j] for j in range(n)]
+                for angles in self.ik.predict(self.horizon_steps, self.goal_rate)]
+        dense = [current] + plan
+        dt = self.dt
+        points = []
+        for k in range(0, self.horizon_steps + 1, self.point_steps):
+            before, after = dense[max(0, k - 1)], dense[min(self.horizon_steps, k + 1)]
+            span = (min(self.horizon_steps, k + 1) - max(0, k - 1)) * dt
+            t = k * dt
+            sec = int(t)
+            # micro-radian precision keeps the JSON numbers short;
+            # rosbridge fills the omitted accelerations / effort
+            points.append({
+                "positions": [round(float(a), 6) for a in dense[k]],
+                "velocities": [round(float(a - b) / span, 6) for a, b in zip(after, before)],
+                "time_from_start": {"sec": sec, "nanosec": int(round((t - sec) * 1e9))},
+            })
+        return points, plan
+
+
+def trajectory_template(joint_names):
+    """trajectory_msgs/JointTrajectory without points; start now (zero stamp)."""
+    return {
+        "header": {"stamp": {"sec": 0, "nanosec": 0}, "frame_id": ""},
+        "joint_names": list(joint_names),
+        "points": None,
+    }
+
+
+def trajectory_settings(config):
+    """
+    TrajectoryStreamer keyword arguments from the global config
+    (arm_trajectory_rate, arm_trajectory_horizon, arm_trajectory_point_period,
+    arm_trajectory_tolerance), or None unless arm_command_mode is trajectory.
+    """
+    mode = (config.get("arm_command_mode") or "point").strip().lower()
+    if mode != "trajectory":
+        if mode != "point":
+            print(f"Unknown arm_command_mode '{mode}' in config, using point.")
+        return None
+
+    def number(name, default):
+        try:
+            return float(config.get(name) or default)
+        except ValueError:
+            print(f"Invalid {name} '{config.get(name)}' in config, using {default}.")
+            return default
+    return {
+        "rate": number("arm_trajectory_rate", 10.0),
+        "horizon": number("arm_trajectory_horizon", 0.3),
+        "point_period": number("arm_trajectory_point_period", 0.05),
+        "tolerance_deg": number("arm_trajectory_tolerance", 0.5),
+    }
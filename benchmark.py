@@ -0,0 +1,46 @@
+"""
+Performance benchmarks for the teleop control path.
+
+Usage:
+    python benchmark.py startup [--physics-backend direct] [--ik-backend numpy] [--repeat 5]
+    python benchmark.py ik [--ik-backend numpy] [--frames 300]
+    python benchmark.py multiarm [--ik-backend numpy] [--points 2000]
+    python benchmark.py ikcache [--ik-backend numpy] [--visits 400] [--resolution 0.005]
+    python benchmark.py servo [--ik-backend numpy] [--rate 100] [--speed 0.1]
+    python benchmark.py batch [--points 2000]
+    python benchmark.py workspace [--targets 500] [--grid workspace_grid]
+    python benchmark.py loop [--rate 200] [--seconds 5] [--ui-work-ms 15]
+    python benchmark.py publish [--messages 2000] [--delay-ms 5]
+    python benchmark.py traffic [--rate 100] [--seconds 5]
+    python benchmark.py encoding [--iterations 20000]
+    python benchmark.py templates [--rate 1000] [--seconds 2]
+    python benchmark.py ui [--frames 600]
+    python benchmark.py profile [--calls 200000]
+    python benchmark.py mixing [--cycles 20000] [--controllers 3]
+    python benchmark.py buttons [--rate 100] [--press-interval 0.1]
+    python benchmark.py smoothing [--slew-rate 20] [--jerk 100] [--publish-rates 50 20 10]
+    python benchmark.py trajectory [--rate 100] [--chunk-rate 10] [--horizon 0.3]
+    python benchmark.py planner [--rates 30 100 200]
+    python benchmark.py collision [--batch 16] [--targets 500]
+    python benchmark.py model [--repeat 20]
+    python benchmark.py e2e [--rate 100] [--seconds 10] [--script input.csv]
+
+The benchmarks live in the benchmarks package by area: arm.py (IK,
+kinematics, model), control.py (control loop, input, UI) and network.py
+(rosbridge traffic). Correctness checks are in tests/ (python -m pytest).
+"""
+import argparse
+from benchmarks import arm, control, network
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teleop performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for area in (arm, control, network):
+        area.add_parsers(sub)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks run by benchmark.py, by area, and their support code."""
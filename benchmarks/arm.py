@@ -0,0 +1,536 @@
+"""
+IK, kinematics and robot model benchmarks: startup, per-frame IK, servo
+mode, the IK cache, the multi-arm service, batched kinematics, the
+workspace grid, pose move planning, self-collision and the model cache.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import BENCHMARK_SCRIPT, NoKeys, INITIAL_POSE, JOINT_OFFSET
+
+
+def startup_child(physics_backend, ik_backend):
+    """
+    Cold start inside a fresh interpreter: import, build the IK solver and
+    run one control frame until the first arm command is published.
+    Prints the elapsed seconds on stdout.
+    """
+    start = time.perf_counter()
+    from joystick_handler import JoystickHandler
+    from iksolver import IKSolver
+
+    published = []
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6,
+                  physics_backend=physics_backend, ik_backend=ik_backend)
+    handler = JoystickHandler()
+    handler.process_keypress_continuous(
+        NoKeys(),
+        wheel_publish_callback=lambda cmd: None,
+        arm_publish_callback=published.append,
+        ik=ik,
+        joint_offset_degree=JOINT_OFFSET,
+        initial_pose=INITIAL_POSE
+    )
+    elapsed = time.perf_counter() - start
+    assert published, "no arm command published"
+    print(f"{elapsed:.6f}")
+
+
+def bench_startup(args):
+    child_times = []
+    wall_times = []
+    for _ in range(args.repeat):
+        wall_start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, BENCHMARK_SCRIPT, "_startup_child",
+             "--physics-backend", args.physics_backend, "--ik-backend", args.ik_backend],
+            capture_output=True, text=True, check=True
+        )
+        wall_times.append(time.perf_counter() - wall_start)
+        child_times.append(float(out.stdout.strip().splitlines()[-1]))
+
+    print(f"startup ({args.physics_backend} physics, {args.ik_backend} IK, {args.repeat} runs)")
+    print(f"  import -> first arm command: mean {statistics.mean(child_times) * 1000:.1f} ms, "
+          f"min {min(child_times) * 1000:.1f} ms, max {max(child_times) * 1000:.1f} ms")
+    print(f"  process wall time:           mean {statistics.mean(wall_times) * 1000:.1f} ms")
+
+
+def bench_ik(args):
+    """Per-frame cost of IKSolver.solve + update while jogging the arm."""
+    from iksolver import IKSolver
+
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend=args.ik_backend)
+    step = 0.01
+    times = []
+    for frame in range(args.frames):
+        # jog back and forth along x, then y, every 20 frames
+        direction = 1 if (frame // 20) % 2 == 0 else -1
+        axis = (frame // 40) % 2
+        delta = [0.0, 0.0, 0.0]
+        delta[axis] = step * direction
+        start = time.perf_counter()
+        ik.solve(*delta)
+        ik.update()
+        times.append(time.perf_counter() - start)
+
+    times.sort()
+    print(f"ik ({args.ik_backend}, {args.frames} frames)")
+    print(f"  solve + update: mean {statistics.mean(times) * 1e6:.0f} us, "
+          f"p50 {times[len(times) // 2] * 1e6:.0f} us, p99 {times[int(len(times) * 0.99)] * 1e6:.0f} us")
+
+
+def bench_servo(args):
+    """
+    Arm jogging at a constant end-effector speed: servo mode (one
+    incremental IK step per frame) against a full IK solve per frame
+    (keyboard jogging). Reports per-frame cost, achieved speed and how far
+    the end effector strays from the commanded straight line.
+    """
+    import numpy as np
+    from iksolver import IKSolver
+
+    dt = 1.0 / args.rate
+    frames = int(args.seconds * args.rate)
+    # out and back along each axis
+    legs = [(args.speed, 0, 0), (-args.speed, 0, 0), (0, args.speed, 0),
+            (0, -args.speed, 0), (0, 0, -args.speed), (0, 0, args.speed)]
+    print(f"servo ({args.ik_backend}, {args.rate:.0f} Hz, {args.speed} m/s, "
+          f"{len(legs)} legs of {args.seconds} s)")
+    for mode in ("solve", "servo"):
+        ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend=args.ik_backend,
+                      blend_factor=1.0 - 0.5 ** (30.0 / args.rate))
+        times, speeds, deviations = [], [], []
+        for velocity in legs:
+            velocity = np.array(velocity, dtype=float)
+            direction = velocity / np.linalg.norm(velocity)
+            start = np.array(ik.fk_batch([ik.prev_joint_angles])[0])
+            previous = start
+            for frame in range(frames):
+                begin = time.perf_counter()
+                if mode == "servo":
+                    ik.servo(*velocity, dt)
+                else:
+                    ik.solve(*(velocity * dt))
+                ik.update()
+                times.append(time.perf_counter() - begin)
+                position = ik.fk_batch([ik.prev_joint_angles])[0]
+                offset = position - start
+                deviations.append(np.linalg.norm(offset - (offset @ direction) * direction))
+                speeds.append((position - previous) @ direction / dt)
+                previous = position
+        times.sort()
+        print(f"  {mode:>5}: mean {statistics.mean(times) * 1e6:.0f} us, p99 {times[int(len(times) * 0.99)] * 1e6:.0f} us per frame, "
+              f"speed {statistics.mean(speeds):.3f} +- {statistics.pstdev(speeds):.3f} m/s, "
+              f"max off-line {max(deviations) * 1000:.1f} mm")
+
+
+def bench_ikcache(args):
+    """
+    Jogging between a handful of positions: IKSolver.solve without and with
+    the IK cache. Each visit lands within `jitter` of the position, so
+    repeat visits mostly fall into the same cache buckets.
+    """
+    import numpy as np
+    from iksolver import IKSolver
+    from ik_cache import IKCache
+
+    rng = np.random.default_rng(0)
+    home = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend=args.ik_backend)
+    # reachable positions around the initial pose
+    model = home.model
+    poses = np.array(home.prev_joint_angles) + rng.uniform(-0.5, 0.5, size=(args.positions, model.num_joints))
+    positions = home.fk_batch(np.clip(poses, model.lower_limits, model.upper_limits))
+    tour = [positions[rng.integers(args.positions)] + rng.uniform(-args.jitter, args.jitter, 3)
+            for _ in range(args.visits)]
+
+    print(f"ikcache ({args.ik_backend}, {args.visits} visits to {args.positions} positions, "
+          f"resolution {args.resolution * 1000:.0f} mm)")
+    for cache in (None, IKCache(resolution=args.resolution, size=args.size,
+                                 seed_resolution_deg=args.seed_resolution)):
+        ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend=args.ik_backend,
+                      blend_factor=1.0, ik_cache=cache)
+        times, errors = [], []
+        for target in tour:
+            current = np.array(ik.fk_batch([ik.prev_joint_angles])[0])
+            begin = time.perf_counter()
+            ik.solve(*(target - current))
+            times.append(time.perf_counter() - begin)
+            ik.update()
+            errors.append(np.linalg.norm(ik.fk_batch([ik.prev_joint_angles])[0] - target))
+        times.sort()
+        name = "cache" if cache is not None else "no cache"
+        print(f"  {name:>8}: mean {statistics.mean(times) * 1e6:.0f} us, p50 {times[len(times) // 2] * 1e6:.0f} us, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e6:.0f} us per solve, "
+              f"max error {max(errors) * 1000:.2f} mm")
+        if cache is not None:
+            print(f"            {ik.format_stats()}")
+
+
+ROBOT_INITIAL_POSE = [0, -80, 90, 90, 0, 0, 0, 0]
+
+
+def bench_multiarm(args):
+    """
+    IK for two arms (robotArm_ver7.urdf and robot_ver7.urdf): both solvers
+    one after the other in this process against IKService, which solves
+    each arm in its own worker process concurrently.
+    """
+    import numpy as np
+    from iksolver import IKSolver
+    from ik_service import IKService
+
+    arms = {
+        "robotArm_ver7": dict(urdf_path="robotArm_ver7.urdf", end_effector_index=6,
+                              initial_joint_angles_deg=INITIAL_POSE, ik_backend=args.ik_backend),
+        "robot_ver7": dict(urdf_path="robot_ver7.urdf", end_effector_index=4,
+                           initial_joint_angles_deg=ROBOT_INITIAL_POSE, ik_backend=args.ik_backend),
+    }
+    solvers = {name: IKSolver(**solver_args) for name, solver_args in arms.items()}
+    rng = np.random.default_rng(0)
+    targets = {}
+    for name, ik in solvers.items():
+        model = ik.model
+        poses = rng.uniform(model.lower_limits, model.upper_limits, size=(args.points, model.num_joints))
+        targets[name] = ik.fk_batch(poses)
+
+    print(f"multiarm ({args.ik_backend}, {len(arms)} arms, {os.cpu_count()} cpus)")
+    start = time.perf_counter()
+    for name, ik in solvers.items():
+        ik.solve_batch(targets[name])
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service = IKService(arms)
+    startup = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        results = service.solve_batch(targets)
+        parallel = time.perf_counter() - start
+        converged = sum(int(result[1].sum()) for result in results.values())
+        print(f"  solve_batch {args.points} targets per arm: in process {sequential * 1000:.0f} ms, "
+              f"service {parallel * 1000:.0f} ms ({sequential / parallel:.2f}x), "
+              f"{converged}/{args.points * len(arms)} converged")
+
+        offsets = {name: (0.001, 0.0, 0.0) for name in arms}
+        times = []
+        for frame in range(args.frames):
+            sign = 1 if (frame // 20) % 2 == 0 else -1
+            frame_offsets = {name: (sign * dx, dy, dz) for name, (dx, dy, dz) in offsets.items()}
+            start = time.perf_counter()
+            service.step(frame_offsets)
+            times.append(time.perf_counter() - start)
+        in_process = []
+        for frame in range(args.frames):
+            sign = 1 if (frame // 20) % 2 == 0 else -1
+            start = time.perf_counter()
+            for ik in solvers.values():
+                ik.solve(sign * 0.001, 0.0, 0.0)
+                ik.update()
+            in_process.append(time.perf_counter() - start)
+        print(f"  per frame (solve + update, all arms): in process {statistics.median(in_process) * 1e6:.0f} us, "
+              f"service {statistics.median(times) * 1e6:.0f} us p50")
+    finally:
+        service.close()
+    print(f"  service startup {startup * 1000:.0f} ms")
+
+
+def bench_batch(args):
+    """solve_batch / fk_batch against a Python loop over single solves."""
+    import numpy as np
+    from iksolver import IKSolver
+
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend="numpy")
+    rng = np.random.default_rng(0)
+    model = ik.model
+    joint_angles = rng.uniform(model.lower_limits, model.upper_limits, size=(args.points, model.num_joints))
+
+    start = time.perf_counter()
+    targets = ik.fk_batch(joint_angles)
+    fk_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, converged = ik.solve_batch(targets)
+    batch_time = time.perf_counter() - start
+
+    loop_points = targets[:min(args.points, 200)]
+    start = time.perf_counter()
+    for target in loop_points:
+        model.inverse(target, ik.end_effector_index, ik.prev_joint_angles)
+    loop_time = (time.perf_counter() - start) / len(loop_points) * args.points
+
+    print(f"batch ({args.points} points)")
+    print(f"  fk_batch:    {fk_time * 1000:.1f} ms ({fk_time / args.points * 1e6:.2f} us/point)")
+    print(f"  solve_batch: {batch_time * 1000:.1f} ms ({batch_time / args.points * 1e6:.1f} us/point, "
+          f"{converged.mean() * 100:.0f}% converged)")
+    print(f"  loop solve:  {loop_time * 1000:.1f} ms (extrapolated from {len(loop_points)} points)")
+
+
+def bench_workspace(args):
+    """IK iterations from the current pose vs the workspace grid seed."""
+    import tempfile
+    import numpy as np
+    from iksolver import IKSolver
+    from workspace import WorkspaceGrid
+
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend="numpy")
+    model = ik.model
+    if args.grid and os.path.isdir(args.grid):
+        grid = WorkspaceGrid.load_or_rebuild(args.grid, model, ik.end_effector_index)
+    else:
+        start = time.perf_counter()
+        grid = WorkspaceGrid.build(model, ik.end_effector_index)
+        print(f"  built grid in {time.perf_counter() - start:.1f} s")
+        path = args.grid or tempfile.mkdtemp(prefix="workspace_grid_")
+        grid.save(path)
+        grid = WorkspaceGrid.load(path, model, ik.end_effector_index)
+
+    rng = np.random.default_rng(1)
+    joint_angles = rng.uniform(model.lower_limits, model.upper_limits, size=(args.targets, model.num_joints))
+    reachable = model.forward_batch(joint_angles, ik.end_effector_index)
+    low = grid.origin - 0.5
+    high = grid.origin + grid.shape * grid.voxel_size + 0.5
+    outside = rng.uniform(low, high, size=(args.targets, 3))
+
+    results = {}
+    for name in ("current pose", "grid seed"):
+        iterations, converged, times = [], 0, []
+        for target in reachable:
+            start = time.perf_counter()
+            seed = ik.prev_joint_angles
+            if name == "grid seed":
+                hit = grid.seed(target)
+                if hit is None:
+                    times.append(time.perf_counter() - start)
+                    continue
+                seed = ik._seed_from_grid(hit, ik._end_effector_position(), target)
+            _, its, ok = model.inverse(target, ik.end_effector_index, seed)
+            times.append(time.perf_counter() - start)
+            iterations.append(its)
+            converged += ok
+        results[name] = (iterations, converged, times)
+
+    start = time.perf_counter()
+    rejected = sum(not grid.reachable(target) for target in outside)
+    lookup_time = (time.perf_counter() - start) / len(outside)
+    wasted = []
+    for target in outside[:100]:
+        start = time.perf_counter()
+        model.inverse(target, ik.end_effector_index, ik.prev_joint_angles)
+        wasted.append(time.perf_counter() - start)
+
+    print(f"workspace ({args.targets} reachable targets, grid {tuple(grid.index.shape)} @ {grid.voxel_size} m)")
+    for name, (iterations, converged, times) in results.items():
+        print(f"  {name:>12}: mean {statistics.mean(iterations):.1f} iterations, "
+              f"{converged / len(reachable) * 100:.0f}% converged, mean {statistics.mean(times) * 1e6:.0f} us")
+    print(f"  random points rejected by grid: {rejected}/{len(outside)} "
+          f"({lookup_time * 1e6:.1f} us/lookup vs {statistics.mean(wasted) * 1e6:.0f} us for a failed solve)")
+
+
+def bench_planner(args):
+    """
+    Reset move (the K_r key held) from a jogged pose back to the initial
+    pose at several control rates: the per-frame blend against the planned
+    s-curve / trapezoid trajectory. Reports the time to arrive, the peak
+    joint velocity and acceleration, and the planning cost.
+    """
+    import math
+    import numpy as np
+    from iksolver import IKSolver
+    from joystick_handler import JoystickHandler
+    from main import BASE_FRAME_RATE, load_global_config
+    from trajectory_planner import TrajectoryPlanner, planner_settings
+
+    handler = JoystickHandler()
+    start_pose = [a + d for a, d in zip(INITIAL_POSE, [60, 40, -50, 30, 20, 0, 0, 0, 0, 0])]
+    print("planner (reset from a pose up to 60 deg away, limits from config.csv)")
+    for rate in args.rates:
+        dt = 1.0 / rate
+        for profile in ("blend", "scurve", "trapezoid"):
+            settings = planner_settings(dict(load_global_config(), arm_motion_profile=profile),
+                                        handler.joint_max_velocity, handler.joint_max_acceleration,
+                                        len(INITIAL_POSE))
+            planner = TrajectoryPlanner(dt=dt, **settings) if settings is not None else None
+            ik = IKSolver("robotArm_ver7.urdf", start_pose, 6, ik_backend="numpy",
+                          blend_factor=1.0 - 0.5 ** (BASE_FRAME_RATE / rate), planner=planner)
+            angles = [list(ik.prev_joint_angles)]
+            goal = np.radians(INITIAL_POSE)
+            arrived = None
+            for frame in range(int(10 * rate)):
+                ik.set_joint_targets(INITIAL_POSE)
+                angles.append(ik.update())
+                if arrived is None and np.max(np.abs(np.asarray(angles[-1]) - goal)) < math.radians(0.5):
+                    arrived = (frame + 1) * dt
+                    break
+            angles = np.degrees(np.asarray(angles))
+            velocity = np.diff(angles, axis=0) / dt
+            acceleration = np.diff(np.vstack([np.zeros((1, angles.shape[1])), velocity]), axis=0) / dt
+            print(f"  {rate:>4.0f} Hz {profile:>9}: arrives in "
+                  + (f"{arrived:.2f} s" if arrived is not None else "> 10 s")
+                  + f", peak {np.abs(velocity).max():7.0f} deg/s, {np.abs(acceleration).max():8.0f} deg/s^2")
+
+    settings = planner_settings(load_global_config(), handler.joint_max_velocity,
+                                handler.joint_max_acceleration, len(INITIAL_POSE))
+    planner = TrajectoryPlanner(dt=0.01, **(settings or {"max_velocity": [60.0], "max_acceleration": [120.0]}))
+    start, goal = np.radians(start_pose), np.radians(INITIAL_POSE)
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        samples = planner.plan(start, goal)
+    elapsed = (time.perf_counter() - started) / args.iterations
+    print(f"  plan: {elapsed * 1e6:.0f} us for {len(samples)} samples x {samples.shape[1]} joints at 100 Hz")
+
+
+def bench_collision(args):
+    """
+    Self-collision capsules: fitting them to the meshes, the cost of one
+    check and of a batch, and IK jogs toward random targets with and
+    without the checker (cost per solve, goals cut back, poses that ended
+    in collision).
+    """
+    import numpy as np
+    from collision import SelfCollision
+    from iksolver import IKSolver
+    from kinematics import RobotModel
+
+    urdf = "robotArm_ver7.urdf"
+    model = RobotModel.from_urdf(urdf)
+    started = time.perf_counter()
+    checker = SelfCollision.build(model, urdf)
+    built = time.perf_counter() - started
+    print(f"collision ({len(checker.links)} capsules, {len(checker.pairs)} checked pairs, "
+          f"fitted to the meshes in {built * 1000:.1f} ms)")
+
+    rng = np.random.default_rng(0)
+    arm = slice(0, 6)
+    configs = np.zeros((args.samples, model.num_joints))
+    configs[:, arm] = rng.uniform(model.lower_limits[arm], model.upper_limits[arm], (args.samples, 6))
+    started = time.perf_counter()
+    for q in configs:
+        checker.in_collision(q)
+    single = (time.perf_counter() - started) / len(configs)
+    batches = configs[:len(configs) // args.batch * args.batch].reshape(-1, args.batch, model.num_joints)
+    started = time.perf_counter()
+    for batch in batches:
+        checker.in_collision(batch)
+    batched = (time.perf_counter() - started) / (len(batches) * args.batch)
+    print(f"  check: {single * 1e6:6.1f} us single, {batched * 1e6:6.1f} us per pose in batches of {args.batch}, "
+          f"{checker.in_collision(configs).mean() * 100:.1f}% of random arm poses collide")
+
+    targets = rng.uniform([-0.3, -0.3, 0.05], [0.3, 0.3, 0.45], (args.targets, 3))
+    for name, self_collision in (("off", None), ("on", checker)):
+        ik = IKSolver(urdf, INITIAL_POSE, 6, ik_backend="numpy", self_collision=self_collision)
+        colliding = 0
+        started = time.perf_counter()
+        for target in targets:
+            current = ik._end_effector_position()
+            ik.solve(*(np.asarray(target) - current))
+            for _ in range(20):
+                ik.update()
+            colliding += bool(checker.in_collision(ik.prev_joint_angles))
+        elapsed = (time.perf_counter() - started) / len(targets)
+        print(f"  jog {name:>3}: {elapsed * 1e3:6.2f} ms per target (solve + 20 updates), "
+              f"{ik.collisions_avoided} goals cut back, {colliding} of {len(targets)} poses in collision")
+
+
+def bench_model(args):
+    """
+    Robot model loading: parsing the URDF and fitting the collision capsules
+    to the meshes (every start without the cache) against mapping the
+    compiled model cache.
+    """
+    import tempfile
+    from kinematics import RobotModel
+    from model_cache import CompiledRobot, urdf_key
+
+    urdf = "robotArm_ver7.urdf"
+    cache = os.path.join(tempfile.mkdtemp(), "arm.model.bin")
+
+    def timed(func):
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - started)
+        return result, statistics.median(times)
+
+    _, parse = timed(lambda: RobotModel.from_urdf(urdf))
+    robot, compile_time = timed(lambda: CompiledRobot.compile(urdf, fit_capsules=True))
+    _, save = timed(lambda: robot.save(cache, urdf_key(urdf)))
+    loaded, load = timed(lambda: CompiledRobot.load(cache, urdf_key(urdf)))
+    assert loaded is not None, "cache did not load"
+    print(f"model ({robot.model.num_joints} joints, {len(robot.mesh_files)} meshes, "
+          f"cache {os.path.getsize(cache)} bytes, median of {args.repeat})")
+    print(f"  parse URDF:                 {parse * 1000:7.2f} ms")
+    print(f"  parse URDF + fit capsules:  {compile_time * 1000:7.2f} ms")
+    print(f"  write cache:                {save * 1000:7.2f} ms")
+    print(f"  map cache (hash + load):    {load * 1000:7.2f} ms")
+
+
+def add_parsers(sub):
+    """Add this module's subcommands to benchmark.py's subparsers."""
+    startup = sub.add_parser("startup", help="cold start to first published arm command")
+    startup.add_argument("--physics-backend", default="direct",
+                         choices=["direct", "gui", "shared_memory"])
+    startup.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    child = sub.add_parser("_startup_child")
+    child.add_argument("--physics-backend", default="direct")
+    child.add_argument("--ik-backend", default="numpy")
+    child.set_defaults(func=lambda a: startup_child(a.physics_backend, a.ik_backend))
+
+    ik = sub.add_parser("ik", help="per-frame IK solve latency")
+    ik.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    ik.add_argument("--frames", type=int, default=300)
+    ik.set_defaults(func=bench_ik)
+
+    multiarm = sub.add_parser("multiarm", help="IK for two arms in process against the worker process service")
+    multiarm.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    multiarm.add_argument("--points", type=int, default=2000)
+    multiarm.add_argument("--frames", type=int, default=200)
+    multiarm.set_defaults(func=bench_multiarm)
+
+    ikcache = sub.add_parser("ikcache", help="IK solution cache for repeated targets")
+    ikcache.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    ikcache.add_argument("--positions", type=int, default=8)
+    ikcache.add_argument("--visits", type=int, default=400)
+    ikcache.add_argument("--jitter", type=float, default=0.001)
+    ikcache.add_argument("--resolution", type=float, default=0.005)
+    ikcache.add_argument("--size", type=int, default=256)
+    ikcache.add_argument("--seed-resolution", type=float, default=20.0,
+                         help="seed joint angle bucket (degrees), 0 ignores the seed")
+    ikcache.set_defaults(func=bench_ikcache)
+
+    servo = sub.add_parser("servo", help="servo mode against a full IK solve per frame")
+    servo.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    servo.add_argument("--rate", type=float, default=100.0)
+    servo.add_argument("--speed", type=float, default=0.1)
+    servo.add_argument("--seconds", type=float, default=0.5)
+    servo.set_defaults(func=bench_servo)
+
+    batch = sub.add_parser("batch", help="batched FK / IK over random workspace points")
+    batch.add_argument("--points", type=int, default=2000)
+    batch.set_defaults(func=bench_batch)
+
+    workspace = sub.add_parser("workspace", help="IK iterations with workspace grid seeding")
+    workspace.add_argument("--targets", type=int, default=500)
+    workspace.add_argument("--grid", default=None,
+                           help="saved grid directory (built and saved here if missing)")
+    workspace.set_defaults(func=bench_workspace)
+
+    planner = sub.add_parser("planner", help="reset move: per-frame blend against planned trajectories")
+    planner.add_argument("--rates", type=float, nargs="+", default=[30.0, 100.0, 200.0])
+    planner.add_argument("--iterations", type=int, default=2000)
+    planner.set_defaults(func=bench_planner)
+
+    collision = sub.add_parser("collision", help="self-collision check cost and IK jogs with / without it")
+    collision.add_argument("--samples", type=int, default=2000, help="random poses for the check timing")
+    collision.add_argument("--batch", type=int, default=16)
+    collision.add_argument("--targets", type=int, default=300, help="random IK targets")
+    collision.set_defaults(func=bench_collision)
+
+    model = sub.add_parser("model", help="URDF parse and capsule fit against the compiled model cache")
+    model.add_argument("--repeat", type=int, default=20)
+    model.set_defaults(func=bench_model)
@@ -0,0 +1,180 @@
+"""
+CBOR encoding of rosbridge messages, for the encoding benchmark only.
+
+rosbridge uses CBOR only for messages it sends (subscribe with
+compression="cbor") and does not decode binary frames a client publishes,
+so the teleop app always publishes JSON (encoding.py). Lists of floats are
+packed as RFC 8746 little-endian typed arrays instead of one CBOR float
+per item. Standard library only; covers the types our messages use:
+dict, list/tuple, str, bytes, int, float, bool and None.
+"""
+import struct
+
+# RFC 8746 typed array tags, little endian
+TAG_FLOAT32_LE = 85
+TAG_FLOAT64_LE = 86
+
+_MAJOR_UINT, _MAJOR_NEGINT, _MAJOR_BYTES, _MAJOR_TEXT = 0, 1, 2, 3
+_MAJOR_ARRAY, _MAJOR_MAP, _MAJOR_TAG = 4, 5, 6
+
+
+class CborEncoder:
+    name = "cbor"
+    binary = True
+
+    def __init__(self, float32_arrays=False, min_packed=2):
+        """
+        float32_arrays: pack float lists as float32 (half the bytes) instead
+            of float64
+        min_packed: shortest float list sent as a typed array
+        """
+        self.array_tag = TAG_FLOAT32_LE if float32_arrays else TAG_FLOAT64_LE
+        self.array_format = "<%df" if float32_arrays else "<%dd"
+        self.min_packed = min_packed
+        # encoded text items; message keys and topic names repeat every publish
+        self._text_cache = {}
+
+    def encode(self, msg):
+        out = bytearray()
+        self._encode(msg, out)
+        return bytes(out)
+
+    def _encode(self, value, out):
+        if type(value) is str:
+            cached = self._text_cache.get(value)
+            if cached is None:
+                data = value.encode("utf-8")
+                cached = bytearray()
+                _head(cached, _MAJOR_TEXT, len(data))
+                cached = bytes(cached + data)
+                if len(self._text_cache) < 1024:
+                    self._text_cache[value] = cached
+            out += cached
+        # bool before int: bool is an int subclass
+        elif value is None:
+            out.append(0xF6)
+        elif value is True:
+            out.append(0xF5)
+        elif value is False:
+            out.append(0xF4)
+        elif isinstance(value, int):
+            if value >= 0:
+                _head(out, _MAJOR_UINT, value)
+            else:
+                _head(out, _MAJOR_NEGINT, -1 - value)
+        elif isinstance(value, float):
+            out.append(0xFB)
+            out += struct.pack(">d", value)
+        elif isinstance(value, str):
+            data = value.encode("utf-8")
+            _head(out, _MAJOR_TEXT, len(data))
+            out += data
+        elif isinstance(value, (bytes, bytearray)):
+            _head(out, _MAJOR_BYTES, len(value))
+            out += value
+        elif isinstance(value, dict):
+            _head(out, _MAJOR_MAP, len(value))
+            for key, item in value.items():
+                self._encode(key, out)
+                self._encode(item, out)
+        elif isinstance(value, (list, tuple)):
+            if len(value) >= self.min_packed and all(isinstance(item, float) for item in value):
+                packed = struct.pack(self.array_format % len(value), *value)
+                _head(out, _MAJOR_TAG, self.array_tag)
+                _head(out, _MAJOR_BYTES, len(packed))
+                out += packed
+            else:
+                _head(out, _MAJOR_ARRAY, len(value))
+                for item in value:
+                    self._encode(item, out)
+        elif hasattr(value, "tolist"):
+            # numpy arrays / scalars
+            self._encode(value.tolist(), out)
+        else:
+            raise TypeError(f"Cannot CBOR-encode {type(value).__name__}")
+
+
+def _head(out, major, value):
+    """CBOR initial byte plus argument."""
+    if value < 24:
+        out.append(major << 5 | value)
+    elif value < 1 << 8:
+        out.append(major << 5 | 24)
+        out.append(value)
+    elif value < 1 << 16:
+        out.append(major << 5 | 25)
+        out += struct.pack(">H", value)
+    elif value < 1 << 32:
+        out.append(major << 5 | 26)
+        out += struct.pack(">I", value)
+    else:
+        out.append(major << 5 | 27)
+        out += struct.pack(">Q", value)
+
+
+def cbor_decode(data):
+    """Decode CBOR produced by CborEncoder (typed arrays become lists)."""
+    value, offset = _decode(memoryview(data), 0)
+    if offset != len(data):
+        raise ValueError("Trailing bytes after CBOR item")
+    return value
+
+
+def _decode(data, offset):
+    initial = data[offset]
+    offset += 1
+    major, info = initial >> 5, initial & 0x1F
+    if major == 7:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info == 22:
+            return None, offset
+        if info == 25:
+            return struct.unpack_from(">e", data, offset)[0], offset + 2
+        if info == 26:
+            return struct.unpack_from(">f", data, offset)[0], offset + 4
+        if info == 27:
+            return struct.unpack_from(">d", data, offset)[0], offset + 8
+        raise ValueError(f"Unsupported CBOR simple value {info}")
+    if info < 24:
+        arg = info
+    elif info == 24:
+        arg, offset = data[offset], offset + 1
+    elif info == 25:
+        arg, offset = struct.unpack_from(">H", data, offset)[0], offset + 2
+    elif info == 26:
+        arg, offset = struct.unpack_from(">I", data, offset)[0], offset + 4
+    elif info == 27:
+        arg, offset = struct.unpack_from(">Q", data, offset)[0], offset + 8
+    else:
+        raise ValueError("Indefinite-length CBOR is not supported")
+
+    if major == _MAJOR_UINT:
+        return arg, offset
+    if major == _MAJOR_NEGINT:
+        return -1 - arg, offset
+    if major == _MAJOR_BYTES:
+        return bytes(data[offset:offset + arg]), offset + arg
+    if major == _MAJOR_TEXT:
+        return str(data[offset:offset + arg], "utf-8"), offset + arg
+    if major == _MAJOR_ARRAY:
+        items = []
+        for _ in range(arg):
+            item, offset = _decode(data, offset)
+            items.append(item)
+        return items, offset
+    if major == _MAJOR_MAP:
+        result = {}
+        for _ in range(arg):
+            key, offset = _decode(data, offset)
+            result[key], offset = _decode(data, offset)
+        return result, offset
+    # tag
+    item, offset = _decode(data, offset)
+    if arg == TAG_FLOAT32_LE:
+        return list(struct.unpack("<%df" % (len(item) // 4), item)), offset
+    if arg == TAG_FLOAT64_LE:
+        return list(struct.unpack("<%dd" % (len(item) // 8), item)), offset
+    return item, offset
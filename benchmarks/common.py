@@ -0,0 +1,26 @@
+"""
+Stand-ins and poses shared by the benchmarks.
+"""
+import os
+
+# benchmark.py, the CLI that runs the benchmarks (also in child processes)
+BENCHMARK_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmark.py")
+
+
+class NoKeys:
+    """Stand-in for pygame.key.get_pressed() with nothing held down."""
+    def __getitem__(self, key):
+        return False
+
+
+class HeldKeys:
+    """Stand-in for pygame.key.get_pressed() with the given keys held down."""
+    def __init__(self, held):
+        self.held = set(held)
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+INITIAL_POSE = [0, -80, 90, 90, 0, 0, 0, 0, 0, 0]
+JOINT_OFFSET = [-90, -90, -70, 0, -90, -90, -70]
@@ -0,0 +1,354 @@
+"""
+Control loop and input benchmarks: loop timing under UI load, UI drawing,
+profiler overhead, button handling, joystick mixing and wheel smoothing.
+"""
+import statistics
+import time
+from benchmarks.common import NoKeys, HeldKeys, INITIAL_POSE, JOINT_OFFSET
+
+
+def bench_loop(args):
+    """
+    Control loop timing with the real mixing + IK step while the main thread
+    does busy UI-like work at its own rate.
+    """
+    import pygame
+    from control_loop import ControlLoop, ControlSnapshot
+    from joystick_handler import JoystickHandler
+    from iksolver import IKSolver
+
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend=args.ik_backend)
+    handler = JoystickHandler()
+    handler.arm_move_step *= 30.0 / args.rate
+    published = [0]
+
+    def publish(msg):
+        published[0] += 1
+
+    frame = [0]
+
+    def step():
+        # jog the arm back and forth so IK runs every step
+        frame[0] += 1
+        keys = HeldKeys([pygame.K_RIGHT] if (frame[0] // 40) % 2 == 0 else [pygame.K_LEFT])
+        handler.process_keypress_continuous(
+            keys, wheel_publish_callback=publish, arm_publish_callback=publish,
+            ik=ik, joint_offset_degree=JOINT_OFFSET, initial_pose=INITIAL_POSE)
+        return ControlSnapshot(handler.velocity, handler.arm_index, tuple(handler.arm_angles),
+                               tuple(handler.wheel_speed), time.perf_counter())
+
+    loop = ControlLoop(step, rate_hz=args.rate).start()
+    ui_frames = 0
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end and loop.is_alive():
+        # stand-in for font rendering: hold the GIL for ui_work_ms
+        busy_until = time.perf_counter() + args.ui_work_ms / 1000.0
+        while time.perf_counter() < busy_until:
+            pass
+        ui_frames += 1
+        time.sleep(max(0.0, 1.0 / args.ui_rate - args.ui_work_ms / 1000.0))
+    loop.stop()
+
+    print(f"loop ({args.ik_backend} IK, {args.rate:.0f} Hz control, {args.ui_rate:.0f} Hz UI with "
+          f"{args.ui_work_ms:.0f} ms busy frames, {args.seconds:.0f} s)")
+    print(f"  control: {loop.stats.format_summary()}")
+    print(f"  ui frames: {ui_frames}, messages published: {published[0]}")
+
+
+def bench_ui(args):
+    """
+    UI.draw cost: rendering every string and flipping every frame (the old
+    UI), full redraw from cached surfaces, and dirty rectangles only.
+    """
+    import math
+    import pygame
+    from ui import UI
+
+    pygame.init()
+    ui = UI()
+    results = {}
+    for mode in ("render all", "full redraw", "dirty rects"):
+        times = []
+        for frame in range(args.frames):
+            if mode != "dirty rects":
+                ui.invalidate()
+            if mode == "render all":
+                # what the UI did before: render every string every frame
+                for label in ui.labels:
+                    label._cache.clear()
+            # the arm moves for a while every second, the rest stays put
+            moving = frame % 30 < 10
+            angle = math.radians(frame % 90) if moving else 0.0
+            arm_angles = [angle, 0.5, 1.0, 1.5, 0.0, 0.0, angle]
+            start = time.perf_counter()
+            ui.draw(10.0, "192.168.0.10", "Connected", "", False, "", 2, arm_angles,
+                    [angle * 10, 0.0, 0.0, 0.0], control_stats="100.0 Hz")
+            times.append(time.perf_counter() - start)
+        results[mode] = times
+    pygame.quit()
+
+    print(f"ui ({args.frames} frames, arm moving a third of the time)")
+    for mode, times in results.items():
+        times.sort()
+        print(f"  {mode:>11}: mean {statistics.mean(times) * 1000:.3f} ms, "
+              f"p50 {times[len(times) // 2] * 1000:.3f} ms, max {times[-1] * 1000:.3f} ms")
+
+
+def bench_profile(args):
+    """Per-call overhead of @profiled with the profiler disabled and enabled."""
+    from profiler import Profiler, profiled
+
+    profiler = Profiler()
+
+    def bare():
+        return None
+
+    wrapped = profiled("bench.noop", profiler)(bare)
+    results = {}
+    for name, func, enabled in (("bare call", bare, False), ("disabled", wrapped, False),
+                                ("enabled", wrapped, True)):
+        profiler.enabled = enabled
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(args.calls // 5):
+                func()
+            best = min(best, (time.perf_counter() - start) / (args.calls // 5))
+        results[name] = best
+    print(f"profile ({args.calls} calls, best of 5)")
+    for name, per_call in results.items():
+        print(f"  {name:>9}: {per_call * 1e9:.0f} ns/call, "
+              f"overhead {(per_call - results['bare call']) * 1e9:.0f} ns")
+    print("  enabled call durations (last window):")
+    print("  " + profiler.format_histograms())
+
+
+def bench_buttons(args):
+    """
+    Control loop timing while buttons are pressed every `--press-interval`
+    s: the old handler (10 ms sleep after every press) against the
+    dispatcher, plus auto-repeat timing of a held button.
+    """
+    from control_loop import ControlLoop
+    from iksolver import IKSolver
+    from joystick_handler import JoystickHandler
+    from main import TeleopControl
+    from virtual_joystick import VirtualJoystick
+
+    print(f"buttons ({args.rate:.0f} Hz control, a press every {args.press_interval * 1000:.0f} ms, "
+          f"{args.seconds:.0f} s)")
+    for mode in ("sleep 10 ms", "dispatcher"):
+        handler = JoystickHandler()
+        handler.control_period = 1.0 / args.rate
+        ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend="numpy")
+        if mode != "dispatcher":
+            dispatch = handler.process_button_press
+
+            def process_button_press(button, wheel_publish_callback, arm_publish_callback):
+                dispatch(button, wheel_publish_callback, arm_publish_callback)
+                time.sleep(0.01)
+            handler.process_button_press = process_button_press
+        teleop = TeleopControl(handler, ik, lambda cmd: None, lambda msg: None,
+                               {0: VirtualJoystick()}, JOINT_OFFSET, INITIAL_POSE, get_pressed=NoKeys)
+        teleop.enabled = True
+        loop = ControlLoop(teleop.step, rate_hz=args.rate).start()
+        end = time.perf_counter() + args.seconds
+        presses = 0
+        while time.perf_counter() < end and loop.is_alive():
+            # speed up / down alternately so the velocity stays in range
+            teleop.press_button(10 if presses % 2 == 0 else 9)
+            presses += 1
+            time.sleep(args.press_interval)
+        loop.stop()
+        print(f"  {mode:>11}: {loop.stats.format_summary()}")
+
+    # auto-repeat: hold speed up for one second at the control rate
+    handler = JoystickHandler()
+    handler.control_period = 1.0 / args.rate
+    handler.buttons.table[10] = (handler.buttons.table[10][0], True)
+    joystick = VirtualJoystick()
+    teleop = TeleopControl(handler, IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend="numpy"),
+                           lambda cmd: None, lambda msg: None, {0: joystick}, JOINT_OFFSET, INITIAL_POSE,
+                           get_pressed=NoKeys)
+    teleop.enabled = True
+    joystick.set_button(10, 1)
+    teleop.press_button(10)
+    fired = []
+    for frame in range(int(args.rate)):
+        before = handler.buttons.presses + handler.buttons.repeats
+        teleop.step()
+        if handler.buttons.presses + handler.buttons.repeats > before:
+            fired.append(frame / args.rate)
+    print(f"  held 1 s with repeat (delay {handler.button_repeat_delay} s, interval "
+          f"{handler.button_repeat_interval} s): fired at " + ", ".join(f"{t:.2f}" for t in fired) + " s")
+
+
+def legacy_joystick_mix(handler, joysticks, wheel_publish_callback):
+    """The per-joystick Python mixing loop WheelMixer replaced (reference)."""
+    for joystick in joysticks.values():
+        axis_vertical = 0
+        axis_horizontal = 0
+        axis_rotational = 0
+        if abs(joystick.get_axis(handler.left_stick_horizontal)) > handler.min_joystick_value:
+            axis_horizontal += joystick.get_axis(handler.left_stick_horizontal)
+        if abs(joystick.get_axis(handler.left_stick_vertical)) > handler.min_joystick_value:
+            axis_vertical -= joystick.get_axis(handler.left_stick_vertical)
+        if abs((joystick.get_axis(handler.clockwise_rotation) + 1) / 2) > handler.min_joystick_value:
+            axis_rotational += (joystick.get_axis(handler.clockwise_rotation) + 1) / 2
+        if abs((joystick.get_axis(handler.counterclockwise_rotation) + 1) / 2) > handler.min_joystick_value:
+            axis_rotational -= (joystick.get_axis(handler.counterclockwise_rotation) + 1) / 2
+        frontLeft = axis_vertical + axis_horizontal + axis_rotational
+        frontRight = axis_vertical - axis_horizontal - axis_rotational
+        rearLeft = axis_vertical - axis_horizontal + axis_rotational
+        rearRight = axis_vertical + axis_horizontal - axis_rotational
+        handler.wheel_speed = [frontLeft * handler.velocity, frontRight * handler.velocity,
+                               rearLeft * handler.velocity, rearRight * handler.velocity]
+        wheel_publish_callback(handler.wheel_speed)
+
+
+def bench_mixing(args):
+    """
+    Joystick wheel mixing per control cycle: the old per-joystick loop
+    against WheelMixer, for 1..N controllers, and agreement with one.
+    """
+    import random
+    from fake_rosbridge import FakeRosbridge
+    from joystick_handler import JoystickHandler
+    from main import WheelPublisher
+    from virtual_joystick import VirtualJoystick
+    from ws_client import RosbridgeClient
+
+    handler = JoystickHandler()
+    rng = random.Random(0)
+    mismatches = 0
+    for _ in range(2000):
+        joystick = VirtualJoystick(0)
+        for axis in range(joystick.get_numaxes()):
+            joystick.set_axis(axis, rng.uniform(-1.0, 1.0))
+        legacy, mixed = [], []
+        legacy_joystick_mix(handler, {0: joystick}, lambda cmd: legacy.append(list(cmd)))
+        handler.process_joystick_continuous({0: joystick}, lambda cmd: mixed.append(list(cmd)))
+        if len(legacy) != len(mixed) or any(abs(a - b) > 1e-9 for a, b in zip(legacy[0], mixed[0])):
+            mismatches += 1
+
+    # publishing through the real wheel publisher into a connected client
+    server = FakeRosbridge().start()
+    client = RosbridgeClient(rosbridge_port=server.port)
+    client.connect("127.0.0.1")
+    wheel = WheelPublisher(client, handler.wheel_groups)
+    wheel.advertise()
+    print(f"mixing ({args.cycles} cycles, policy {handler.wheel_mix_policy}, "
+          f"{mismatches} of 2000 random single-controller inputs differ from the old loop)")
+    for count in range(1, args.controllers + 1):
+        joysticks = {i: VirtualJoystick(i) for i in range(count)}
+        for i, joystick in joysticks.items():
+            # controllers disagree, as when two operators hold their sticks
+            joystick.set_axis(handler.left_stick_vertical, -0.5 if i % 2 == 0 else 0.5)
+        for name, func in (("per-joystick loop", legacy_joystick_mix),
+                           ("WheelMixer", JoystickHandler.process_joystick_continuous)):
+            published = [0]
+
+            def publish(cmd):
+                published[0] += 1
+                wheel(cmd)
+
+            start = time.perf_counter()
+            for _ in range(args.cycles):
+                func(handler, joysticks, publish)
+            per_cycle = (time.perf_counter() - start) / args.cycles
+            print(f"  {count} controller{'s' if count > 1 else ' '} {name:>17}: "
+                  f"{per_cycle * 1e6:.1f} us/cycle incl. publish, "
+                  f"{published[0] / args.cycles:.0f} publishes/cycle")
+    client.disconnect()
+    server.stop()
+
+
+def bench_smoothing(args):
+    """
+    Wheel command filter: ramp shape for a 0 -> velocity step (what button
+    11 sends), per-step cost, and how far the command the robot holds
+    between publishes trails the filter output with and without lead.
+    """
+    from wheel_filter import WheelFilter
+
+    dt = 1.0 / args.rate
+    velocity = 10.0
+    print(f"smoothing ({args.rate:.0f} Hz control, slew {args.slew_rate}/s, jerk {args.jerk}/s^2, "
+          f"smoothing {args.smoothing} s, step 0 -> {velocity})")
+
+    def run(lead=0.0, steps=None):
+        wheel_filter = WheelFilter(dt, smoothing=args.smoothing, slew_rate=args.slew_rate,
+                                   jerk=args.jerk, lead=lead)
+        wheel_filter.set_target([0.0] * 4)
+        wheel_filter.set_target([velocity] * 4)
+        return [wheel_filter.step()[0] for _ in range(steps or int(args.seconds * args.rate))]
+
+    output = run()
+    rates = [(b - a) / dt for a, b in zip([0.0] + output, output)]
+    jerks = [(b - a) / dt for a, b in zip([0.0] + rates, rates)]
+    settle = next((i for i, value in enumerate(output) if abs(value - velocity) < 1e-6), None)
+    print(f"  unfiltered: jumps to {velocity} in one step ({velocity / dt:.0f}/s)")
+    print(f"  filtered:   max rate {max(map(abs, rates)):.1f}/s, max jerk {max(map(abs, jerks)):.0f}/s^2, "
+          f"settles in {settle * dt * 1000 if settle is not None else float('nan'):.0f} ms")
+
+    wheel_filter = WheelFilter(dt, smoothing=args.smoothing, slew_rate=args.slew_rate, jerk=args.jerk)
+    wheel_filter.set_target([0.0] * 4)
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        if i % 200 == 0:
+            wheel_filter.set_target([velocity if (i // 200) % 2 else 0.0] * 4)
+        wheel_filter.step()
+    print(f"  cost: {(time.perf_counter() - start) / args.iterations * 1e6:.1f} us per step (4 wheels)")
+
+    # the robot holds each published command until the next one
+    for publish_rate in args.publish_rates:
+        period = max(1, int(round(args.rate / publish_rate)))
+        results = []
+        for lead in (0.0, 0.5 / publish_rate):
+            published = run(lead)
+            held = [published[i - i % period] for i in range(len(output))]
+            ramp = [i for i in range(len(output)) if 0 < output[i] < velocity]
+            error = sum(abs(held[i] - output[i]) for i in ramp) / max(len(ramp), 1)
+            lag = sum(output[i] - held[i] for i in ramp) / max(len(ramp), 1)
+            results.append(f"lead {lead * 1000:>4.0f} ms: mean |error| {error:.3f}, mean lag {lag:+.3f}")
+        print(f"  publish {publish_rate:>4.0f} Hz  " + "  |  ".join(results))
+
+
+def add_parsers(sub):
+    """Add this module's subcommands to benchmark.py's subparsers."""
+    loop = sub.add_parser("loop", help="fixed-rate control loop timing under UI load")
+    loop.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    loop.add_argument("--rate", type=float, default=200.0)
+    loop.add_argument("--ui-rate", type=float, default=30.0)
+    loop.add_argument("--ui-work-ms", type=float, default=15.0)
+    loop.add_argument("--seconds", type=float, default=5.0)
+    loop.set_defaults(func=bench_loop)
+
+    ui = sub.add_parser("ui", help="UI draw cost, full redraw vs dirty rectangles")
+    ui.add_argument("--frames", type=int, default=600)
+    ui.set_defaults(func=bench_ui)
+
+    profile = sub.add_parser("profile", help="overhead of the @profiled instrumentation")
+    profile.add_argument("--calls", type=int, default=200000)
+    profile.set_defaults(func=bench_profile)
+
+    mixing = sub.add_parser("mixing", help="joystick wheel mixing cost for several controllers")
+    mixing.add_argument("--cycles", type=int, default=20000)
+    mixing.add_argument("--controllers", type=int, default=3)
+    mixing.set_defaults(func=bench_mixing)
+
+    buttons = sub.add_parser("buttons", help="control loop timing with button presses, auto-repeat")
+    buttons.add_argument("--rate", type=float, default=100.0)
+    buttons.add_argument("--press-interval", type=float, default=0.1)
+    buttons.add_argument("--seconds", type=float, default=5.0)
+    buttons.set_defaults(func=bench_buttons)
+
+    smoothing = sub.add_parser("smoothing", help="wheel command slew / jerk filter response and cost")
+    smoothing.add_argument("--rate", type=float, default=100.0)
+    smoothing.add_argument("--slew-rate", type=float, default=20.0)
+    smoothing.add_argument("--jerk", type=float, default=100.0)
+    smoothing.add_argument("--smoothing", type=float, default=0.0)
+    smoothing.add_argument("--seconds", type=float, default=2.0)
+    smoothing.add_argument("--iterations", type=int, default=20000)
+    smoothing.add_argument("--publish-rates", type=float, nargs="+", default=[50.0, 20.0, 10.0])
+    smoothing.set_defaults(func=bench_smoothing)
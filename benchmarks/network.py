@@ -0,0 +1,535 @@
+"""
+Rosbridge traffic benchmarks: publish latency, coalescing, encodings,
+message templates, arm trajectory chunks and end-to-end input-to-wire
+latency against the stand-in rosbridge.
+"""
+import statistics
+import time
+from benchmarks.common import NoKeys, HeldKeys, INITIAL_POSE, JOINT_OFFSET
+
+
+def legacy_publish_wheel(ws_client, cmd, front_topic, rear_topic, front_range, rear_range):
+    """Old wheel publisher: builds both full messages on every call (no templates)."""
+    # 建立後輪與前輪的完整訊息（std_msgs/Float32MultiArray）
+    rear_msg = {
+        "layout": {
+            "dim": [{
+                "label": "rear_wheels",
+                "size": front_range[1] - front_range[0],  # 可依實際需求調整
+                "stride": front_range[1] - front_range[0]
+            }],
+            "data_offset": 0
+        },
+        "data": cmd[rear_range[0]:rear_range[1]]
+    }
+    front_msg = {
+        "layout": {
+            "dim": [{
+                "label": "front_wheels",
+                "size": rear_range[1] - rear_range[0],
+                "stride": rear_range[1] - rear_range[0]
+            }],
+            "data_offset": 0
+        },
+        "data": cmd[front_range[0]:front_range[1]]
+    }
+
+    ws_client.publish(rear_topic, rear_msg)
+    ws_client.publish(front_topic, front_msg)
+
+
+def bench_publish(args):
+    """
+    Caller-side cost of publish against a stand-in rosbridge that reads
+    slowly: synchronous ws.send vs the queued RosbridgeClient.
+    """
+    import json
+    import websocket
+    from fake_rosbridge import FakeRosbridge
+    from ws_client import RosbridgeClient
+
+    server = FakeRosbridge(delay=args.delay_ms / 1000.0).start()
+    msg = {"layout": {"dim": [{"label": "front_wheels", "size": 2, "stride": 2}], "data_offset": 0},
+           "data": [0.0] * 2 + [1.0] * args.padding}
+
+    ws = websocket.create_connection(f"ws://127.0.0.1:{server.port}", timeout=30)
+    sync_times = []
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        ws.send(json.dumps({"op": "publish", "topic": "/bench", "msg": msg}))
+        sync_times.append(time.perf_counter() - start)
+    ws.close()
+
+    client = RosbridgeClient(rosbridge_port=server.port, max_queue=args.queue)
+    client.connect("127.0.0.1")
+    queued_times = []
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        client.publish("/bench", msg)
+        queued_times.append(time.perf_counter() - start)
+    dropped = client.dropped
+    client.disconnect(flush_timeout=0)
+    server.stop()
+
+    print(f"publish ({args.messages} messages, server stalls {args.delay_ms} ms per message)")
+    for name, times in (("sync ws.send", sync_times), ("queued publish", queued_times)):
+        times.sort()
+        print(f"  {name:>14}: p50 {times[len(times) // 2] * 1e6:.0f} us, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e6:.0f} us, max {times[-1] * 1000:.1f} ms")
+    print(f"  queued client dropped {dropped} stale messages (queue {args.queue})")
+
+
+def bench_traffic(args):
+    """
+    Websocket traffic of an idle then jogging control loop, with and
+    without per-topic coalescing.
+    """
+    import pygame
+    from fake_rosbridge import FakeRosbridge
+    from joystick_handler import JoystickHandler
+    from iksolver import IKSolver
+    from ws_client import RosbridgeClient
+
+    print(f"traffic ({args.rate:.0f} Hz control loop, {args.seconds:.0f} s idle + {args.seconds:.0f} s jogging)")
+    for coalesce in (False, True):
+        server = FakeRosbridge().start()
+        client = RosbridgeClient(rosbridge_port=server.port, coalesce=coalesce,
+                                 publish_rate=args.publish_rate, keepalive=args.keepalive)
+        client.connect("127.0.0.1")
+        ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, ik_backend="numpy")
+        handler = JoystickHandler()
+        handler.arm_move_step *= 30.0 / args.rate
+        wheel = lambda cmd: legacy_publish_wheel(client, cmd, handler.front_wheel_topic, handler.rear_wheel_topic,
+                                                 handler.front_wheel_range, handler.rear_wheel_range)
+        arm = lambda msg: client.publish(handler.arm_topic, msg)
+
+        frames = int(args.rate * args.seconds)
+        for frame in range(2 * frames):
+            keys = NoKeys() if frame < frames else HeldKeys([pygame.K_w, pygame.K_UP])
+            handler.process_keypress_continuous(keys, wheel, arm, ik, JOINT_OFFSET, INITIAL_POSE)
+            time.sleep(1.0 / args.rate)
+        client.disconnect()
+        server.stop()
+
+        idle = [m for t, m in server.messages if t < server.messages[0][0] + args.seconds]
+        total_bytes = sum(len(m) for _, m in server.messages)
+        name = "coalesced" if coalesce else "every frame"
+        print(f"  {name:>11}: {len(idle) / args.seconds:.0f} msg/s idle, "
+              f"{(len(server.messages) - len(idle)) / args.seconds:.0f} msg/s jogging, "
+              f"{total_bytes / 1024:.0f} KiB total")
+
+
+def bench_encoding(args):
+    """
+    Serialization time and bytes per message of the JSON publish encoding
+    against CBOR (which rosbridge does not accept from clients).
+    """
+    import json
+    from benchmarks.cbor import CborEncoder, cbor_decode
+    from encoding import JsonEncoder
+
+    wheel = {"op": "publish", "topic": "/car_C_front_wheel",
+             "msg": {"layout": {"dim": [{"label": "front_wheels", "size": 2, "stride": 2}], "data_offset": 0},
+                     "data": [12.5, -7.25]}}
+    arm = {"op": "publish", "topic": "/robot_arm",
+           "msg": {"positions": [1.5707963267948966, 0.17453292519943295, 2.792526803190927,
+                                 1.5707963267948966, 0.0, 0.0, 1.2217304763960306]}}
+    encoders = [
+        ("json.dumps (old)", json.dumps),
+        ("json compact", JsonEncoder().encode),
+        ("cbor float64", CborEncoder().encode),
+        ("cbor float32", CborEncoder(float32_arrays=True).encode),
+    ]
+    print(f"encoding ({args.iterations} iterations)")
+    for label, msg in (("wheel", wheel), ("arm", arm)):
+        for name, encode in encoders:
+            # best of 5 blocks: this is a microbenchmark on a shared machine
+            elapsed = float("inf")
+            for _ in range(5):
+                start = time.perf_counter()
+                for _ in range(args.iterations // 5):
+                    data = encode(msg)
+                elapsed = min(elapsed, (time.perf_counter() - start) / (args.iterations // 5))
+            if isinstance(data, bytes):
+                assert cbor_decode(data)["topic"] == msg["topic"]
+            size = len(data.encode() if isinstance(data, str) else data)
+            print(f"  {label:>5} {name:>16}: {elapsed * 1e6:5.2f} us, {size:4d} bytes")
+
+
+def bench_templates(args):
+    """
+    Per-frame publish cost (two wheel topics + arm) of the per-call dict
+    path against pre-built message templates, at a fixed publish rate.
+    """
+    import tracemalloc
+    from fake_rosbridge import FakeRosbridge
+    from main import ArmPublisher, WheelPublisher
+    from ws_client import RosbridgeClient
+
+    front, rear, arm_topic = "/car_C_front_wheel", "/car_C_rear_wheel", "/robot_arm"
+    front_range, rear_range = (0, 2), (2, 4)
+    cmd = [10.0, -10.0, 10.0, -10.0]
+    positions = [1.5707963267948966, 0.17453292519943295, 2.792526803190927,
+                 1.5707963267948966, 0.0, 0.0, 1.2217304763960306]
+    print(f"templates ({args.rate:.0f} Hz for {args.seconds:.0f} s, 3 topics per frame)")
+    for name in ("dict per call", "templates"):
+        server = FakeRosbridge().start()
+        client = RosbridgeClient(rosbridge_port=server.port)
+        client.connect("127.0.0.1")
+        if name == "templates":
+            wheel = WheelPublisher(client, [(rear, rear_range, "rear_wheels"),
+                                            (front, front_range, "front_wheels")])
+            arm = ArmPublisher(client, arm_topic)
+            wheel.advertise()
+            arm.advertise()
+            frame = lambda: (wheel(cmd), arm({"positions": positions}))
+        else:
+            frame = lambda: (legacy_publish_wheel(client, cmd, front, rear, front_range, rear_range),
+                             (lambda arm_msg: client.publish(arm_topic, arm_msg))({"positions": positions}))
+
+        tracemalloc.start()
+        frame()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        frame()
+        transient = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+
+        # back-to-back calls: the cost of the publish path alone
+        tight = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(1000):
+                frame()
+            tight = min(tight, (time.perf_counter() - start) / 1000)
+
+        frames = int(args.rate * args.seconds)
+        times = []
+        cpu_start = time.thread_time()
+        next_frame = time.perf_counter()
+        for _ in range(frames):
+            start = time.perf_counter()
+            frame()
+            times.append(time.perf_counter() - start)
+            next_frame += 1.0 / args.rate
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        cpu = time.thread_time() - cpu_start
+        client.disconnect()
+        server.stop()
+        times.sort()
+        print(f"  {name:>13}: back-to-back {tight * 1e6:.1f} us/frame, "
+              f"at rate mean {statistics.mean(times) * 1e6:.1f} us/frame, "
+              f"p99 {times[int(len(times) * 0.99)] * 1e6:.1f} us, peak transient {transient} bytes/frame, "
+              f"caller CPU {cpu / args.seconds * 100:.1f}%")
+
+
+def hermite(points, t):
+    """Positions of JointTrajectory `points` at `t` s (cubic between points, held after the last)."""
+    times = [p["time_from_start"]["sec"] + p["time_from_start"]["nanosec"] * 1e-9 for p in points]
+    if t >= times[-1]:
+        return points[-1]["positions"]
+    k = max(i for i, start in enumerate(times) if start <= t)
+    a, b = points[k], points[k + 1]
+    h = times[k + 1] - times[k]
+    u = (t - times[k]) / h
+    h00, h10, h01, h11 = 2 * u ** 3 - 3 * u ** 2 + 1, u ** 3 - 2 * u ** 2 + u, -2 * u ** 3 + 3 * u ** 2, u ** 3 - u ** 2
+    return [h00 * p0 + h10 * h * v0 + h01 * p1 + h11 * h * v1
+            for p0, v0, p1, v1 in zip(a["positions"], a["velocities"], b["positions"], b["velocities"])]
+
+
+def bench_trajectory(args):
+    """
+    Arm command streaming: the same keyboard jog sequence published as one
+    JointTrajectoryPoint per frame, as points at the chunk rate (the robot
+    holds each), and as JointTrajectory chunks. Reports message rate, bytes
+    on the wire (JSON) and how far the command the robot follows (cubic
+    interpolation of the chunk points) is from the per-frame command.
+    """
+    import math
+    import pygame
+    from arm_trajectory import trajectory_template
+    from encoding import JsonEncoder, MessageTemplate
+    from iksolver import IKSolver
+    from joystick_handler import JoystickHandler
+    from main import TeleopControl, BASE_FRAME_RATE
+
+    dt = 1.0 / args.rate
+    frames = int(args.seconds * args.rate)
+    # jog: hold a key, pause, next key; reset to the initial pose every cycle
+    jog = [(pygame.K_UP, 0.6), (None, 0.4), (pygame.K_LEFT, 0.5), (None, 0.3),
+           (pygame.K_SPACE, 0.4), (None, 0.5), (pygame.K_DOWN, 0.3), (pygame.K_r, 0.05), (None, 0.6)]
+    schedule = []
+    for key, seconds in jog * (frames // int(sum(s for _, s in jog) * args.rate) + 1):
+        schedule += [key] * int(round(seconds * args.rate))
+
+    def run(arm_trajectory):
+        handler = JoystickHandler()
+        frame_scale = BASE_FRAME_RATE / args.rate
+        handler.arm_move_step *= frame_scale
+        handler.control_period = dt
+        ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, blend_factor=1.0 - 0.5 ** frame_scale,
+                      ik_backend="numpy")
+        keys = HeldKeys([])
+        published = []
+        commands = []
+        teleop = TeleopControl(handler, ik, lambda cmd: None,
+                               lambda msg: published.append((len(commands), msg)),
+                               {}, JOINT_OFFSET, INITIAL_POSE, get_pressed=lambda: keys,
+                               arm_trajectory=arm_trajectory)
+        teleop.enabled = True
+        tick_times = []
+        for frame in range(frames):
+            keys.held = {schedule[frame]} if schedule[frame] is not None else set()
+            teleop.step()
+            commands.append([math.radians(a) - math.radians(o)
+                             for a, o in zip(map(math.degrees, handler.arm_angles), JOINT_OFFSET)])
+            if teleop.arm_output is not None:
+                start = time.perf_counter()
+                teleop.arm_output.chunk()
+                tick_times.append(time.perf_counter() - start)
+        return commands, published, ik, tick_times
+
+    encoder = JsonEncoder()
+    point_template = MessageTemplate(encoder, "/robot_arm", {"positions": None}, field="positions")
+    commands, published, ik, _ = run(None)
+    points_bytes = sum(len(point_template.render(msg["positions"])) for _, msg in published)
+
+    settings = {"rate": args.chunk_rate, "horizon": args.horizon, "point_period": args.point_period,
+                "tolerance_deg": args.tolerance}
+    chunk_commands, chunks, ik, chunk_times = run(settings)
+    if chunk_commands != commands:
+        print("  warning: trajectory mode changed the arm commands")
+    names = ik.model.joint_names[:len(JOINT_OFFSET)]
+    trajectory_template_msg = MessageTemplate(encoder, "/robot_arm_trajectory",
+                                              trajectory_template(names), field="points")
+    chunk_bytes = sum(len(trajectory_template_msg.render(points)) for _, points in chunks)
+
+    def error_deg(robot):
+        errors = [max(abs(a - b) for a, b in zip(robot[f], commands[f])) for f in range(frames)]
+        return math.degrees(statistics.mean(errors)), math.degrees(max(errors))
+
+    # points at the chunk rate, held by the robot until the next one
+    period = max(1, int(round(args.rate / args.chunk_rate)))
+    held = [commands[f - f % period] for f in range(frames)]
+    followed = []
+    index = -1
+    for f in range(frames):
+        # the chunk published in frame p starts at that frame's command
+        while index + 1 < len(chunks) and chunks[index + 1][0] <= f:
+            index += 1
+        p, points = chunks[index]
+        followed.append(hermite(points, (f - p) * dt))
+
+    print(f"trajectory ({args.rate:.0f} Hz control, {args.seconds:.0f} s keyboard jog, chunks {args.chunk_rate:.0f} Hz, "
+          f"horizon {args.horizon * 1000:.0f} ms, points every {args.point_period * 1000:.0f} ms)")
+    seconds = frames * dt
+    rows = [
+        ("point / frame", len(published), points_bytes, (0.0, 0.0)),
+        (f"point {args.chunk_rate:.0f} Hz", frames // period, points_bytes * (frames // period) / len(published),
+         error_deg(held)),
+        ("trajectory", len(chunks), chunk_bytes, error_deg(followed)),
+    ]
+    for name, count, size, (mean_error, max_error) in rows:
+        print(f"  {name:>13}: {count / seconds:6.1f} msg/s, {size / seconds / 1024:6.1f} KiB/s, "
+              f"error mean {mean_error:.3f} deg, max {max_error:.3f} deg")
+    print(f"  chunk build: {statistics.mean(chunk_times) * 1e6:.0f} us "
+          f"({len(chunks[0][1])} points, {len(chunks)} built by tick)")
+
+
+def stick_script(seconds, interval, axis, button_period=2.0):
+    """
+    Left stick stepping to a new deflection every `interval` s, with R1 / L1
+    (speed up / down) presses every `button_period` s in between.
+    """
+    from virtual_joystick import InputScript
+
+    events = []
+    steps = int(seconds / interval)
+    for k in range(steps):
+        # 16 distinct deflections, consecutive steps always differ
+        events.append((k * interval, "axis", axis, -round(0.2 + 0.75 * ((k * 7) % 16) / 15, 3)))
+    presses = int(seconds / button_period)
+    for k in range(1, presses):
+        t = k * button_period + interval / 2
+        button = 10 if k % 2 else 9
+        events.append((t, "button", button, 1))
+        events.append((t + interval / 4, "button", button, 0))
+    return InputScript(events)
+
+
+def input_to_wire_latency(actions, messages, topics):
+    """
+    Latency of every input action: time from the action until the first
+    message on `topics` whose data differs from what was last sent before
+    the action. Actions with no change before the next action are missed.
+    """
+    latencies = []
+    missed = 0
+    last = {}
+    index = 0
+    for i, (t_action, _) in enumerate(actions):
+        while index < len(messages) and messages[index][0] <= t_action:
+            last[messages[index][1]] = messages[index][2]
+            index += 1
+        t_next = actions[i + 1][0] if i + 1 < len(actions) else float("inf")
+        baseline = dict(last)
+        for t, topic, data in messages[index:]:
+            if t >= t_next:
+                missed += 1
+                break
+            if data != baseline.get(topic):
+                latencies.append(t - t_action)
+                break
+        else:
+            missed += 1
+    return latencies, missed
+
+
+def bench_e2e(args):
+    """
+    Input-to-wire latency of the real control path: a scripted virtual
+    joystick drives TeleopControl (the main.py control step) in the fixed-rate
+    ControlLoop, publishing through RosbridgeClient to a stand-in rosbridge.
+    """
+    import json
+    from control_loop import ControlLoop, percentile
+    from fake_rosbridge import FakeRosbridge
+    from iksolver import IKSolver
+    from joystick_handler import JoystickHandler
+    from main import ArmPublisher, TeleopControl, WheelPublisher, BASE_FRAME_RATE
+    from virtual_joystick import InputScript, VirtualJoystick
+    from ws_client import RosbridgeClient
+
+    server = FakeRosbridge().start()
+    client = RosbridgeClient(rosbridge_port=server.port, publish_rate=args.publish_rate)
+    client.connect("127.0.0.1")
+    handler = JoystickHandler()
+    frame_scale = BASE_FRAME_RATE / args.rate
+    handler.arm_move_step *= frame_scale
+    handler.control_period = 1.0 / args.rate
+    ik = IKSolver("robotArm_ver7.urdf", INITIAL_POSE, 6, blend_factor=1.0 - 0.5 ** frame_scale,
+                  ik_backend=args.ik_backend)
+    wheel = WheelPublisher(client, handler.wheel_groups)
+    arm = ArmPublisher(client, handler.arm_topic)
+    wheel.advertise()
+    arm.advertise()
+
+    joystick = VirtualJoystick(instance_id=0)
+    teleop = TeleopControl(handler, ik, wheel, arm, {0: joystick}, JOINT_OFFSET, INITIAL_POSE,
+                           get_pressed=NoKeys)
+    teleop.enabled = True
+    cpu_times = []
+
+    def step():
+        cpu_start = time.thread_time()
+        snapshot = teleop.step()
+        cpu_times.append(time.thread_time() - cpu_start)
+        return snapshot
+
+    if args.script:
+        script = InputScript.load(args.script)
+    else:
+        script = stick_script(args.seconds, args.interval, handler.left_stick_vertical)
+    if args.save_script:
+        script.save(args.save_script)
+        print(f"Input script written to {args.save_script}")
+
+    loop = ControlLoop(step, rate_hz=args.rate).start()
+    # let the arm settle on its initial pose before measuring
+    time.sleep(args.warmup)
+    server.clear()
+    cpu_times.clear()
+    actions = []
+
+    def on_event(t, event):
+        # stick moves and button presses are inputs; releases do nothing
+        if event[1] == "axis" or event[3]:
+            actions.append((t, event))
+
+    player = script.play(joystick, on_button=teleop.press_button, on_event=on_event)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    player.join()
+    time.sleep(args.interval)
+    cpu_used, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    loop.stop()
+    frames = len(cpu_times)
+    client.disconnect()
+    server.stop()
+
+    wheel_topics = tuple(topic for topic, _, _ in handler.wheel_groups)
+    messages = []
+    total_bytes = 0
+    for t, payload in server.messages:
+        total_bytes += len(payload)
+        msg = json.loads(payload)
+        if msg.get("op") == "publish" and msg["topic"] in wheel_topics:
+            messages.append((t, msg["topic"], tuple(msg["msg"]["data"])))
+    latencies, missed = input_to_wire_latency(actions, messages, wheel_topics)
+    latencies.sort()
+    cpu_times.sort()
+    lateness = sorted(player.lateness)
+
+    print(f"e2e ({args.ik_backend} IK, {args.rate:.0f} Hz control, publish {args.publish_rate:.0f} Hz, "
+          f"{len(actions)} input actions over {wall:.1f} s)")
+    print(f"  throughput: {frames / wall:.0f} frames/s, {len(server.messages) / wall:.0f} msg/s, "
+          f"{total_bytes / wall / 1024:.1f} KiB/s on the wire")
+    if latencies:
+        print(f"  input-to-wire: p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms "
+              f"({len(latencies)} measured, {missed} without a wheel change)")
+    print(f"  control step CPU: mean {statistics.mean(cpu_times) * 1e6:.0f} us, "
+          f"p99 {percentile(cpu_times, 0.99) * 1e6:.0f} us per frame" if cpu_times else "  no frames")
+    print(f"  process CPU: {cpu_used / max(frames, 1) * 1e6:.0f} us per frame, {cpu_used / wall * 100:.0f}% "
+          f"of one core (includes sender thread and stand-in server)")
+    print(f"  control: {loop.stats.format_summary()}")
+    if lateness:
+        print(f"  script playback lateness: p99 {percentile(lateness, 0.99) * 1e6:.0f} us")
+
+
+def add_parsers(sub):
+    """Add this module's subcommands to benchmark.py's subparsers."""
+    publish = sub.add_parser("publish", help="publish call latency against a slow stand-in rosbridge")
+    publish.add_argument("--messages", type=int, default=2000)
+    publish.add_argument("--delay-ms", type=float, default=5.0)
+    publish.add_argument("--padding", type=int, default=2000,
+                         help="extra floats per message so the socket buffer fills")
+    publish.add_argument("--queue", type=int, default=256)
+    publish.set_defaults(func=bench_publish)
+
+    traffic = sub.add_parser("traffic", help="websocket traffic with and without coalescing")
+    traffic.add_argument("--rate", type=float, default=100.0)
+    traffic.add_argument("--seconds", type=float, default=3.0)
+    traffic.add_argument("--publish-rate", type=float, default=50.0)
+    traffic.add_argument("--keepalive", type=float, default=1.0)
+    traffic.set_defaults(func=bench_traffic)
+
+    encoding = sub.add_parser("encoding", help="serialization time and size per encoding")
+    encoding.add_argument("--iterations", type=int, default=20000)
+    encoding.set_defaults(func=bench_encoding)
+
+    templates = sub.add_parser("templates", help="per-publish cost of message templates")
+    templates.add_argument("--rate", type=float, default=1000.0)
+    templates.add_argument("--seconds", type=float, default=2.0)
+    templates.set_defaults(func=bench_templates)
+
+    trajectory = sub.add_parser("trajectory", help="arm JointTrajectory chunks against per-frame points")
+    trajectory.add_argument("--rate", type=float, default=100.0, help="control rate (Hz)")
+    trajectory.add_argument("--seconds", type=float, default=10.0)
+    trajectory.add_argument("--chunk-rate", type=float, default=10.0)
+    trajectory.add_argument("--horizon", type=float, default=0.3)
+    trajectory.add_argument("--point-period", type=float, default=0.05)
+    trajectory.add_argument("--tolerance", type=float, default=0.5, help="republish threshold (deg)")
+    trajectory.set_defaults(func=bench_trajectory)
+
+    e2e = sub.add_parser("e2e", help="input-to-wire latency with a virtual joystick and stand-in rosbridge")
+    e2e.add_argument("--ik-backend", default="numpy", choices=["pybullet", "numpy"])
+    e2e.add_argument("--rate", type=float, default=100.0, help="control rate (Hz)")
+    e2e.add_argument("--publish-rate", type=float, default=50.0)
+    e2e.add_argument("--seconds", type=float, default=10.0, help="length of the built-in script")
+    e2e.add_argument("--interval", type=float, default=0.1, help="seconds between stick steps")
+    e2e.add_argument("--warmup", type=float, default=1.0)
+    e2e.add_argument("--script", default=None, help="input script CSV (time,kind,index,value)")
+    e2e.add_argument("--save-script", default=None, help="write the script used to this CSV")
+    e2e.set_defaults(func=bench_e2e)
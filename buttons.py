@@ -0,0 +1,147 @@
+"""
+Button dispatch without blocking.
+
+Controller buttons (and axes used as buttons) map to named actions through
+a table built once from config.csv:
+
+    button,<button id>,<action>,[repeat]
+    axis,<axis id>,<action>,<threshold> [repeat]
+
+An axis counts as a pressed button while its value is beyond the
+threshold (a negative threshold means below it). Without button rows the
+default layout (DEFAULT_BUTTONS) is used.
+
+Presses closer together than `debounce` seconds are ignored. A held
+button or axis marked `repeat` fires again after `repeat_delay` and then
+every `repeat_interval` seconds. All timing uses a clock advanced by the
+control period each step, never sleeps, so the control loop is not
+stalled and a replayed input log repeats identically.
+"""
+
+# action names in the order listed in the README
+BUTTON_ACTIONS = (
+    "forward", "backward", "rotate_counterclockwise", "rotate_clockwise", "stop",
+    "speed_down", "speed_up",
+    "joint_up", "joint_down", "previous_joint", "next_joint", "reset_arm",
+)
+
+# button id -> (action, repeat)
+DEFAULT_BUTTONS = {
+    11: ("forward", False),
+    12: ("backward", False),
+    13: ("rotate_counterclockwise", False),
+    14: ("rotate_clockwise", False),
+    7: ("stop", False),
+    8: ("reset_arm", False),
+    9: ("speed_down", False),
+    10: ("speed_up", False),
+    1: ("joint_up", False),
+    2: ("joint_down", False),
+    3: ("previous_joint", False),
+    0: ("next_joint", False),
+}
+
+
+def parse_button_rows(button_rows, axis_rows):
+    """
+    config.csv `button` / `axis` rows to (buttons, axes):
+    buttons: button id -> (action, repeat)
+    axes: axis id -> (action, threshold, repeat)
+    Invalid rows are reported and skipped.
+    """
+    buttons, axes = {}, {}
+    for row in button_rows:
+        try:
+            options = (row.get("value2") or "").split()
+            buttons[int(row["param"])] = (row["value1"].strip(), "repeat" in options)
+        except (ValueError, KeyError, AttributeError):
+            print(f"Invalid button row {row}, skipped.")
+    for row in axis_rows:
+        try:
+            options = (row.get("value2") or "").split()
+            thresholds = [float(o) for o in options if o != "repeat"]
+            axes[int(row["param"])] = (row["value1"].strip(), thresholds[0] if thresholds else 0.5,
+                                       "repeat" in options)
+        except (ValueError, KeyError, AttributeError):
+            print(f"Invalid axis row {row}, skipped.")
+    return buttons, axes
+
+
+class ButtonDispatcher:
+    def __init__(self, actions, buttons=None, axes=None, debounce=0.03,
+                 repeat_delay=0.4, repeat_interval=0.1):
+        """
+        actions: action name -> callable(wheel_publish_callback, arm_publish_callback)
+        buttons: button id -> (action name, repeat), DEFAULT_BUTTONS when None
+        axes: axis id -> (action name, threshold, repeat)
+        debounce: presses of a button closer than this (s) are ignored
+        repeat_delay / repeat_interval: auto-repeat timing of held buttons (s)
+        """
+        self.debounce = debounce
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.table = {}         # button id -> (action callable, repeat)
+        for button, (name, repeat) in (DEFAULT_BUTTONS if buttons is None else buttons).items():
+            if name not in actions:
+                print(f"Unknown action '{name}' for button {button}, skipped.")
+                continue
+            self.table[button] = (actions[name], repeat)
+        self.axis_table = []    # (axis id, threshold, action callable, repeat)
+        for axis, (name, threshold, repeat) in (axes or {}).items():
+            if name not in actions:
+                print(f"Unknown action '{name}' for axis {axis}, skipped.")
+                continue
+            self.axis_table.append((axis, threshold, actions[name], repeat))
+        self.last_press = {}    # button id -> time of the last accepted press
+        self.held = {}          # held repeat button id -> time of its next repeat
+        self.axis_held = {}     # pressed axis id -> time of its next repeat (None: no repeat)
+        self.presses = 0
+        self.repeats = 0
+
+    def press(self, button, now, wheel_publish_callback, arm_publish_callback):
+        """A button-down event at time `now`. Returns True when an action ran."""
+        entry = self.table.get(button)
+        if entry is None:
+            return False
+        last = self.last_press.get(button)
+        if last is not None and now - last < self.debounce:
+            return False
+        self.last_press[button] = now
+        action, repeat = entry
+        action(wheel_publish_callback, arm_publish_callback)
+        self.presses += 1
+        if repeat:
+            self.held[button] = now + self.repeat_delay
+        return True
+
+    def update(self, now, joysticks, wheel_publish_callback, arm_publish_callback):
+        """Auto-repeat held buttons and fire axis buttons; call once per step."""
+        if self.held:
+            for button in list(self.held):
+                if not any(button < joystick.get_numbuttons() and joystick.get_button(button)
+                           for joystick in joysticks.values()):
+                    del self.held[button]
+                elif now >= self.held[button]:
+                    self.held[button] = self._next_repeat(self.held[button], now)
+                    self.table[button][0](wheel_publish_callback, arm_publish_callback)
+                    self.repeats += 1
+        for axis, threshold, action, repeat in self.axis_table:
+            pressed = any(axis < joystick.get_numaxes() and
+                          (joystick.get_axis(axis) >= threshold if threshold >= 0
+                           else joystick.get_axis(axis) <= threshold)
+                          for joystick in joysticks.values())
+            if not pressed:
+                self.axis_held.pop(axis, None)
+            elif axis not in self.axis_held:
+                action(wheel_publish_callback, arm_publish_callback)
+                self.presses += 1
+                self.axis_held[axis] = now + self.repeat_delay if repeat else None
+            elif self.axis_held[axis] is not None and now >= self.axis_held[axis]:
+                self.axis_held[axis] = self._next_repeat(self.axis_held[axis], now)
+                action(wheel_publish_callback, arm_publish_callback)
+                self.repeats += 1
+
+    def _next_repeat(self, due, now):
+        due += self.repeat_interval
+        # after a long step, continue from now instead of firing to catch up
+        return due if due > now else now + self.repeat_interval
@@ -0,0 +1,252 @@
+"""
+Self-collision checking with bounding capsules.
+
+Every link with a mesh gets one capsule (a segment and a radius) that
+encloses all vertices of its STL mesh, fitted once along the mesh's
+principal axis. A configuration collides when the capsules of any checked
+link pair overlap: one batched forward kinematics call and a vectorized
+segment-segment distance, so a batch of candidate configurations (e.g.
+the samples along a move) costs tens of microseconds per configuration.
+
+Pairs that can never be separated are not checked: links joined by a
+joint, and links whose capsules already overlap in the URDF zero pose
+(the assembled CAD pose, where touching parts are meant to touch), within
+CONTACT_TOLERANCE since the capsules are larger than the meshes.
+
+Fitting reads every STL mesh, so the capsules are stored in the compiled
+robot model cache (model_cache.py) and refitted only when the URDF or a
+mesh changes:
+    python collision.py fit --urdf robotArm_ver7.urdf
+    python collision.py check --urdf robotArm_ver7.urdf 0 -80 90 90 0 0 0 0 0 0
+"""
+import argparse
+import math
+import os
+import time
+import xml.etree.ElementTree as ET
+import numpy as np
+from kinematics import RobotModel, origin_transform, _parse_floats
+
+# capsules closer than this in the zero pose count as touching there (m);
+# they enclose the meshes loosely, so parts that touch in CAD end up a few mm apart
+CONTACT_TOLERANCE = 0.01
+
+_STL_DTYPE = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+
+def read_stl(path):
+    """Vertices (N, 3) of a binary or ASCII STL file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) >= 84:
+        count = int(np.frombuffer(data, dtype="<u4", count=1, offset=80)[0])
+        if 84 + count * _STL_DTYPE.itemsize == len(data):
+            triangles = np.frombuffer(data, dtype=_STL_DTYPE, count=count, offset=84)
+            return triangles["vertices"].reshape(-1, 3).astype(np.float64)
+    vertices = [line.split()[1:4] for line in data.decode("ascii", "replace").splitlines()
+                if line.strip().startswith("vertex")]
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3)
+
+
+def fit_capsule(points):
+    """
+    Capsule (p0, p1, radius) enclosing `points` (N, 3): the segment lies on
+    the principal axis and is as short as the radius allows.
+    """
+    center = points.mean(axis=0)
+    _, _, vt = np.linalg.svd(points - center, full_matrices=False)
+    axis, u, v = vt[0], vt[1], vt[2]
+    rel = points - center
+    # centre the axis on the cross-section's bounding box
+    pu, pv = rel @ u, rel @ v
+    center = center + u * 0.5 * (pu.max() + pu.min()) + v * 0.5 * (pv.max() + pv.min())
+    rel = points - center
+    t = rel @ axis
+    perp = np.linalg.norm(rel - t[:, None] * axis, axis=1)
+    radius = float(perp.max())
+    # a point is covered when its distance past the segment end fits under the cap
+    slack = np.sqrt(np.maximum(radius * radius - perp * perp, 0.0))
+    t0, t1 = float((t + slack).min()), float((t - slack).max())
+    if t0 > t1:
+        t0 = t1 = 0.5 * (t0 + t1)
+    return center + t0 * axis, center + t1 * axis, radius
+
+
+def _unit(x):
+    # np.clip(x, 0, 1) with less call overhead on small arrays
+    return np.minimum(np.maximum(x, 0.0), 1.0)
+
+
+def segment_distances(p1, q1, p2, q2):
+    """Closest distances (...) between segments p1-q1 and p2-q2 (..., 3)."""
+    # all dot products of d1, d2, r in one matmul; the rest is elementwise
+    vectors = np.stack([q1 - p1, q2 - p2, p1 - p2], axis=-2)
+    gram = vectors @ np.swapaxes(vectors, -1, -2)
+    a, e, rr = gram[..., 0, 0], gram[..., 1, 1], gram[..., 2, 2]
+    b, c, f = gram[..., 0, 1], gram[..., 0, 2], gram[..., 1, 2]
+    a_safe, e_safe = np.maximum(a, 1e-12), np.maximum(e, 1e-12)
+    # closest point parameters of the infinite lines, s clamped to the first segment
+    denom = a * e - b * b
+    s = _unit((b * f - c * e) / np.maximum(denom, 1e-12))
+    # clamp t to the second segment and recompute s for the clamped t
+    t = _unit((b * s + f) / e_safe)
+    s = _unit((b * t - c) / a_safe)
+    # |r + s d1 - t d2|^2 expanded with the dot products
+    squared = rr + s * (s * a + 2.0 * c) + t * (t * e - 2.0 * f) - 2.0 * s * t * b
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def link_meshes(urdf_path):
+    """link name -> (mesh path, 4x4 mesh-to-link transform, scale) of its collision mesh."""
+    root = ET.parse(urdf_path).getroot()
+    base_dir = os.path.dirname(os.path.abspath(urdf_path))
+    meshes = {}
+    for link in root.findall("link"):
+        element = link.find("collision")
+        if element is None:
+            element = link.find("visual")
+        mesh = element.find("geometry/mesh") if element is not None else None
+        if mesh is None:
+            continue
+        filename = mesh.attrib["filename"]
+        if filename.startswith("package://"):
+            filename = filename[len("package://"):]
+        origin = element.find("origin")
+        xyz = _parse_floats(origin.attrib.get("xyz") if origin is not None else None, (0, 0, 0))
+        rpy = _parse_floats(origin.attrib.get("rpy") if origin is not None else None, (0, 0, 0))
+        scale = _parse_floats(mesh.attrib.get("scale"), (1, 1, 1))
+        meshes[link.attrib["name"]] = (os.path.join(base_dir, filename), origin_transform(xyz, rpy), scale)
+    return meshes
+
+
+class SelfCollision:
+    def __init__(self, model, links, starts, ends, radii, pairs, margin=0.0):
+        """
+        model: RobotModel of the arm
+        links: link index per capsule, -1 for the base link
+        starts / ends: (C, 3) capsule segment ends in the link frame
+        radii: (C,) capsule radii
+        pairs: (P, 2) capsule index pairs that are checked
+        margin: extra clearance (m) required between capsules
+        """
+        self.model = model
+        self.links = np.asarray(links, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        self.pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        self.margin = margin
+        self._reach = self.radii[self.pairs[:, 0]] + self.radii[self.pairs[:, 1]]
+        # homogeneous segment ends, transformed by the link frames in one matmul
+        self._points = np.ones((len(self.links), 4, 2))
+        self._points[:, :3, 0] = self.starts
+        self._points[:, :3, 1] = self.ends
+        self._base = np.eye(4)
+        self._base[:3, 3] = model.base_offset
+
+    @classmethod
+    def build(cls, model, urdf_path, margin=0.0):
+        """Fit capsules to the STL meshes of `urdf_path` and pick the checked pairs."""
+        index = {name: i for i, name in enumerate(model.link_names)}
+        links, starts, ends, radii = [], [], [], []
+        for name, (path, transform, scale) in link_meshes(urdf_path).items():
+            # the one link that is no joint's child is the base
+            link = index.get(name, -1)
+            if link < 0 and -1 in links:
+                continue
+            vertices = read_stl(path) * scale
+            vertices = vertices @ transform[:3, :3].T + transform[:3, 3]
+            p0, p1, radius = fit_capsule(vertices)
+            links.append(link)
+            starts.append(p0)
+            ends.append(p1)
+            radii.append(radius)
+        links = np.array(links, dtype=np.int64)
+        parents = np.append(model.parents, -2)   # parent of the base (-1) is none
+        pairs = []
+        for i in range(len(links)):
+            for j in range(i + 1, len(links)):
+                a, b = links[i], links[j]
+                if parents[a] == b or parents[b] == a:
+                    continue
+                pairs.append((i, j))
+        checker = cls(model, links, starts, ends, radii, pairs, margin)
+        # drop the pairs that already touch in the assembled (zero) pose
+        touching = checker.clearances(np.zeros(model.num_joints)) < CONTACT_TOLERANCE
+        checker.__init__(model, links, starts, ends, radii, checker.pairs[~touching], margin)
+        return checker
+
+    def clearances(self, joint_angles):
+        """
+        Distance (m) between the capsules of every checked pair for joint
+        angles (..., J); negative when they overlap.
+        """
+        frames = self.model.all_link_frames(joint_angles)
+        base = np.broadcast_to(self._base, frames.shape[:-3] + (1, 4, 4))
+        frames = np.concatenate([frames, base], axis=-3)   # index -1 is the base link
+        points = (frames[..., self.links, :3, :] @ self._points)     # (..., C, 3, 2)
+        first, second = points[..., self.pairs[:, 0], :, :], points[..., self.pairs[:, 1], :, :]
+        distance = segment_distances(first[..., 0], first[..., 1], second[..., 0], second[..., 1])
+        return distance - self._reach
+
+    def in_collision(self, joint_angles):
+        """True (or a (N,) bool array for a batch) where any checked pair is closer than the margin."""
+        return (self.clearances(joint_angles) < self.margin).any(axis=-1)
+
+    def colliding_pairs(self, joint_angles):
+        """Link name pairs in collision for one configuration."""
+        names = self.model.link_names + ["base_link"]
+        hits = self.clearances(joint_angles) < self.margin
+        return [(names[self.links[i]], names[self.links[j]]) for i, j in self.pairs[hits]]
+
+
+def collision_settings(config):
+    """
+    SelfCollision keyword arguments from the global config (collision_margin
+    in metres), or None when self_collision is off (the default).
+    """
+    if (config.get("self_collision") or "false").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    try:
+        margin = float(config.get("collision_margin") or 0.0)
+    except ValueError:
+        print(f"Invalid collision_margin '{config.get('collision_margin')}' in config, using 0.")
+        margin = 0.0
+    return {"margin": margin}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Self-collision capsules of a URDF arm")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit", help="fit the capsules to the meshes and list them")
+    fit.add_argument("--urdf", default="robotArm_ver7.urdf")
+    check = sub.add_parser("check", help="check one configuration (degrees)")
+    check.add_argument("--urdf", default="robotArm_ver7.urdf")
+    check.add_argument("angles", type=float, nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "fit":
+        model = RobotModel.from_urdf(args.urdf)
+        start = time.perf_counter()
+        checker = SelfCollision.build(model, args.urdf)
+        print(f"{len(checker.links)} capsules, {len(checker.pairs)} checked pairs, "
+              f"fitted in {time.perf_counter() - start:.2f} s")
+        names = model.link_names + ["base_link"]
+        for link, p0, p1, radius in zip(checker.links, checker.starts, checker.ends, checker.radii):
+            print(f"  {names[link]:>10}: length {np.linalg.norm(p1 - p0) * 1000:5.1f} mm, "
+                  f"radius {radius * 1000:5.1f} mm")
+    else:
+        from model_cache import load_robot
+        robot = load_robot(args.urdf)
+        checker = robot.self_collision()
+        if checker is None:
+            print("no collision capsules (meshes missing)")
+            return
+        angles = [math.radians(a) for a in args.angles]
+        angles += [0.0] * (robot.model.num_joints - len(angles))
+        pairs = checker.colliding_pairs(angles)
+        print("collision: " + ", ".join(f"{a}-{b}" for a, b in pairs) if pairs else "no collision")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Fixed-rate control loop running in its own thread.
+
+The control step (input sampling, wheel mixing, IK, publishing) runs on
+absolute deadlines so a slow UI frame cannot stretch the control period.
+Each step returns an immutable snapshot; the UI thread reads the latest
+one without locking (rebinding an attribute is atomic).
+"""
+import collections
+import sys
+import threading
+import time
+
+ControlSnapshot = collections.namedtuple(
+    "ControlSnapshot", ["velocity", "arm_index", "arm_angles", "wheel_speed", "timestamp"])
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LoopStats:
+    def __init__(self, target_period, window=1000):
+        """
+        target_period: intended loop period (s)
+        window: number of recent iterations kept for percentiles
+        """
+        self.target_period = target_period
+        self.periods = collections.deque(maxlen=window)
+        self.work_times = collections.deque(maxlen=window)
+        self.iterations = 0
+        self.overruns = 0
+        self.last_start = None
+
+    def record(self, start, work_time):
+        """Record one iteration that started at `start` and worked `work_time` s."""
+        if self.last_start is not None:
+            self.periods.append(start - self.last_start)
+        self.last_start = start
+        self.work_times.append(work_time)
+        self.iterations += 1
+        if work_time > self.target_period:
+            self.overruns += 1
+
+    def summary(self):
+        """Period, jitter (|period - target|) and work time statistics in seconds."""
+        # the control thread appends while the UI thread reads: list() copies
+        # a deque in one C call (atomic under the GIL), iterating it is not
+        periods = list(self.periods)
+        work = sorted(list(self.work_times))
+        jitter = sorted(abs(period - self.target_period) for period in periods)
+        periods.sort()
+        mean_period = sum(periods) / len(periods) if periods else 0.0
+        return {
+            "iterations": self.iterations,
+            "overruns": self.overruns,
+            "target_period": self.target_period,
+            "mean_period": mean_period,
+            "rate_hz": 1.0 / mean_period if mean_period else 0.0,
+            "jitter_p50": percentile(jitter, 0.50),
+            "jitter_p95": percentile(jitter, 0.95),
+            "jitter_p99": percentile(jitter, 0.99),
+            "jitter_max": jitter[-1] if jitter else 0.0,
+            "work_p50": percentile(work, 0.50),
+            "work_p99": percentile(work, 0.99),
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        return (f"{s['rate_hz']:.1f} Hz (target {1.0 / s['target_period']:.0f} Hz), "
+                f"jitter p50 {s['jitter_p50'] * 1000:.2f} ms p95 {s['jitter_p95'] * 1000:.2f} ms "
+                f"p99 {s['jitter_p99'] * 1000:.2f} ms, work p99 {s['work_p99'] * 1000:.2f} ms, "
+                f"overruns {s['overruns']}/{s['iterations']}")
+
+
+class ControlLoop:
+    def __init__(self, step, rate_hz=100.0, name="control-loop"):
+        """
+        step: callable run once per period, returning a snapshot (or None to
+            keep the previous one)
+        rate_hz: loop rate
+        """
+        self.step = step
+        self.rate_hz = float(rate_hz)
+        self.period = 1.0 / self.rate_hz
+        self.stats = LoopStats(self.period)
+        self.snapshot = None
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        # CPython hands the GIL between threads every switch interval (5 ms by
+        # default); keep it well below the period so a busy UI thread cannot
+        # hold the control thread off for a whole period
+        sys.setswitchinterval(min(sys.getswitchinterval(), self.period / 10))
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                snapshot = self.step()
+            except Exception as e:
+                self.error = e
+                print(f"Control loop stopped: {e!r}")
+                raise
+            if snapshot is not None:
+                self.snapshot = snapshot
+            now = time.perf_counter()
+            self.stats.record(start, now - start)
+
+            # absolute deadlines; after an overrun skip the missed ticks
+            # instead of running them back to back
+            deadline += self.period
+            if now > deadline:
+                deadline = now + self.period - (now - deadline) % self.period
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                self._stop.wait(remaining)
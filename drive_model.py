@@ -0,0 +1,131 @@
+"""
+Drive kinematics models.
+
+A drive model is a mixing matrix from the commanded motion
+[vertical (forward), horizontal (right), rotational (clockwise)], each in
+-1..1, to one output per wheel (or steering joint). Outputs are multiplied
+by the current velocity, except fixed outputs such as a steering angle.
+
+Built-in models (outputs in order):
+
+    mecanum       front left, front right, rear left, rear right
+    skid_steer    front left, front right, rear left, rear right (no strafing)
+    differential  left, right
+    omni          front left, front right, rear (three-wheel kiwi drive)
+    ackermann     rear left, rear right, steering angle (rad, positive
+                  turns left; steered with the horizontal stick)
+
+A custom model is read from `drive` rows in config.csv, one per output
+with its coefficients in value1 and "fixed" in value2 when the output is
+not scaled by velocity:
+
+    global,drive_model,custom,
+    drive,1,1 0 1,
+    drive,2,1 0 -1,
+    drive,3,0 -0.5 0,fixed
+"""
+import math
+
+MOTION_AXES = ("vertical", "horizontal", "rotational")
+
+
+class DriveModel:
+    def __init__(self, name, matrix, fixed=None):
+        """
+        matrix: one [vertical, horizontal, rotational] coefficient row per output
+        fixed: per output, True when it is not scaled by velocity
+        """
+        self.name = name
+        self.matrix = tuple(tuple(float(c) for c in row) for row in matrix)
+        if any(len(row) != len(MOTION_AXES) for row in self.matrix):
+            raise ValueError(f"Drive model '{name}' rows need {len(MOTION_AXES)} coefficients")
+        self.fixed = tuple(bool(f) for f in fixed) if fixed is not None else (False,) * len(self.matrix)
+        # (vertical, horizontal, rotational, velocity scaled) per output
+        self._rows = tuple(row + (not f,) for row, f in zip(self.matrix, self.fixed))
+
+    @property
+    def outputs(self):
+        return len(self.matrix)
+
+    def apply(self, vertical, horizontal, rotational, velocity):
+        """Output commands (list of floats) for one motion command."""
+        return [(a * vertical + b * horizontal + c * rotational) * (velocity if scaled else 1.0)
+                for a, b, c, scaled in self._rows]
+
+    def stop(self):
+        return [0.0] * self.outputs
+
+
+def mecanum():
+    return DriveModel("mecanum", [[1, 1, 1],
+                                  [1, -1, -1],
+                                  [1, -1, 1],
+                                  [1, 1, -1]])
+
+
+def skid_steer():
+    return DriveModel("skid_steer", [[1, 0, 1],
+                                     [1, 0, -1],
+                                     [1, 0, 1],
+                                     [1, 0, -1]])
+
+
+def differential():
+    return DriveModel("differential", [[1, 0, 1],
+                                       [1, 0, -1]])
+
+
+def omni(wheel_angles_deg=(60.0, -60.0, 180.0)):
+    """
+    Kiwi drive: wheel i sits at wheel_angles_deg[i] around the centre
+    (0 = straight ahead, counterclockwise positive) and rolls tangentially.
+    """
+    rows = []
+    for angle in wheel_angles_deg:
+        theta = math.radians(angle)
+        # forward x, left y, counterclockwise spin; horizontal is +right, rotational is +clockwise
+        rows.append([round(-math.sin(theta), 12), round(-math.cos(theta), 12), -1.0])
+    return DriveModel("omni", rows)
+
+
+def ackermann(max_steer_deg=30.0):
+    steer = math.radians(max_steer_deg)
+    return DriveModel("ackermann", [[1, 0, 0],
+                                    [1, 0, 0],
+                                    [0, -steer, 0]],
+                      fixed=[False, False, True])
+
+
+DRIVE_MODELS = {
+    "mecanum": mecanum,
+    "skid_steer": skid_steer,
+    "differential": differential,
+    "omni": omni,
+    "ackermann": ackermann,
+}
+
+
+def load_drive_model(name="mecanum", drive_rows=(), max_steer_deg=30.0):
+    """
+    Build the configured model. drive_rows are config.csv rows of type
+    `drive` (used when name is "custom"). Falls back to mecanum with a
+    message on errors.
+    """
+    name = (name or "mecanum").strip().lower()
+    if name == "custom":
+        try:
+            rows = sorted(drive_rows, key=lambda row: int(row["param"]))
+            if not rows:
+                raise ValueError("no drive rows in config")
+            return DriveModel("custom",
+                              [[float(c) for c in row["value1"].split()] for row in rows],
+                              [(row.get("value2") or "").strip().lower() == "fixed" for row in rows])
+        except (ValueError, KeyError) as e:
+            print(f"Invalid custom drive model: {e}, using mecanum.")
+            return mecanum()
+    if name == "ackermann":
+        return ackermann(max_steer_deg)
+    if name not in DRIVE_MODELS:
+        print(f"Unknown drive model '{name}', using mecanum.")
+        return mecanum()
+    return DRIVE_MODELS[name]()
@@ -0,0 +1,42 @@
+"""
+Wire encoding for rosbridge messages: compact JSON text frames (the only
+encoding rosbridge decodes from a publishing client) and pre-encoded
+message templates.
+"""
+import json
+
+
+class JsonEncoder:
+    def __init__(self):
+        # one encoder instance: json.dumps with non-default arguments builds
+        # a new JSONEncoder on every call
+        self.encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class MessageTemplate:
+    """
+    Pre-encoded publish message for one topic. Everything except one data
+    field is encoded once; render() only encodes the data and splices it
+    between the cached prefix and suffix.
+    """
+    MARKER = "\x00template-data\x00"
+
+    def __init__(self, encoder, topic, msg, field="data"):
+        """
+        encoder: JsonEncoder (or any encoder with encode()) used for the whole message
+        msg: static message body; the value of `field` is ignored
+        """
+        self.encoder = encoder
+        self.topic = topic
+        self.field = field
+        body = dict(msg)
+        body[field] = self.MARKER
+        encoded = encoder.encode({"op": "publish", "topic": topic, "msg": body})
+        marker = encoder.encode(self.MARKER)
+        if encoded.count(marker) != 1:
+            raise ValueError(f"Template for {topic} must contain field '{field}' exactly once")
+        self.prefix, self.suffix = encoded.split(marker)
+        self.encode_data = encoder.encode
+
+    def render(self, data):
+        return self.prefix + self.encode_data(data) + self.suffix
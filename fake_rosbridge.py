@@ -0,0 +1,221 @@
+"""
+Minimal stand-in rosbridge websocket server (standard library only).
+
+Accepts websocket clients, records every message they send with its
+arrival time and can simulate a slow link. Used to exercise
+RosbridgeClient and the benchmarks without ROS.
+
+    python fake_rosbridge.py --port 9090 [--delay-ms 50] [--quiet]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+_WS_MAGIC = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY = 0x0, 0x1, 0x2
+OP_CLOSE, OP_PING, OP_PONG = 0x8, 0x9, 0xA
+
+
+class FakeRosbridge:
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, on_message=None):
+        """
+        port: 0 picks a free port, see `port` after start()
+        delay: seconds to stall after every received message (slow link)
+        on_message: optional callback(timestamp, payload) per message
+        """
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.on_message = on_message
+        self.messages = []           # (arrival perf_counter, payload str or bytes)
+        self.connections = 0
+        self._cond = threading.Condition()
+        self._server = None
+        self._clients = []
+        self._running = False
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, name="fake-rosbridge", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        try:
+            # shutdown wakes the accept() blocked in the server thread
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        self.drop_clients()
+
+    def drop_clients(self):
+        """Close every client connection (simulates a dropped link)."""
+        with self._cond:
+            clients, self._clients = self._clients, []
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+
+    def wait_for(self, count, timeout=5.0):
+        """Wait until at least `count` messages arrived. Returns True on success."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.messages) >= count, timeout)
+
+    def decoded_messages(self):
+        """Received text frames decoded as JSON (rosbridge ignores binary frames)."""
+        with self._cond:
+            return [json.loads(payload) for _, payload in self.messages if isinstance(payload, str)]
+
+    def clear(self):
+        with self._cond:
+            self.messages.clear()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._cond:
+                self._clients.append(conn)
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            reader = conn.makefile("rb")
+            if not self._handshake(conn, reader):
+                return
+            fragments, fragment_op = [], None
+            while self._running:
+                fin, opcode, payload = self._read_frame(reader)
+                if opcode is None or opcode == OP_CLOSE:
+                    return
+                if opcode == OP_PING:
+                    conn.sendall(_frame(OP_PONG, payload))
+                    continue
+                if opcode == OP_PONG:
+                    continue
+                if opcode != OP_CONTINUATION:
+                    fragment_op = opcode
+                fragments.append(payload)
+                if not fin:
+                    continue
+                data = b"".join(fragments)
+                fragments = []
+                message = data.decode("utf-8") if fragment_op == OP_TEXT else data
+                now = time.perf_counter()
+                with self._cond:
+                    self.messages.append((now, message))
+                    self._cond.notify_all()
+                if self.on_message is not None:
+                    self.on_message(now, message)
+                if self.delay:
+                    time.sleep(self.delay)
+        except (OSError, ValueError):
+            return
+        finally:
+            with self._cond:
+                if conn in self._clients:
+                    self._clients.remove(conn)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _handshake(self, conn, reader):
+        headers = {}
+        request_line = reader.readline()
+        if not request_line:
+            return False
+        while True:
+            line = reader.readline()
+            if not line or line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            conn.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1(key.encode() + _WS_MAGIC).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    def _read_frame(self, reader):
+        header = reader.read(2)
+        if len(header) < 2:
+            return True, None, None
+        b0, b1 = header
+        fin = bool(b0 & 0x80)
+        opcode = b0 & 0x0F
+        length = b1 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", reader.read(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", reader.read(8))[0]
+        mask = reader.read(4) if b1 & 0x80 else None
+        payload = reader.read(length)
+        if len(payload) < length:
+            return True, None, None
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+
+def _frame(opcode, payload):
+    """Unmasked server-to-client frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in rosbridge websocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--delay-ms", type=float, default=0.0,
+                        help="stall after each message to simulate a slow link")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    def show(timestamp, message):
+        if not args.quiet:
+            print(message if isinstance(message, str) else f"<{len(message)} bytes binary frame>")
+
+    server = FakeRosbridge(args.host, args.port, args.delay_ms / 1000.0, show).start()
+    print(f"Fake rosbridge listening on ws://{args.host}:{server.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"{len(server.messages)} messages from {server.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
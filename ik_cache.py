@@ -0,0 +1,111 @@
+"""
+LRU cache of IK solutions.
+
+Operators jog the arm back and forth between a handful of positions, so
+the same targets are solved again and again. Solutions are cached by the
+target position quantized to `resolution` (m) and optionally the seed's
+chain joint angles quantized to `seed_resolution` (degrees), so only
+solutions reached from a similar posture are reused. A hit starts IK from
+the cached joint angles and only polishes it with `polish_iterations`
+iterations onto the exact target.
+
+Without the seed bucket a position always returns to the same posture,
+which may be a different IK branch than the arm is in, so a hit can swing
+the joints far from where they are. The seed bucket keeps hits on the
+current branch at the cost of fewer hits.
+"""
+import collections
+import math
+
+
+class IKCache:
+    def __init__(self, resolution=0.005, size=256, seed_resolution_deg=20.0, polish_iterations=5):
+        """
+        resolution: target position bucket size (m)
+        size: maximum number of cached solutions (least recently used are dropped)
+        seed_resolution_deg: seed joint angle bucket size (degrees), 0 ignores the seed
+        polish_iterations: IK iterations from a cached solution
+        """
+        self.resolution = float(resolution)
+        self.size = int(size)
+        self.seed_resolution = math.radians(seed_resolution_deg) if seed_resolution_deg else 0.0
+        self.polish_iterations = int(polish_iterations)
+        self.entries = collections.OrderedDict()   # key -> (joint angles, solve time)
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def key(self, target, seed, chain_indices):
+        """Cache key of a target (x, y, z) solved from `seed` (radians)."""
+        resolution = self.resolution
+        key = tuple(int(math.floor(t / resolution)) for t in target)
+        if self.seed_resolution:
+            key += tuple(int(math.floor(seed[i] / self.seed_resolution)) for i in chain_indices)
+        return key
+
+    def get(self, key):
+        """Cached (joint angles, solve time) for `key`, or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, joint_angles, solve_time):
+        self.entries[key] = (list(joint_angles), solve_time)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def record_hit_time(self, solve_time, polish_time):
+        """Account a hit that polished in `polish_time` instead of `solve_time`."""
+        self.time_saved += solve_time - polish_time
+
+    def settings(self):
+        """Constructor arguments, e.g. for an input log header."""
+        return {
+            "resolution": self.resolution,
+            "size": self.size,
+            "seed_resolution_deg": math.degrees(self.seed_resolution),
+            "polish_iterations": self.polish_iterations,
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "time_saved": self.time_saved,
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        return (f"cache {s['hit_rate'] * 100:.0f}% hits ({s['hits']}/{s['hits'] + s['misses']}), "
+                f"{s['entries']} entries, saved {s['time_saved'] * 1000:.1f} ms")
+
+
+def load_ik_cache(config):
+    """
+    IKCache from the global config (ik_cache_size, ik_cache_resolution,
+    ik_cache_seed_resolution, ik_cache_polish), or None when the size is 0.
+    """
+    def number(name, default):
+        try:
+            return float(config.get(name) or default)
+        except ValueError:
+            print(f"Invalid {name} '{config.get(name)}' in config, using {default}.")
+            return default
+    size = int(number("ik_cache_size", 0))
+    if size <= 0:
+        return None
+    return IKCache(resolution=number("ik_cache_resolution", 0.005),
+                   size=size,
+                   seed_resolution_deg=number("ik_cache_seed_resolution", 20.0),
+                   polish_iterations=int(number("ik_cache_polish", 5)))
@@ -0,0 +1,151 @@
+"""
+IK for several arms in parallel, one worker process per arm.
+
+Each worker owns an IKSolver (and with the pybullet backend its own
+physics client), so solver state such as the previous joint angles and
+the IK cache stays in the worker between calls. call_all() sends every
+request before waiting for any reply, so the arms are solved concurrently
+on separate cores.
+
+    arms = {
+        "arm": dict(urdf_path="robotArm_ver7.urdf", end_effector_index=6,
+                    initial_joint_angles_deg=[0, -80, 90, 90, 0, 0, 0, 0, 0, 0]),
+        "robot": dict(urdf_path="robot_ver7.urdf", end_effector_index=4,
+                      initial_joint_angles_deg=[0, -80, 90, 90, 0, 0, 0, 0]),
+    }
+    with IKService(arms) as service:
+        angles = service.step({"arm": (0.01, 0, 0), "robot": (0, 0, -0.01)})
+        solutions = service.solve_batch({"arm": targets_a, "robot": targets_b})
+"""
+import multiprocessing
+
+from iksolver import IKSolver
+
+
+def _step(solver, dx=0.0, dy=0.0, dz=0.0):
+    """One control frame: solve for the offset (if any) and move the joints."""
+    if (dx, dy, dz) != (0, 0, 0):
+        solver.solve(dx, dy, dz)
+    return solver.update()
+
+
+def _serve(conn, solver_args):
+    """Worker loop: build the solver, then answer (method, args, kwargs) requests until None."""
+    try:
+        solver = IKSolver(**solver_args)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ok", None))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            if method == "step":
+                result = _step(solver, *args, **kwargs)
+            elif method.startswith("_"):
+                raise AttributeError(f"'{method}' is not a solver method")
+            else:
+                result = getattr(solver, method)(*args, **kwargs)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+        conn.send(("ok", result))
+    solver.close()
+    conn.close()
+
+
+class IKService:
+    def __init__(self, arms, start_method="spawn"):
+        """
+        arms: name -> IKSolver keyword arguments (urdf_path,
+            initial_joint_angles_deg, end_effector_index, ...)
+        start_method: multiprocessing start method; "spawn" gives every
+            worker a fresh interpreter (no inherited pybullet state)
+        """
+        context = multiprocessing.get_context(start_method)
+        self.workers = {}
+        for name, solver_args in arms.items():
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=_serve, args=(child_conn, solver_args),
+                                      name=f"ik-{name}", daemon=True)
+            process.start()
+            child_conn.close()
+            self.workers[name] = (process, conn)
+        try:
+            # the workers load their robots in parallel; wait for all of them
+            for name in self.workers:
+                self._receive(name)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def arms(self):
+        return list(self.workers)
+
+    def _receive(self, name):
+        process, conn = self.workers[name]
+        try:
+            status, result = conn.recv()
+        except EOFError:
+            raise RuntimeError(f"IK worker '{name}' exited (code {process.exitcode})") from None
+        if status != "ok":
+            raise RuntimeError(f"IK worker '{name}': {result}")
+        return result
+
+    def call_all(self, calls):
+        """
+        Run solver methods on several arms concurrently.
+        calls: name -> (method, args) or (method, args, kwargs)
+        Returns name -> result.
+        """
+        for name, call in calls.items():
+            method, args = call[0], tuple(call[1])
+            kwargs = call[2] if len(call) > 2 else {}
+            self.workers[name][1].send((method, args, kwargs))
+        return {name: self._receive(name) for name in calls}
+
+    def call(self, name, method, *args, **kwargs):
+        """Run one solver method on one arm and wait for the result."""
+        return self.call_all({name: (method, args, kwargs)})[name]
+
+    def step(self, offsets):
+        """
+        One control frame for several arms: name -> (dx, dy, dz) end-effector
+        offset. Returns name -> joint angles (radians) after update().
+        """
+        return self.call_all({name: ("step", offset) for name, offset in offsets.items()})
+
+    def solve_batch(self, targets, seeds=None):
+        """
+        IKSolver.solve_batch for several arms: name -> targets (N, 3).
+        seeds: optional name -> seeds. Returns name -> (joint_angles, converged).
+        """
+        seeds = seeds or {}
+        return self.call_all({name: ("solve_batch", (arm_targets, seeds.get(name)))
+                              for name, arm_targets in targets.items()})
+
+    def close(self):
+        for name, (process, conn) in self.workers.items():
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for name, (process, conn) in self.workers.items():
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self.workers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,19 +1,58 @@
-import pybullet as p
-import pybullet_data
-import xml.etree.ElementTree as ET
 import math
 import time
+import numpy as np
+from model_cache import load_robot
+from workspace import WorkspaceGrid
+from profiler import profiled
+
+# pybullet is only required for the "pybullet" IK backend or for visualization
+try:
+    import pybullet as p
+    import pybullet_data
+except ImportError:
+    p = None
+
+# physics backend name -> pybullet connection mode attribute
+PHYSICS_BACKENDS = {
+    "direct": "DIRECT",
+    "gui": "GUI",
+    "shared_memory": "SHARED_MEMORY",
+}
+
+IK_BACKENDS = ("pybullet", "numpy")
+
+# self-collision is checked along the joint-space path every this many degrees
+COLLISION_STEP_DEG = 5.0
 
 class IKSolver:
     def __init__(self, urdf_path, initial_joint_angles_deg,
                  end_effector_index, blend_factor=0.5,
-                 max_step_deg=None, min_step_deg=None):
+                 max_step_deg=None, min_step_deg=None,
+                 physics_backend="direct", ik_backend="pybullet",
+                 workspace_grid=None, ik_cache=None, planner=None, self_collision=None):
         """
         urdf_path: path to robot file
         initial_joint_angles_deg: list of start angles (degrees)
         blend_factor: fraction of full IK delta to move each update
         max_step_deg: maximum allowed joint change per update (degrees)
         min_step_deg: below this total delta, snap directly to target
+        physics_backend: "direct" (headless), "gui" or "shared_memory"
+        ik_backend: "pybullet" (calculateInverseKinematics) or "numpy"
+            (built-in damped least squares, pybullet only used to visualize)
+        workspace_grid: WorkspaceGrid or path of a saved grid (rebuilt when
+            it was built for another model or end effector); solve() then
+            starts from the nearest precomputed seed and rejects targets
+            outside the reachable workspace without solving
+        ik_cache: optional ik_cache.IKCache; solve() then starts from a
+            cached solution of a nearby target and only polishes it
+        planner: optional trajectory_planner.TrajectoryPlanner;
+            set_joint_targets() then follows a velocity / acceleration
+            limited trajectory instead of blending
+        self_collision: optional collision.SelfCollision; goals are then
+            clamped to the URDF joint limits and checked along the way from
+            the current angles: IK goals are cut back before the first
+            collision, servo steps and pose moves that would collide are
+            rejected. Without it goals are used as given.
         """
         self.urdf_path = urdf_path
         self.end_effector_index = end_effector_index
@@ -24,68 +63,197 @@ class IKSolver:
       
         self.goals = None
 
+        if ik_backend not in IK_BACKENDS:
+            print(f"Unknown IK backend '{ik_backend}', using pybullet.")
+            ik_backend = "pybullet"
+        if ik_backend == "pybullet" and p is None:
+            print("pybullet is not installed, using numpy IK backend.")
+            ik_backend = "numpy"
+        self.ik_backend = ik_backend
+        # numpy model of the URDF chain: IK for the numpy backend and the
+        # batch API for both backends; mapped from the compiled model cache
+        self.model = load_robot(urdf_path).model
+        self.robot_id = None
+        self.physics_client = None
+        if isinstance(workspace_grid, str):
+            try:
+                workspace_grid = WorkspaceGrid.load_or_rebuild(workspace_grid, self.model,
+                                                               end_effector_index)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Failed to load workspace grid '{workspace_grid}', solving without it: {e}")
+                workspace_grid = None
+        self.workspace_grid = workspace_grid
+        self.ik_cache = ik_cache
+        self.chain_indices = [int(i) for i in self.model.chain(end_effector_index)]
+        self.last_iterations = None
+        self.rejected_targets = 0
+        # servo mode: integrated end-effector target, None until servo() is called
+        self.servo_target = None
+        self.servo_active = False
+        # planned pose move: joint angle samples played one per update()
+        self.planner = planner
+        self.trajectory = None
+        self.trajectory_step = 0
+        self.self_collision = self_collision
+        self.collisions_avoided = 0
+        self.physics_backend = physics_backend
+
+        radians = [math.radians(d) for d in initial_joint_angles_deg]
+
+        if ik_backend == "numpy":
+            self.base_offset = list(self.model.base_offset)
+            self.num_joints = self.model.num_joints
+            self.joint_lower_limits = list(self.model.lower_limits)
+            self.joint_upper_limits = list(self.model.upper_limits)
+            self.joint_ranges = list(self.model.upper_limits - self.model.lower_limits)
+
+        # pybullet solves IK for the pybullet backend; with the numpy backend
+        # it is only loaded when a viewer / shared-memory server is requested
+        if ik_backend == "pybullet" or (physics_backend != "direct" and p is not None):
+            self._load_pybullet(urdf_path, physics_backend)
+
+        # set initial state
+        if self.robot_id is not None:
+            for i, ang in enumerate(radians):
+                p.resetJointState(self.robot_id, i, ang, physicsClientId=self.physics_client)
+        self.prev_joint_angles = list(radians)
+
+        # initial target = current end-effector pose
+        self.target_pos = self._end_effector_position()
+
+    def _load_pybullet(self, urdf_path, physics_backend):
         # connect to physics
-        self.physics_client = p.connect(p.GUI)
-        p.setAdditionalSearchPath(pybullet_data.getDataPath())
+        self.physics_client = self._connect(physics_backend)
+        p.setAdditionalSearchPath(pybullet_data.getDataPath(), physicsClientId=self.physics_client)
 
-        # load robot with base offset
-        self.base_offset = self._get_inertial_offset(urdf_path)
+        # load robot with base offset; visual meshes only when someone watches.
+        # Collision meshes stay: pybullet derives the link inertia from them and
+        # the simulated arm the pybullet IK starts from depends on it
+        self.base_offset = list(self.model.base_offset)
+        flags = 0
+        if PHYSICS_BACKENDS.get(str(self.physics_backend).lower(), "DIRECT") == "DIRECT":
+            flags = p.URDF_IGNORE_VISUAL_SHAPES
         self.robot_id = p.loadURDF(
             urdf_path,
             basePosition=self.base_offset,
             baseOrientation=p.getQuaternionFromEuler([0, 0, 0]),
-            useFixedBase=True
+            useFixedBase=True,
+            flags=flags,
+            physicsClientId=self.physics_client
         )
 
-        # fetch joint limits
-        self.num_joints = p.getNumJoints(self.robot_id)
+        if self.ik_backend == "numpy":
+            return
+
+        # joint limits as p.getJointInfo reports them, from the model
+        self.num_joints = self.model.num_joints
         self.joint_lower_limits = []
         self.joint_upper_limits = []
         self.joint_ranges = []
-        for i in range(self.num_joints):
-            info = p.getJointInfo(self.robot_id, i)
-            if info[2] in [p.JOINT_REVOLUTE, p.JOINT_PRISMATIC]:
-                self.joint_lower_limits.append(info[8])
-                self.joint_upper_limits.append(info[9])
-                self.joint_ranges.append(info[9] - info[8])
-            else:
-                self.joint_lower_limits.append(0)
-                self.joint_upper_limits.append(0)
-                self.joint_ranges.append(0)
+        for joint_type, lower, upper in zip(self.model.joint_types, self.model.lower_limits,
+                                            self.model.upper_limits):
+            if joint_type == "continuous":
+                # pybullet: a revolute joint with lower 0 > upper -1
+                lower, upper = 0.0, -1.0
+            elif joint_type not in ("revolute", "prismatic"):
+                lower, upper = 0.0, 0.0
+            self.joint_lower_limits.append(float(lower))
+            self.joint_upper_limits.append(float(upper))
+            self.joint_ranges.append(float(upper - lower))
 
-        # set initial state
-        radians = [math.radians(d) for d in initial_joint_angles_deg]
-        for i, ang in enumerate(radians):
-            p.resetJointState(self.robot_id, i, ang)
-        self.prev_joint_angles = list(radians)
+    def close(self):
+        """Disconnect this solver's pybullet client, if it has one."""
+        if self.physics_client is not None:
+            p.disconnect(physicsClientId=self.physics_client)
+            self.physics_client = None
+            self.robot_id = None
 
-        # initial target = current end-effector pose
-        link_state = p.getLinkState(self.robot_id, self.end_effector_index,
-                                    computeForwardKinematics=True)
-        self.target_pos = list(link_state[4])
-
-    def _get_inertial_offset(self, urdf_path):
-        tree = ET.parse(urdf_path)
-        root = tree.getroot()
-        for link in root.findall("link"):
-            if link.attrib.get("name") == "base_link":
-                inertial = link.find("inertial")
-                if inertial is not None:
-                    origin = inertial.find("origin")
-                    if origin is not None and origin.attrib.get("xyz"):
-                        return [-float(x) for x in origin.attrib["xyz"].split()]
-        return [0, 0, 0]
+    def _end_effector_position(self):
+        """Current end-effector link frame position."""
+        if self.ik_backend == "numpy":
+            return list(self.model.forward(self.prev_joint_angles, self.end_effector_index))
+        state = p.getLinkState(self.robot_id, self.end_effector_index,
+                               computeForwardKinematics=True,
+                               physicsClientId=self.physics_client)
+        return list(state[4])
 
+    def _connect(self, physics_backend):
+        """
+        Connect to the requested pybullet backend, falling back to DIRECT
+        when the GUI / shared-memory server is unavailable.
+        """
+        mode_name = PHYSICS_BACKENDS.get(str(physics_backend).lower())
+        if mode_name is None:
+            print(f"Unknown physics backend '{physics_backend}', using direct.")
+            mode_name = "DIRECT"
+        mode = getattr(p, mode_name)
+        client = p.connect(mode)
+        if client < 0 and mode != p.DIRECT:
+            print(f"Failed to connect to physics backend '{physics_backend}', using direct.")
+            self.physics_backend = "direct"
+            client = p.connect(p.DIRECT)
+        return client
+
+    @profiled("ik.solve")
     def solve(self, dx, dy, dz):
         """
         Set a new absolute target offset from current end-effector pose.
+        With a workspace grid, targets outside the reachable workspace are
+        rejected (the previous goal is kept) and the solve starts from the
+        grid seed when it lies closer to the target than the current pose.
+        With a self-collision checker the solution is clamped to the joint
+        limits and stops short of a collision.
         """
-        state = p.getLinkState(self.robot_id, self.end_effector_index,
-                               computeForwardKinematics=True)
-        current = list(state[4])
-        self.target_pos = [current[0] + dx,
-                           current[1] + dy,
-                           current[2] + dz]
+        start = time.perf_counter()
+        self._stop_servo()
+        self.trajectory = None
+        current = self._end_effector_position()
+        target = [current[0] + dx,
+                  current[1] + dy,
+                  current[2] + dz]
+        seed = self.prev_joint_angles
+        if self.workspace_grid is not None:
+            hit = self.workspace_grid.seed(target)
+            if hit is None:
+                self.rejected_targets += 1
+                return
+            seed = self._seed_from_grid(hit, current, target)
+        self.target_pos = target
+        max_iterations = 200
+        cached = None
+        if self.ik_cache is not None:
+            key = self.ik_cache.key(target, seed, self.chain_indices)
+            cached = self.ik_cache.get(key)
+            if cached is not None:
+                # start from the cached solution and polish it onto the exact target
+                seed = self._seed_from_cache(cached[0])
+                max_iterations = self.ik_cache.polish_iterations
+        self._solve(seed, max_iterations)
+        if self.ik_cache is not None:
+            elapsed = time.perf_counter() - start
+            if cached is None:
+                self.ik_cache.put(key, self.goals, elapsed)
+            else:
+                self.ik_cache.record_hit_time(cached[1], elapsed)
+        self.goals, repaired = self._free_path(self.goals)
+        if repaired:
+            self.collisions_avoided += 1
+
+    def _solve(self, seed, max_iterations):
+        if self.ik_backend == "numpy":
+            goals, self.last_iterations, _ = self.model.inverse(
+                self.target_pos,
+                self.end_effector_index,
+                seed=seed,
+                residual_threshold=1e-4,
+                max_iterations=max_iterations
+            )
+            self.goals = list(goals)
+            return
+        if seed is not self.prev_joint_angles:
+            # pybullet iterates from the body's joint state
+            for i in self.chain_indices:
+                p.resetJointState(self.robot_id, i, seed[i], physicsClientId=self.physics_client)
         self.goals = p.calculateInverseKinematics(
                 self.robot_id,
                 self.end_effector_index,
@@ -93,33 +261,203 @@ class IKSolver:
                 lowerLimits=self.joint_lower_limits,
                 upperLimits=self.joint_upper_limits,
                 jointRanges=self.joint_ranges,
-                restPoses=self.prev_joint_angles,
+                restPoses=seed,
                 residualThreshold=1e-4,
-                maxNumIterations=200
+                maxNumIterations=max_iterations,
+                physicsClientId=self.physics_client
             )
-        
+        if seed is not self.prev_joint_angles:
+            for i in self.chain_indices:
+                p.resetJointState(self.robot_id, i, self.prev_joint_angles[i],
+                                  physicsClientId=self.physics_client)
+
+    def _seed_from_cache(self, cached):
+        """Cached chain angles; joints off the end-effector chain keep their current angle."""
+        seed = list(self.prev_joint_angles)
+        for i in self.chain_indices:
+            seed[i] = cached[i]
+        return seed
+
+    def _free_path(self, goals):
+        """
+        (goals, repaired): without a self-collision checker `goals`
+        unchanged. With one, `goals` clamped to the joint limits (the
+        capsules are only checked inside them) and cut back to the last
+        collision-free sample of the straight joint-space path from the
+        current angles (the path both the blend and planned moves follow).
+        A pose already in collision may move anywhere, so the arm can get
+        out of it.
+        """
+        if self.self_collision is None:
+            return goals, False
+        lower, upper = self.model.lower_limits, self.model.upper_limits
+        goals = [min(max(goal, lo), hi) if lo < hi else goal
+                 for goal, lo, hi in zip(goals, lower, upper)] + list(goals[len(lower):])
+        start = np.asarray(self.prev_joint_angles, dtype=np.float64)
+        end = start.copy()
+        end[:len(goals)] = goals
+        distance = math.degrees(float(np.max(np.abs(end - start), initial=0.0)))
+        samples = max(1, int(math.ceil(distance / COLLISION_STEP_DEG)))
+        fractions = np.arange(samples + 1) / samples
+        hits = self.self_collision.in_collision(start + fractions[:, None] * (end - start))
+        if hits[0] or not hits.any():
+            return goals, False
+        first = int(np.argmax(hits))
+        safe = start + fractions[first - 1] * (end - start)
+        return safe[:len(goals)].tolist(), True
+
+    def stats(self):
+        """Solver counters: rejected targets, last iteration count and the IK cache summary."""
+        stats = {
+            "rejected_targets": self.rejected_targets,
+            "last_iterations": self.last_iterations,
+            "collisions_avoided": self.collisions_avoided,
+        }
+        if self.ik_cache is not None:
+            stats.update(self.ik_cache.summary())
+        return stats
+
+    def format_stats(self):
+        text = f"{self.rejected_targets} rejected targets"
+        if self.self_collision is not None:
+            text += f", {self.collisions_avoided} collisions avoided"
+        if self.ik_cache is not None:
+            text += ", " + self.ik_cache.format_summary()
+        return text
+
+    @profiled("ik.servo")
+    def servo(self, vx, vy, vz, dt, damping=0.05):
+        """
+        Cartesian velocity (servo) mode: move the end-effector target by
+        (vx, vy, vz) * dt and take one damped pseudo-inverse step from the
+        previous joint solution towards it, instead of a full IK solve.
+        Call once per control frame while velocity is commanded; update()
+        then applies the step without blending.
+        """
+        self.trajectory = None
+        if self.servo_target is None:
+            self.servo_target = list(self.model.forward(self.prev_joint_angles, self.end_effector_index))
+        target = [self.servo_target[0] + vx * dt,
+                  self.servo_target[1] + vy * dt,
+                  self.servo_target[2] + vz * dt]
+        if self.workspace_grid is not None and self.workspace_grid.seed(target) is None:
+            self.rejected_targets += 1
+            return
+        goals, reached = self.model.servo_step(self.prev_joint_angles, target,
+                                               self.end_effector_index, damping)
+        self.last_iterations = 1
+        goals, repaired = self._free_path(goals.tolist())
+        if repaired:
+            self.collisions_avoided += 1
+            return
+        # at a joint limit or singularity the arm falls behind the target;
+        # keep the target within one step of the reached pose so it does not wind up
+        reached = reached.tolist()
+        lag = [t - r for t, r in zip(target, reached)]
+        limit = math.sqrt(vx * vx + vy * vy + vz * vz) * dt
+        lag_norm = math.sqrt(sum(l * l for l in lag))
+        if lag_norm > limit:
+            scale = limit / lag_norm
+            target = [r + l * scale for r, l in zip(reached, lag)]
+        self.servo_target = target
+        self.target_pos = target
+        self.goals = goals
+        self.servo_active = True
+
+    def _stop_servo(self):
+        self.servo_target = None
+        self.servo_active = False
+
+    def _seed_from_grid(self, hit, current, target):
+        """Grid seed if its pose is nearer the target than the current one."""
+        grid_seed, grid_position = hit
+        grid_dist = sum((g - t) ** 2 for g, t in zip(grid_position, target))
+        current_dist = sum((c - t) ** 2 for c, t in zip(current, target))
+        if grid_dist >= current_dist:
+            return self.prev_joint_angles
+        # joints off the end-effector chain keep their current angle
+        seed = list(self.prev_joint_angles)
+        for i in self.chain_indices:
+            seed[i] = float(grid_seed[i])
+        return seed
+
+    def fk_batch(self, joint_angles):
+        """
+        End-effector positions (N, 3) for joint angles (N, joints) in radians.
+        Pure NumPy; the solver state is not touched.
+        """
+        return self.model.forward_batch(joint_angles, self.end_effector_index)
+
+    def solve_batch(self, targets, seeds=None):
+        """
+        Solve IK for absolute end-effector targets (N, 3) in one call.
+        seeds: (joints,) or (N, joints) radians, default prev_joint_angles.
+        Returns (joint_angles (N, joints) radians, converged (N,) bool).
+        Pure NumPy; the solver state is not touched.
+        """
+        if seeds is None:
+            seeds = self.prev_joint_angles
+        joint_angles, _, converged = self.model.inverse_batch(
+            targets,
+            self.end_effector_index,
+            seeds,
+            residual_threshold=1e-4,
+            max_iterations=200
+        )
+        return joint_angles, converged
+
     def set_joint_targets(self, target_angles_deg):
         """
         Set direct joint-angle targets (degrees) and switch to joint mode.
+        With a planner the joints follow a limited trajectory to the targets;
+        calling again with the same targets (e.g. every frame while the reset
+        key is held) continues the move. With a self-collision checker the
+        targets are clamped to the joint limits and a move that would pass
+        through a self-collision is ignored.
         """
+        self._stop_servo()
         # convert to radians and store
-        self.goals = [math.radians(d) for d in target_angles_deg]
+        goals = [math.radians(d) for d in target_angles_deg]
+        if self.planner is not None:
+            goals = goals + list(self.prev_joint_angles[len(goals):])
+        goals, repaired = self._free_path(goals)
+        if repaired:
+            self.collisions_avoided += 1
+            return
+        if self.planner is not None:
+            if self.trajectory is not None and goals == self.goals:
+                return
+            self.trajectory = self.planner.plan(self.prev_joint_angles, goals).tolist() or None
+            self.trajectory_step = 0
+        self.goals = goals
 
-    def update(self):
+    def predict(self, steps, goal_rate=None):
         """
-        Compute IK and move joints by a fraction of the full delta (blend_factor),
-        but snap to target if total move less than min_step_deg, and cap per-step
-        by max_step_deg if set.
-        Call each simulation frame.
+        Joint angles (radians) after each of the next `steps` update() calls,
+        without moving the arm. A planned pose move is followed as planned;
+        otherwise the goals stay put, or move by `goal_rate` (radians per
+        update) when given, e.g. while a jog key is held.
         """
-        if self.goals is None:
-            state = p.getLinkState(self.robot_id, self.end_effector_index,
-                               computeForwardKinematics=True)
-            current = list(state[4])
-            return current
+        angles = list(self.prev_joint_angles)
+        goals = self.goals
+        predicted = []
+        if self.trajectory is not None:
+            predicted = self.trajectory[self.trajectory_step:self.trajectory_step + steps]
+            if predicted:
+                angles = predicted[-1]
+            goal_rate = None
+        for _ in range(steps - len(predicted)):
+            if goals is not None:
+                if goal_rate is not None:
+                    goals = [goal + rate for goal, rate in zip(goals, goal_rate)]
+                angles = self._blend_step(angles, goals)
+            predicted.append(angles)
+        return predicted
 
+    def _blend_step(self, angles, goals):
+        """One update() step from `angles` toward `goals`."""
         # compute per-joint deltas (radians)
-        deltas = [goal - prev for goal, prev in zip(self.goals, self.prev_joint_angles)]
+        deltas = [goal - prev for goal, prev in zip(goals, angles)]
         # convert to degrees for magnitude checks
         deg_deltas = [abs(d * 180.0 / math.pi) for d in deltas]
         max_deg = max(deg_deltas) if deg_deltas else 0
@@ -129,24 +467,46 @@ class IKSolver:
         if self.min_step_deg is not None and max_deg < self.min_step_deg:
             fraction = 1.0
         else:
-            fraction = self.blend
+            # servo steps are already one frame of motion
+            fraction = 1.0 if self.servo_active else self.blend
             # enforce max step if set
             if self.max_step_deg is not None and max_deg > self.max_step_deg:
                 max_frac = self.max_step_deg / max_deg
                 fraction = min(fraction, max_frac)
 
         # apply motion
-        new_angles = []
-        for i, (prev, delta) in enumerate(zip(self.prev_joint_angles, deltas)):
-            step = prev + delta * fraction
-            new_angles.append(step)
-            p.setJointMotorControl2(
-                self.robot_id, i, p.POSITION_CONTROL,
-                targetPosition=step
-            )
+        return [prev + delta * fraction
+                for prev, delta in zip(angles, deltas)]
+
+    @profiled("ik.update")
+    def update(self):
+        """
+        Compute IK and move joints by a fraction of the full delta (blend_factor),
+        but snap to target if total move less than min_step_deg, and cap per-step
+        by max_step_deg if set.
+        Call each simulation frame.
+        """
+        if self.goals is None:
+            # no target yet: the joints stay where they are
+            return list(self.prev_joint_angles)
+
+        if self.trajectory is not None:
+            new_angles = self.trajectory[self.trajectory_step]
+            self.trajectory_step += 1
+            if self.trajectory_step >= len(self.trajectory):
+                self.trajectory = None
+        else:
+            new_angles = self._blend_step(self.prev_joint_angles, self.goals)
+        if self.robot_id is not None:
+            for i, step in enumerate(new_angles):
+                p.setJointMotorControl2(
+                    self.robot_id, i, p.POSITION_CONTROL,
+                    targetPosition=step,
+                    physicsClientId=self.physics_client
+                )
 
-        # advance simulation
-        p.stepSimulation()
+            # advance simulation
+            p.stepSimulation(physicsClientId=self.physics_client)
         self.prev_joint_angles = new_angles
 
         # print("\n=== Joint Information ===")
@@ -0,0 +1,403 @@
+"""
+Input recording and deterministic replay.
+
+While recording, every control step writes one frame record with what the
+step consumed: button presses, joystick axes / buttons, keyboard keys and
+whether control was enabled. It also stores a CRC of the wheel and arm
+commands the step published. Joystick and keyboard pygame events from the
+main thread are logged alongside for diagnosis.
+
+Replay feeds the frames back through TeleopControl (JoystickHandler and
+IKSolver) as fast as possible and checks each frame's CRC, so the same log
+gives the same commands:
+
+    python main.py --record session.tlog
+    python input_log.py info session.tlog
+    python input_log.py replay session.tlog [--speed 0] [--csv commands.csv]
+
+File layout (little endian):
+
+    b"TLOG" | u16 version | u32 header length | JSON header
+    frame:  b"F" | f64 t | u8 flags | u8 buttons | u16 keys | button ids (u8)
+            | u8 joysticks | per joystick: i16 id, u8 axes, u64 changed-axis
+            mask, u8 has-buttons, changed axes (f64), [u64 button mask]
+            | u32 output crc
+    event:  b"E" | f64 t | u32 pygame event type | i32 key/button | i32 joystick
+
+Axis values are stored as f64 and only when they changed since the previous
+frame, so replay sees bit-identical input and an idle stick costs nothing.
+"""
+import argparse
+import json
+import struct
+import threading
+import time
+import zlib
+import pygame
+from virtual_joystick import VirtualJoystick
+
+MAGIC = b"TLOG"
+VERSION = 2
+# a joystick's axes and buttons are bit masks in the frame record
+MAX_AXES = 64
+MAX_BUTTONS = 64
+
+# keys JoystickHandler.process_keypress_continuous reads, one bit each
+RECORDED_KEYS = (pygame.K_w, pygame.K_s, pygame.K_d, pygame.K_a, pygame.K_r, pygame.K_e,
+                 pygame.K_UP, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_LEFT,
+                 pygame.K_SPACE, pygame.K_LCTRL)
+
+FLAG_ENABLED = 0x01
+
+_FRAME = struct.Struct("<dBBH")
+_JOYSTICK = struct.Struct("<hBQB")
+_EVENT = struct.Struct("<dIii")
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_U64 = struct.Struct("<Q")
+
+EVENT_TYPES = (pygame.KEYDOWN, pygame.KEYUP, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP,
+               pygame.JOYAXISMOTION, pygame.JOYHATMOTION, pygame.JOYDEVICEADDED,
+               pygame.JOYDEVICEREMOVED)
+
+
+def config_crc(path="config.csv"):
+    """CRC of the config file, so replay can warn when it changed since recording."""
+    try:
+        with open(path, "rb") as f:
+            return zlib.crc32(f.read())
+    except OSError:
+        return None
+
+
+class KeyState:
+    """Keyboard state from a RECORDED_KEYS bit mask, indexed like pygame.key.get_pressed()."""
+    def __init__(self, mask, keys=RECORDED_KEYS):
+        self.mask = mask
+        self.bits = {key: 1 << i for i, key in enumerate(keys)}
+
+    def __getitem__(self, key):
+        bit = self.bits.get(key)
+        return bool(bit and self.mask & bit)
+
+
+def key_mask(pressed, keys=RECORDED_KEYS):
+    mask = 0
+    for i, key in enumerate(keys):
+        if pressed[key]:
+            mask |= 1 << i
+    return mask
+
+
+def sample_input(joysticks, pressed):
+    """
+    Read every joystick axis and button and the keyboard once. Returns
+    (joysticks, keys): VirtualJoystick copies and a KeyState, which the
+    control step uses and the recorder writes, so both see the same values.
+    """
+    samples = {}
+    for instance_id, joystick in joysticks.items():
+        copy = VirtualJoystick(instance_id, [joystick.get_axis(i) for i in range(joystick.get_numaxes())],
+                               joystick.get_numbuttons())
+        copy.buttons = [joystick.get_button(i) for i in range(joystick.get_numbuttons())]
+        samples[instance_id] = copy
+    return samples, KeyState(key_mask(pressed))
+
+
+class OutputDigest:
+    """
+    Wraps the wheel / arm publish callbacks and keeps a running CRC of the
+    commands published in the current frame.
+    """
+    def __init__(self):
+        self.crc = 0
+
+    def reset(self):
+        crc, self.crc = self.crc, 0
+        return crc
+
+    def add(self, kind, values):
+        values = list(values)
+        self.crc = zlib.crc32(kind + struct.pack("<%dd" % len(values), *values), self.crc)
+
+    def wrap_wheel(self, callback):
+        def publish(cmd):
+            self.add(b"W", cmd)
+            callback(cmd)
+        return publish
+
+    def wrap_arm(self, callback):
+        def publish(arm_msg):
+            self.add(b"A", arm_msg["positions"])
+            callback(arm_msg)
+        return publish
+
+    def wrap_trajectory(self, callback):
+        def publish(points):
+            for point in points:
+                t = point["time_from_start"]
+                self.add(b"T", [t["sec"] + t["nanosec"] * 1e-9] + point["positions"] + point["velocities"])
+            callback(points)
+        return publish
+
+
+class InputRecorder:
+    def __init__(self, path, header):
+        """
+        path: log file to create
+        header: everything replay needs to rebuild the controller
+            (control_rate, ik_backend, urdf, initial_pose, joint_offset,
+            arm_move_step, blend_factor, workspace_grid, ik_cache, wheel_filter,
+            arm_trajectory, planner, self_collision)
+        """
+        self.path = path
+        self.digest = OutputDigest()
+        self.frames = 0
+        self.events = 0
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._axes = {}         # instance id -> axes written last
+        self._buttons = {}      # instance id -> button mask written last
+        header = dict(header, version=VERSION, keys=list(RECORDED_KEYS), config_crc=config_crc(),
+                      created=time.time())
+        data = json.dumps(header).encode()
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + struct.pack("<HI", VERSION, len(data)) + data)
+
+    def write_frame(self, buttons, enabled, joysticks, keys):
+        """One control step; `joysticks` / `keys` as returned by sample_input()."""
+        for instance_id, joystick in joysticks.items():
+            if len(joystick.axes) > MAX_AXES or len(joystick.buttons) > MAX_BUTTONS:
+                raise ValueError(f"Joystick {instance_id} has {len(joystick.axes)} axes and "
+                                 f"{len(joystick.buttons)} buttons; input logs record at most "
+                                 f"{MAX_AXES} axes and {MAX_BUTTONS} buttons per joystick")
+        out = bytearray(b"F")
+        out += _FRAME.pack(time.perf_counter() - self._origin, FLAG_ENABLED if enabled else 0,
+                           len(buttons), keys.mask if keys is not None else 0)
+        out += bytes(buttons)
+        out += _U8.pack(len(joysticks))
+        for instance_id, joystick in joysticks.items():
+            previous = self._axes.get(instance_id)
+            mask = 0
+            changed = []
+            for i, value in enumerate(joystick.axes):
+                if previous is None or i >= len(previous) or previous[i] != value:
+                    mask |= 1 << i
+                    changed.append(value)
+            self._axes[instance_id] = list(joystick.axes)
+            button_mask = sum(1 << i for i, pressed in enumerate(joystick.buttons) if pressed)
+            has_buttons = self._buttons.get(instance_id) != button_mask
+            self._buttons[instance_id] = button_mask
+            out += _JOYSTICK.pack(instance_id, len(joystick.axes), mask, has_buttons)
+            for value in changed:
+                out += _F64.pack(value)
+            if has_buttons:
+                out += _U64.pack(button_mask)
+        out += _U32.pack(self.digest.reset())
+        with self._lock:
+            self._file.write(out)
+            self.frames += 1
+
+    def record_event(self, event):
+        """Log a joystick / keyboard pygame event (called from the main thread)."""
+        if event.type not in EVENT_TYPES:
+            return
+        code = getattr(event, "key", getattr(event, "button", getattr(event, "axis", -1)))
+        joystick = getattr(event, "instance_id", getattr(event, "device_index", -1))
+        with self._lock:
+            self._file.write(b"E" + _EVENT.pack(time.perf_counter() - self._origin,
+                                                event.type, code, joystick))
+            self.events += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class InputLog:
+    """A recorded log read into memory: header, frames and events."""
+    def __init__(self, header, frames, events):
+        self.header = header
+        self.frames = frames    # (t, enabled, buttons, keys mask, {id: (axes, button mask)}, crc)
+        self.events = events    # (t, pygame event type, key/button, joystick)
+
+    @property
+    def duration(self):
+        return self.frames[-1][0] - self.frames[0][0] if len(self.frames) > 1 else 0.0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not an input log")
+        version, length = struct.unpack_from("<HI", data, 4)
+        if version != VERSION:
+            raise ValueError(f"Unsupported input log version {version}")
+        offset = 10 + length
+        header = json.loads(data[10:offset])
+        frames, events = [], []
+        axes_state, buttons_state = {}, {}
+        while offset < len(data):
+            tag = data[offset:offset + 1]
+            offset += 1
+            if tag == b"E":
+                events.append(_EVENT.unpack_from(data, offset))
+                offset += _EVENT.size
+                continue
+            if tag != b"F":
+                raise ValueError(f"Corrupt input log at byte {offset - 1}")
+            t, flags, n_buttons, keys = _FRAME.unpack_from(data, offset)
+            offset += _FRAME.size
+            buttons = list(data[offset:offset + n_buttons])
+            offset += n_buttons
+            n_joysticks = data[offset]
+            offset += 1
+            joysticks = {}
+            for _ in range(n_joysticks):
+                instance_id, n_axes, mask, has_buttons = _JOYSTICK.unpack_from(data, offset)
+                offset += _JOYSTICK.size
+                axes = list(axes_state.get(instance_id, ()))[:n_axes]
+                axes += [0.0] * (n_axes - len(axes))
+                for i in range(n_axes):
+                    if mask & (1 << i):
+                        axes[i] = _F64.unpack_from(data, offset)[0]
+                        offset += _F64.size
+                axes_state[instance_id] = axes
+                if has_buttons:
+                    buttons_state[instance_id] = _U64.unpack_from(data, offset)[0]
+                    offset += _U64.size
+                joysticks[instance_id] = (tuple(axes), buttons_state.get(instance_id, 0))
+            crc = _U32.unpack_from(data, offset)[0]
+            offset += _U32.size
+            frames.append((t, bool(flags & FLAG_ENABLED), buttons, keys, joysticks, crc))
+        return cls(header, frames, events)
+
+
+def build_teleop(header, wheel_publish_callback=None, arm_publish_callback=None):
+    """
+    JoystickHandler, IKSolver and TeleopControl configured like the recorded
+    session. Returns (teleop, digest); the callbacks default to no-ops.
+    """
+    from iksolver import IKSolver
+    from ik_cache import IKCache
+    from joystick_handler import JoystickHandler
+    from main import TeleopControl
+    from trajectory_planner import TrajectoryPlanner
+    from model_cache import load_robot
+    from wheel_filter import WheelFilter
+
+    handler = JoystickHandler()
+    handler.arm_move_step = header["arm_move_step"]
+    handler.control_period = 1.0 / header["control_rate"]
+    ik = IKSolver(header["urdf"], header["initial_pose"], 6,
+                  blend_factor=header["blend_factor"],
+                  ik_backend=header["ik_backend"],
+                  workspace_grid=header.get("workspace_grid"),
+                  ik_cache=IKCache(**header["ik_cache"]) if header.get("ik_cache") else None,
+                  planner=TrajectoryPlanner(**header["planner"]) if header.get("planner") else None,
+                  self_collision=(load_robot(header["urdf"]).self_collision(**header["self_collision"])
+                                  if header.get("self_collision") else None))
+    wheel_filter = None
+    if header.get("wheel_filter"):
+        wheel_filter = WheelFilter(**header["wheel_filter"])
+    arm_trajectory = header.get("arm_trajectory")
+    digest = OutputDigest()
+    wrap_arm = digest.wrap_trajectory if arm_trajectory else digest.wrap_arm
+    teleop = TeleopControl(handler, ik,
+                           digest.wrap_wheel(wheel_publish_callback or (lambda cmd: None)),
+                           wrap_arm(arm_publish_callback or (lambda msg: None)),
+                           {}, header["joint_offset"], header["initial_pose"],
+                           wheel_filter=wheel_filter, arm_trajectory=arm_trajectory)
+    return teleop, digest
+
+
+def replay(log, teleop, digest, speed=0.0, on_frame=None):
+    """
+    Run every recorded frame through `teleop`. speed 0 runs as fast as
+    possible, otherwise frames are paced at `speed` times real time.
+    on_frame: optional callback(index, snapshot) after each step
+    Returns (frames replayed, indices of frames whose output differed).
+    """
+    keys_order = tuple(log.header.get("keys", RECORDED_KEYS))
+    joysticks = {}
+    teleop.joysticks = joysticks
+    diverged = []
+    start = time.perf_counter()
+    t0 = log.frames[0][0] if log.frames else 0.0
+    for index, (t, enabled, buttons, keys, samples, crc) in enumerate(log.frames):
+        if speed:
+            delay = start + (t - t0) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        for button in buttons:
+            teleop.press_button(button)
+        joysticks.clear()
+        for instance_id, (axes, button_mask) in samples.items():
+            joystick = VirtualJoystick(instance_id, axes, max(15, button_mask.bit_length()))
+            joystick.buttons = [(button_mask >> i) & 1 for i in range(len(joystick.buttons))]
+            joysticks[instance_id] = joystick
+        teleop.get_pressed = lambda mask=keys: KeyState(mask, keys_order)
+        teleop.enabled = enabled
+        snapshot = teleop.step()
+        if digest.reset() != crc:
+            diverged.append(index)
+        if on_frame is not None:
+            on_frame(index, snapshot)
+    return len(log.frames), diverged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and replay recorded input logs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="header and record counts")
+    info.add_argument("log")
+    play = sub.add_parser("replay", help="replay through JoystickHandler / IKSolver and verify the output")
+    play.add_argument("log")
+    play.add_argument("--speed", type=float, default=0.0,
+                      help="times real time, 0 (default) runs as fast as possible")
+    play.add_argument("--csv", default=None, help="write the wheel / arm state of every frame here")
+    args = parser.parse_args(argv)
+
+    log = InputLog.load(args.log)
+    if args.command == "info":
+        print(json.dumps(log.header, indent=2))
+        print(f"{len(log.frames)} frames, {len(log.events)} events, {log.duration:.1f} s")
+        return
+
+    if log.header.get("config_crc") not in (None, config_crc()):
+        print("Warning: config.csv changed since recording, replay may diverge.")
+    teleop, digest = build_teleop(log.header)
+    rows = []
+
+    def on_frame(index, snapshot):
+        rows.append((log.frames[index][0], tuple(snapshot.wheel_speed), tuple(snapshot.arm_angles)))
+
+    start = time.perf_counter()
+    frames, diverged = replay(log, teleop, digest, args.speed, on_frame if args.csv else None)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {frames} frames ({log.duration:.1f} s recorded) in {elapsed:.2f} s, "
+          f"{log.duration / elapsed if elapsed else 0:.0f}x real time")
+    if diverged:
+        print(f"Output differs in {len(diverged)} frames, first at frame {diverged[0]} "
+              f"(t = {log.frames[diverged[0]][0]:.3f} s)")
+    else:
+        print("Output identical to the recording.")
+    if args.csv:
+        import csv
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            # the drive model decides how many wheel outputs there are
+            wheels = max((len(wheel) for _, wheel, _ in rows), default=0)
+            joints = max((len(arm) for _, _, arm in rows), default=0)
+            writer.writerow(["time"] + [f"wheel_{i}" for i in range(wheels)] +
+                            [f"joint_{i}" for i in range(joints)])
+            for t, wheel, arm in rows:
+                writer.writerow([t] + list(wheel) + [""] * (wheels - len(wheel)) + list(arm))
+        print(f"Frame state written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
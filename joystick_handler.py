@@ -1,8 +1,11 @@
 import pygame
-import time
 import math
 import csv
 from utils import map_trigger_value, vel_limit
+from profiler import profiled
+from mixing import WheelMixer
+from drive_model import load_drive_model
+from buttons import BUTTON_ACTIONS, ButtonDispatcher, parse_button_rows
 
 class JoystickHandler:
     def __init__(self, num_joints=5):
@@ -46,20 +49,82 @@ class JoystickHandler:
         self.arm_down = 5
 
 
-        self.wheel_speed = [0, 0, 0, 0] #wheel speed for gui
+        self.wheel_speed = [0, 0, 0, 0] #wheel speed for gui (resized to the drive model)
 
         #minimal joystick value to prevent drifting
         self.min_joystick_value = 0.1
 
+        #how several controllers share the wheels: priority / sum / last_active
+        self.wheel_mix_policy = "last_active"
+
+        #drive kinematics: mecanum / skid_steer / differential / omni / ackermann / custom
+        self.drive_model_name = "mecanum"
+        self.max_steer_deg = 30.0
+        self.drive_rows = []
+        #wheel command slices published per topic: (topic, (start, end), label)
+        self.wheel_groups = None
+
+        #end-effector target step per control frame (m)
+        self.arm_move_step = 0.1
+
+        #servo mode: end-effector speed (m/s) at full right stick / arm_up / arm_down, 0 = off
+        self.arm_servo_speed = 0.2
+        #control period (s) the servo velocity is integrated over, also the button clock step
+        self.control_period = 1.0 / 30
+
+        #button -> action table (None: default layout), axis buttons, debounce / auto-repeat (s)
+        self.button_rows = None
+        self.axis_button_rows = []
+        self.button_debounce = 0.03
+        self.button_repeat_delay = 0.4
+        self.button_repeat_interval = 0.1
+        self.button_time = 0.0
+
+        #per joint velocity (deg/s) / acceleration (deg/s^2) limits from the joint rows, None = global default
+        self.joint_max_velocity = []
+        self.joint_max_acceleration = []
+        #named preset poses (robot joint angles, degrees) and the pose the arm should move to next
+        self.poses = {}
+        self.pose_request = None
+
 
         # 從 CSV 載入設定
         self.load_config("config.csv")
 
+        # 底盤運動模型（混合矩陣），搖桿、鍵盤與按鈕共用
+        self.drive_model = load_drive_model(self.drive_model_name, self.drive_rows, self.max_steer_deg)
+        self.wheel_speed = self.drive_model.stop()
+        if self.wheel_groups is None:
+            self.wheel_groups = [(self.rear_wheel_topic, self.rear_wheel_range, "rear_wheels"),
+                                 (self.front_wheel_topic, self.front_wheel_range, "front_wheels")]
+        for topic, (start, end), _ in self.wheel_groups:
+            if end > self.drive_model.outputs:
+                print(f"Wheel range {start}-{end} of {topic} exceeds the {self.drive_model.outputs} "
+                      f"outputs of the {self.drive_model.name} drive model.")
+
+        # 所有搖桿的輪速混合（一次矩陣運算）
+        self.wheel_mixer = WheelMixer(self.left_stick_horizontal, self.left_stick_vertical,
+                                      self.clockwise_rotation, self.counterclockwise_rotation,
+                                      deadzone=self.min_joystick_value,
+                                      policy=self.wheel_mix_policy,
+                                      drive_model=self.drive_model)
+
+        # 按鍵對應動作表（只建一次），去彈跳與連發以時間戳記處理，不使用 sleep
+        actions = {name: getattr(self, "_action_" + name) for name in BUTTON_ACTIONS}
+        for name in self.poses:
+            actions["pose:" + name] = (lambda wheel_publish_callback, arm_publish_callback, name=name:
+                                       self.move_to_pose(name))
+        buttons, axes = parse_button_rows(self.button_rows or [], self.axis_button_rows)
+        self.buttons = ButtonDispatcher(actions, buttons if self.button_rows else None, axes,
+                                        debounce=self.button_debounce,
+                                        repeat_delay=self.button_repeat_delay,
+                                        repeat_interval=self.button_repeat_interval)
+
     def load_config(self, filename="config.csv"):
         """
         讀取 CSV 檔案，格式範例如下（含表頭）：
 
-        type,param,value1,value2
+        type,param,value1,value2,value3,value4
         global,joints_count,6,
         global,angle_step,15,
         global,arm_topic,/robot_arm,
@@ -68,23 +133,42 @@ class JoystickHandler:
         global,rear_wheel_topic,/car_C_rear_wheel,
         global,front_wheel_range,0-2,
         global,rear_wheel_range,2-4,
-        joint,1,0,180
-        joint,2,0,180
-        joint,3,0,180
-        joint,4,0,180
-        joint,5,0,180
-        joint,6,0,180
+        joint,1,0,180,60,120
+        joint,2,0,180,60,120
+        joint,3,0,180,60,120
+        joint,4,0,180,90,180
+        joint,5,0,180,90,180
+        joint,6,0,180,90,180
+        pose,straight,90 90 90 0 90 90
+
+        joint 列：編號、下限、上限（度），可選最大速度（度/秒）與最大加速度（度/秒^2）
+        pose 列：預設姿態名稱與各關節角度（度，與 joint 上下限同一角度系統）
         """
         try:
             with open(filename, "r", newline='') as f:
                 reader = csv.DictReader(f)
                 global_params = {}
                 joint_rows = []
+                drive_rows = []
+                wheel_topic_rows = []
+                button_rows = []
+                axis_button_rows = []
+                pose_rows = []
                 for row in reader:
                     if row["type"] == "global":
                         global_params[row["param"]] = row["value1"]
                     elif row["type"] == "joint":
                         joint_rows.append(row)
+                    elif row["type"] == "drive":
+                        drive_rows.append(row)
+                    elif row["type"] == "wheel_topic":
+                        wheel_topic_rows.append(row)
+                    elif row["type"] == "button":
+                        button_rows.append(row)
+                    elif row["type"] == "axis":
+                        axis_button_rows.append(row)
+                    elif row["type"] == "pose":
+                        pose_rows.append(row)
             # 全域參數讀取
             if "joints_count" in global_params:
                 self.arm_joints_count = int(global_params["joints_count"])
@@ -130,8 +214,37 @@ class JoystickHandler:
                 self.arm_up = int (global_params["arm_up"])
             if "arm_down" in global_params:
                 self.arm_down = int (global_params["arm_down"])
+            if "arm_servo_speed" in global_params and global_params["arm_servo_speed"]:
+                self.arm_servo_speed = float(global_params["arm_servo_speed"])
             if "min_joystick_value" in global_params:
                 self.min_joystick_value = float (global_params["min_joystick_value"])
+            if "wheel_mix_policy" in global_params and global_params["wheel_mix_policy"]:
+                self.wheel_mix_policy = global_params["wheel_mix_policy"].strip()
+            if "drive_model" in global_params and global_params["drive_model"]:
+                self.drive_model_name = global_params["drive_model"].strip()
+            if "max_steer_angle" in global_params and global_params["max_steer_angle"]:
+                self.max_steer_deg = float(global_params["max_steer_angle"])
+            if "button_debounce" in global_params and global_params["button_debounce"]:
+                self.button_debounce = float(global_params["button_debounce"])
+            if "button_repeat_delay" in global_params and global_params["button_repeat_delay"]:
+                self.button_repeat_delay = float(global_params["button_repeat_delay"])
+            if "button_repeat_interval" in global_params and global_params["button_repeat_interval"]:
+                self.button_repeat_interval = float(global_params["button_repeat_interval"])
+            self.drive_rows = drive_rows
+            self.button_rows = button_rows or None
+            self.axis_button_rows = axis_button_rows
+            # 自訂輪速 topic：wheel_topic,<topic>,<start-end>,<label>
+            if wheel_topic_rows:
+                self.wheel_groups = []
+                for row in wheel_topic_rows:
+                    try:
+                        parts = row["value1"].split("-")
+                        wheel_range = (int(parts[0]), int(parts[1]))
+                    except (ValueError, IndexError):
+                        print(f"Invalid wheel range '{row['value1']}' for {row['param']}, skipped.")
+                        continue
+                    self.wheel_groups.append((row["param"], wheel_range,
+                                              (row["value2"] or "").strip() or row["param"].strip("/")))
             
             # 讀取各關節上下限
             joint_rows.sort(key=lambda x: int(x["param"]))  # 根據 joint 編號排序
@@ -143,6 +256,18 @@ class JoystickHandler:
                     self.joint_limits.append((math.radians(lower_deg), math.radians(upper_deg)))
                 else:
                     self.joint_limits.append((0.0, math.radians(180)))
+            # 各關節速度 / 加速度上限（軌跡規劃用），未填則使用全域預設
+            self.joint_max_velocity = [float(row["value3"]) if row.get("value3") else None
+                                       for row in joint_rows]
+            self.joint_max_acceleration = [float(row["value4"]) if row.get("value4") else None
+                                           for row in joint_rows]
+            # 預設姿態：pose,<名稱>,<各關節角度（度，空白分隔）>
+            self.poses = {}
+            for row in pose_rows:
+                try:
+                    self.poses[row["param"].strip()] = [float(v) for v in row["value1"].split()]
+                except (ValueError, AttributeError):
+                    print(f"Invalid pose row {row}, skipped.")
             self.arm_angles = [0.0] * self.arm_joints_count
             self.arm_index = 0
             print(f"Loaded config: {self.arm_joints_count} joints, angle step {self.angle_step_deg} deg, speed step {self.speed_incr},")
@@ -155,7 +280,7 @@ class JoystickHandler:
 
     def clip_arm_angles(self):
         """將各關節角度限制在上下限之間（弧度）"""
-        for i in range(self.arm_joints_count):
+        for i in range(min(self.arm_joints_count, len(self.arm_angles))):
             lower, upper = self.joint_limits[i]
             self.arm_angles[i] = max(lower, min(self.arm_angles[i], upper))
 
@@ -167,44 +292,79 @@ class JoystickHandler:
         self.arm_index = 0
 
     def process_button_press(self, button, wheel_publish_callback, arm_publish_callback):
-        # 轉換步進角度為弧度
-        step_radians = math.radians(self.angle_step_deg)
-
-        if button == 11:  # 前進
-            wheel_publish_callback([self.velocity, self.velocity, self.velocity, self.velocity])
-        elif button == 12:  # 後退
-            wheel_publish_callback([-self.velocity, -self.velocity, -self.velocity, -self.velocity])
-        elif button == 13:  # 左轉
-            wheel_publish_callback([-self.velocity, self.velocity, -self.velocity, self.velocity])
-        elif button == 14:  # 右轉
-            wheel_publish_callback([self.velocity, -self.velocity, self.velocity, -self.velocity])
-        elif button == 7:   # 停止
-            wheel_publish_callback([0.0, 0.0, 0.0, 0.0])
-        elif button == 8:   # 重設所有手臂角度為 CSV 設定的值
-            reset_val = math.radians(self.reset_arm_angle)
-            self.arm_angles = [reset_val] * self.arm_joints_count
-            self.clip_arm_angles()
-            arm_publish_callback({"positions": self.arm_angles})
-        elif button == 9:   # L1：減速
-            self.velocity -= self.speed_incr
-            self.velocity = vel_limit(self.velocity)
-        elif button == 10:  # R1：加速
-            self.velocity += self.speed_incr
-            self.velocity = vel_limit(self.velocity)
-        elif button == 1:   # 增加當前關節角度
-            self.arm_angles[self.arm_index] += step_radians
-            self.clip_arm_angles()
-            arm_publish_callback({"positions": self.arm_angles})
-        elif button == 2:   # 減少當前關節角度
-            self.arm_angles[self.arm_index] -= step_radians
-            self.clip_arm_angles()
-            arm_publish_callback({"positions": self.arm_angles})
-        elif button == 3:   # 上一個關節
-            self.arm_index = max(self.arm_index - 1, 0)
-        elif button == 0:   # 下一個關節
-            self.arm_index = min(self.arm_index + 1, self.arm_joints_count - 1)
-
-        time.sleep(0.01)
+        """Run the action mapped to `button` (debounced). Does not block."""
+        self.buttons.press(button, self.button_time, wheel_publish_callback, arm_publish_callback)
+
+    def process_buttons(self, buttons, joysticks, wheel_publish_callback, arm_publish_callback):
+        """
+        One control step of button handling: advance the button clock by
+        the control period, run the queued `buttons` presses, then
+        auto-repeat held buttons and fire axis buttons of `joysticks`.
+        """
+        self.button_time += self.control_period
+        for button in buttons:
+            self.process_button_press(button, wheel_publish_callback, arm_publish_callback)
+        self.buttons.update(self.button_time, joysticks, wheel_publish_callback, arm_publish_callback)
+
+    # 按鍵動作：(wheel_publish_callback, arm_publish_callback)
+    def _action_forward(self, wheel_publish_callback, arm_publish_callback):  # 前進
+        wheel_publish_callback(self.drive_model.apply(1, 0, 0, self.velocity))
+
+    def _action_backward(self, wheel_publish_callback, arm_publish_callback):  # 後退
+        wheel_publish_callback(self.drive_model.apply(-1, 0, 0, self.velocity))
+
+    def _action_rotate_counterclockwise(self, wheel_publish_callback, arm_publish_callback):  # 左轉
+        wheel_publish_callback(self.drive_model.apply(0, 0, -1, self.velocity))
+
+    def _action_rotate_clockwise(self, wheel_publish_callback, arm_publish_callback):  # 右轉
+        wheel_publish_callback(self.drive_model.apply(0, 0, 1, self.velocity))
+
+    def _action_stop(self, wheel_publish_callback, arm_publish_callback):  # 停止
+        wheel_publish_callback(self.drive_model.stop())
+
+    def _action_reset_arm(self, wheel_publish_callback, arm_publish_callback):
+        # 重設所有手臂角度為 CSV 設定的值，由 IK 依軌跡規劃移動
+        self.request_pose([self.reset_arm_angle] * self.arm_joints_count)
+
+    def move_to_pose(self, name):
+        """Move the arm to the preset pose `name` (pose rows in config.csv)."""
+        if name not in self.poses:
+            print(f"Unknown pose '{name}'.")
+            return
+        self.request_pose(self.poses[name])
+
+    def request_pose(self, angles_deg):
+        """
+        Robot joint angles (degrees, the joint row range) to move to; the
+        next process_keypress_continuous() hands them to the IK solver.
+        """
+        pose = [math.radians(a) for a in angles_deg[:self.arm_joints_count]]
+        for i, angle in enumerate(pose):
+            lower, upper = self.joint_limits[i]
+            pose[i] = max(lower, min(angle, upper))
+        self.pose_request = [math.degrees(a) for a in pose]
+
+    def _action_speed_down(self, wheel_publish_callback, arm_publish_callback):  # L1：減速
+        self.velocity = vel_limit(self.velocity - self.speed_incr)
+
+    def _action_speed_up(self, wheel_publish_callback, arm_publish_callback):  # R1：加速
+        self.velocity = vel_limit(self.velocity + self.speed_incr)
+
+    def _action_joint_up(self, wheel_publish_callback, arm_publish_callback):  # 增加當前關節角度
+        self.arm_angles[self.arm_index] += math.radians(self.angle_step_deg)
+        self.clip_arm_angles()
+        arm_publish_callback({"positions": self.arm_angles})
+
+    def _action_joint_down(self, wheel_publish_callback, arm_publish_callback):  # 減少當前關節角度
+        self.arm_angles[self.arm_index] -= math.radians(self.angle_step_deg)
+        self.clip_arm_angles()
+        arm_publish_callback({"positions": self.arm_angles})
+
+    def _action_previous_joint(self, wheel_publish_callback, arm_publish_callback):  # 上一個關節
+        self.arm_index = max(self.arm_index - 1, 0)
+
+    def _action_next_joint(self, wheel_publish_callback, arm_publish_callback):  # 下一個關節
+        self.arm_index = min(self.arm_index + 1, self.arm_joints_count - 1)
 
     def process_axis_motion(self, axis, value):
         if axis in [2, 5]:
@@ -212,44 +372,43 @@ class JoystickHandler:
             # 如需要，可根據 mapped_value 更新 self.velocity
             # self.velocity = mapped_value        
 
-    def process_joystick_continuous(self, joysticks, wheel_publish_callback):
-        for joystick in joysticks.values():
-
-            axis_vertical = 0
-            axis_horizontal = 0
-            axis_rotational = 0
-
-            #get left stick horizontal axis
-            if abs(joystick.get_axis(self.left_stick_horizontal)) > self.min_joystick_value:
-                axis_horizontal += joystick.get_axis(self.left_stick_horizontal)
-            #get left stick vertical axis
-            if abs(joystick.get_axis(self.left_stick_vertical)) > self.min_joystick_value:
-                axis_vertical -= joystick.get_axis(self.left_stick_vertical)
-            #get clockwise rotation axis (trigger button starts at -1 and ends at 1)
-            if abs((joystick.get_axis(self.clockwise_rotation) + 1) / 2) > self.min_joystick_value:
-                axis_rotational += (joystick.get_axis(self.clockwise_rotation) + 1) / 2
-            #get counterclockwise rotation axis (trigger button starts at -1 and ends at 1)
-            if abs((joystick.get_axis(self.counterclockwise_rotation) + 1) / 2) > self.min_joystick_value:
-                axis_rotational -= (joystick.get_axis(self.counterclockwise_rotation) + 1) / 2          
-            
-            #calculate mecanum wheel rotations
-            frontLeft = axis_vertical + axis_horizontal + axis_rotational
-            frontRight = axis_vertical - axis_horizontal - axis_rotational        
-            rearLeft = axis_vertical - axis_horizontal + axis_rotational
-            rearRight = axis_vertical + axis_horizontal - axis_rotational
-
-            self.wheel_speed = [frontLeft * self.velocity, frontRight * self.velocity, rearLeft * self.velocity, rearRight * self.velocity]
-            wheel_publish_callback(self.wheel_speed)
-
-            # #get right stick horizontal axis
-            # if abs(joystick.get_axis(self.right_stick_horizontal)) > self.min_joystick_value:
-            #     x = joystick.get_axis(self.right_stick_horizontal)
-            
-           
-            # z += joystick.get_button(self.arm_up)
-            # z -= joystick.get_button(self.arm_down)
+    @profiled("joystick.process_joystick_continuous")
+    def process_joystick_continuous(self, joysticks, wheel_publish_callback, ik=None):
+        """
+        ik: IKSolver for servo mode; the right stick (x, y) and the arm_up /
+            arm_down buttons (z) command end-effector velocity
+        """
+        # 所有搖桿合併成一個輪速命令，每個週期只發佈一次
+        wheel_speed = self.wheel_mixer.mix(joysticks, self.velocity)
+        if wheel_speed is None:
+            return
+        self.wheel_speed = wheel_speed
+        wheel_publish_callback(self.wheel_speed)
 
-    def process_keypress_continuous(self, keys, wheel_publish_callback, arm_publish_callback, ik, joint_offset_degree, initial_pose):
+        if ik is None or not self.arm_servo_speed:
+            return
+        # 右搖桿與 arm_up / arm_down 按鈕控制末端速度，第一個有輸入的搖桿優先
+        for instance_id in sorted(joysticks):
+            joystick = joysticks[instance_id]
+            x = joystick.get_axis(self.right_stick_horizontal)
+            y = -joystick.get_axis(self.right_stick_vertical)   # 搖桿向上為負
+            z = joystick.get_button(self.arm_up) - joystick.get_button(self.arm_down)
+            if abs(x) <= self.min_joystick_value:
+                x = 0.0
+            if abs(y) <= self.min_joystick_value:
+                y = 0.0
+            if x or y or z:
+                speed = self.arm_servo_speed
+                ik.servo(x * speed, y * speed, z * speed, self.control_period)
+                break
+
+    @profiled("joystick.process_keypress_continuous")
+    def process_keypress_continuous(self, keys, wheel_publish_callback, arm_publish_callback, ik, joint_offset_degree, initial_pose, idle_wheel_publish=True):
+        """
+        idle_wheel_publish: also publish (zero) wheel speeds while no drive
+            key is held; False when a joystick is driving the wheels so the
+            keyboard does not overwrite its command every frame
+        """
         axis_vertical = 0
         axis_horizontal = 0
         axis_rotational = 0
@@ -267,19 +426,15 @@ class JoystickHandler:
         if keys[pygame.K_e]:
             axis_rotational -= 1
 
-        frontLeft = axis_vertical + axis_horizontal + axis_rotational
-        frontRight = axis_vertical - axis_horizontal - axis_rotational        
-        rearLeft = axis_vertical - axis_horizontal + axis_rotational
-        rearRight = axis_vertical + axis_horizontal - axis_rotational
-
-        self.wheel_speed = [frontLeft * self.velocity, frontRight * self.velocity, rearLeft * self.velocity, rearRight * self.velocity]
-        wheel_publish_callback(self.wheel_speed)
+        if idle_wheel_publish or (axis_vertical, axis_horizontal, axis_rotational) != (0, 0, 0):
+            self.wheel_speed = self.drive_model.apply(axis_vertical, axis_horizontal, axis_rotational, self.velocity)
+            wheel_publish_callback(self.wheel_speed)
 
         dx = 0.00
         dy = 0.00
         dz = 0.00
 
-        movespeed = 0.1
+        movespeed = self.arm_move_step
 
         if keys[pygame.K_UP]:
             dy += movespeed
@@ -300,6 +455,12 @@ class JoystickHandler:
         # reset position
         if keys[pygame.K_r]:
             ik.set_joint_targets(initial_pose)
+        elif self.pose_request is not None:
+            # 機器人角度 = IK 角度 - joint_offset，其餘關節維持目前角度
+            target = [angle + offset for angle, offset in zip(self.pose_request, joint_offset_degree)]
+            target += [math.degrees(a) for a in ik.prev_joint_angles[len(target):]]
+            ik.set_joint_targets(target)
+        self.pose_request = None
 
         
         self.arm_angles = ik.update()
@@ -0,0 +1,481 @@
+"""
+Pure-NumPy kinematics for URDF joint chains.
+
+The URDF is parsed once into per-joint origin transforms, axes and limits.
+Links are numbered the same way pybullet numbers them (depth-first from the
+base, children in declaration order), so joint vectors and end-effector
+indices are interchangeable with the pybullet backend.
+
+Batches of configurations use NumPy; a single configuration (the IK solve,
+servo step and forward kinematics of one control frame) is walked with
+plain float arithmetic, where NumPy's per-call overhead on 3x3 arrays would
+cost more than the math.
+"""
+import math
+import xml.etree.ElementTree as ET
+import numpy as np
+
+MOVABLE_JOINT_TYPES = ("revolute", "continuous", "prismatic")
+
+
+def _parse_floats(text, default):
+    if not text:
+        return list(default)
+    return [float(v) for v in text.split()]
+
+
+def rpy_to_matrix(roll, pitch, yaw):
+    """URDF fixed-axis roll/pitch/yaw to a 3x3 rotation matrix."""
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr],
+    ])
+
+
+def origin_transform(xyz, rpy):
+    """4x4 homogeneous transform of a URDF <origin> element."""
+    T = np.eye(4)
+    T[:3, :3] = rpy_to_matrix(*rpy)
+    T[:3, 3] = xyz
+    return T
+
+
+def get_inertial_offset(root):
+    """Negated inertial origin of base_link, used as the pybullet base position."""
+    for link in root.findall("link"):
+        if link.attrib.get("name") == "base_link":
+            inertial = link.find("inertial")
+            if inertial is not None:
+                origin = inertial.find("origin")
+                if origin is not None and origin.attrib.get("xyz"):
+                    return [-float(x) for x in origin.attrib["xyz"].split()]
+    return [0, 0, 0]
+
+
+class RobotModel:
+    def __init__(self, joint_names, link_names, joint_types, parents,
+                 origins, axes, lower_limits, upper_limits, base_offset):
+        """
+        joint_names / link_names / joint_types: one entry per joint, joint i
+            moves link i (pybullet numbering)
+        parents: parent link index of each link, -1 for the base
+        origins: (J, 4, 4) joint origin transforms relative to the parent link
+        axes: (J, 3) unit joint axes in the joint frame
+        lower_limits / upper_limits: (J,) limits, 0 for fixed joints
+        base_offset: base link position in the world frame
+        """
+        self.joint_names = list(joint_names)
+        self.link_names = list(link_names)
+        self.joint_types = list(joint_types)
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.origins = np.asarray(origins, dtype=np.float64)
+        self.axes = np.asarray(axes, dtype=np.float64)
+        self.lower_limits = np.asarray(lower_limits, dtype=np.float64)
+        self.upper_limits = np.asarray(upper_limits, dtype=np.float64)
+        self.base_offset = np.asarray(base_offset, dtype=np.float64)
+        self.num_joints = len(self.joint_names)
+        self.revolute = np.array([t in ("revolute", "continuous") for t in self.joint_types])
+        self.prismatic = np.array([t == "prismatic" for t in self.joint_types])
+
+        # per-joint constants so a frame costs A + sin(q) B + (1 - cos(q)) C
+        K = np.zeros((self.num_joints, 3, 3))
+        x, y, z = self.axes[:, 0], self.axes[:, 1], self.axes[:, 2]
+        K[:, 0, 1], K[:, 0, 2] = -z, y
+        K[:, 1, 0], K[:, 1, 2] = z, -x
+        K[:, 2, 0], K[:, 2, 1] = -y, x
+        origin_R = self.origins[:, :3, :3]
+        self._rot_a = origin_R.copy()
+        self._rot_b = origin_R @ K
+        self._rot_c = origin_R @ K @ K
+        self._trans = self.origins[:, :3, 3].copy()
+        self._slide = np.einsum("jik,jk->ji", origin_R, self.axes)
+        self._chains = {}
+
+    @classmethod
+    def from_urdf(cls, urdf_path):
+        root = ET.parse(urdf_path).getroot()
+        joints_by_parent = {}
+        child_links = set()
+        for joint in root.findall("joint"):
+            parent = joint.find("parent").attrib["link"]
+            child = joint.find("child").attrib["link"]
+            joints_by_parent.setdefault(parent, []).append(joint)
+            child_links.add(child)
+
+        root_links = [l.attrib["name"] for l in root.findall("link")
+                      if l.attrib["name"] not in child_links]
+        if len(root_links) != 1:
+            raise ValueError(f"URDF {urdf_path} must have exactly one root link, found {root_links}")
+
+        joint_names, link_names, joint_types = [], [], []
+        parents, origins, axes, lower, upper = [], [], [], [], []
+
+        # pybullet numbering: depth first, children in declaration order
+        def visit(link_name, parent_index):
+            for joint in joints_by_parent.get(link_name, []):
+                origin = joint.find("origin")
+                xyz = _parse_floats(origin.attrib.get("xyz") if origin is not None else None, (0, 0, 0))
+                rpy = _parse_floats(origin.attrib.get("rpy") if origin is not None else None, (0, 0, 0))
+                axis_el = joint.find("axis")
+                axis = np.array(_parse_floats(axis_el.attrib.get("xyz") if axis_el is not None else None, (1, 0, 0)))
+                norm = np.linalg.norm(axis)
+                joint_type = joint.attrib.get("type", "fixed")
+                limit = joint.find("limit")
+                if joint_type in ("revolute", "prismatic") and limit is not None:
+                    lo = float(limit.attrib.get("lower", 0.0))
+                    hi = float(limit.attrib.get("upper", 0.0))
+                elif joint_type == "continuous":
+                    lo, hi = -math.pi, math.pi
+                else:
+                    lo, hi = 0.0, 0.0
+
+                index = len(joint_names)
+                child = joint.find("child").attrib["link"]
+                joint_names.append(joint.attrib["name"])
+                link_names.append(child)
+                joint_types.append(joint_type)
+                parents.append(parent_index)
+                origins.append(origin_transform(xyz, rpy))
+                axes.append(axis / norm if norm > 0 else axis)
+                lower.append(lo)
+                upper.append(hi)
+                visit(child, index)
+
+        visit(root_links[0], -1)
+        return cls(joint_names, link_names, joint_types, parents, origins, axes,
+                   lower, upper, get_inertial_offset(root))
+
+    def chain(self, link_index):
+        """Joint indices from the base to `link_index`, base first."""
+        return self._chain(link_index).indices
+
+    def _chain(self, link_index):
+        chain = self._chains.get(link_index)
+        if chain is None:
+            chain = _Chain(self, link_index)
+            self._chains[link_index] = chain
+        return chain
+
+    def link_frames(self, joint_angles, link_index):
+        """
+        World transforms (K, 4, 4) of the K links on the chain to
+        `link_index`, base first.
+        """
+        chain = self._chain(link_index)
+        return chain.frames(np.asarray(joint_angles, dtype=np.float64)[chain.indices])
+
+    def all_link_frames(self, joint_angles):
+        """
+        World transforms (..., J, 4, 4) of every link for joint angles
+        (..., J). Leading dimensions are batch dimensions.
+        """
+        q = np.asarray(joint_angles, dtype=np.float64)
+        angle = q * self.revolute
+        T = np.zeros(q.shape + (4, 4))
+        T[..., 3, 3] = 1.0
+        T[..., :3, :3] = (self._rot_a + np.sin(angle)[..., None, None] * self._rot_b
+                          + (1.0 - np.cos(angle))[..., None, None] * self._rot_c)
+        T[..., :3, 3] = self._trans + (q * self.prismatic)[..., None] * self._slide
+        # links are numbered depth first, so a parent always comes before its children
+        for i, parent in enumerate(self.parents):
+            if parent < 0:
+                T[..., i, :3, 3] += self.base_offset
+            else:
+                np.matmul(T[..., parent, :, :], T[..., i, :, :], out=T[..., i, :, :])
+        return T
+
+    def forward(self, joint_angles, link_index):
+        """World position of the `link_index` link frame."""
+        chain = self._chain(link_index)
+        return np.array(chain.position(_take(joint_angles, chain.indices)))
+
+    def jacobian(self, joint_angles, link_index):
+        """
+        Position and 3xJ positional Jacobian of the `link_index` link frame.
+        Columns of joints not on the chain are zero.
+        """
+        chain = self._chain(link_index)
+        position, columns = chain.jacobian(np.asarray(joint_angles, dtype=np.float64)[chain.indices])
+        J = np.zeros((3, self.num_joints))
+        J[:, chain.indices] = columns
+        return position, J
+
+    def forward_batch(self, joint_angles, link_index):
+        """World positions (N, 3) of `link_index` for joint angles (N, J)."""
+        chain = self._chain(link_index)
+        q = np.asarray(joint_angles, dtype=np.float64)[:, chain.indices]
+        return chain.frames(q)[:, -1, :3, 3].copy()
+
+    def inverse_batch(self, targets, link_index, seeds, damping=0.05,
+                      residual_threshold=1e-4, max_iterations=200):
+        """
+        Vectorized damped least squares for targets (N, 3). `seeds` is a
+        single joint vector (J,) or one per target (N, J). Returns
+        (joint_angles (N, J), iterations (N,), converged (N,)); only targets
+        that have not converged yet are iterated.
+        """
+        chain = self._chain(link_index)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        n = len(targets)
+        q = np.array(np.broadcast_to(np.asarray(seeds, dtype=np.float64), (n, self.num_joints)))
+        qc = np.minimum(np.maximum(q[:, chain.indices], chain.lower), chain.upper)
+        damping_eye = damping * damping * np.eye(3)
+        threshold_sq = residual_threshold * residual_threshold
+        iterations = np.full(n, max_iterations, dtype=np.int64)
+        converged = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        for iteration in range(max_iterations):
+            position, J = chain.jacobian(qc[active])
+            error = targets[active] - position
+            done = np.einsum("ni,ni->n", error, error) < threshold_sq
+            if done.any():
+                converged[active[done]] = True
+                iterations[active[done]] = iteration
+                keep = ~done
+                active, J, error = active[keep], J[keep], error[keep]
+                if len(active) == 0:
+                    break
+            q_active = qc[active]
+            Jt = np.swapaxes(J, 1, 2)
+            dq = (Jt @ np.linalg.solve(J @ Jt + damping_eye, error[:, :, None]))[:, :, 0]
+            # drop joints pinned at a limit that the step pushes further out
+            blocked = ((q_active <= chain.lower) & (dq < 0)) | ((q_active >= chain.upper) & (dq > 0))
+            if blocked.any():
+                J = J * ~blocked[:, None, :]
+                Jt = np.swapaxes(J, 1, 2)
+                dq = (Jt @ np.linalg.solve(J @ Jt + damping_eye, error[:, :, None]))[:, :, 0]
+            qc[active] = np.minimum(np.maximum(q_active + dq, chain.lower), chain.upper)
+        else:
+            if len(active):
+                error = targets[active] - chain.frames(qc[active])[:, -1, :3, 3]
+                converged[active] = np.einsum("ni,ni->n", error, error) < threshold_sq
+        q[:, chain.indices] = qc
+        return q, iterations, converged
+
+    def inverse(self, target, link_index, seed, damping=0.05,
+                residual_threshold=1e-4, max_iterations=200):
+        """
+        Damped least squares IK for the position of `link_index`.
+        Returns (joint_angles, iterations, converged). Joints stay within
+        their limits; the solve is warm-started from `seed`. Joints off the
+        chain keep their seed value.
+        """
+        chain = self._chain(link_index)
+        tx, ty, tz = (float(v) for v in target)
+        q = np.array(seed, dtype=np.float64)
+        # one target: plain float loops, numpy call overhead would dominate
+        qc = [min(max(v, lo), hi) for v, lo, hi in zip(q[chain.indices].tolist(), chain.lower_list, chain.upper_list)]
+        damping_sq = damping * damping
+        threshold_sq = residual_threshold * residual_threshold
+        converged = False
+        for iteration in range(max_iterations):
+            (px, py, pz), columns = chain.jacobian_columns(qc)
+            error = (tx - px, ty - py, tz - pz)
+            if error[0] * error[0] + error[1] * error[1] + error[2] * error[2] < threshold_sq:
+                converged = True
+                break
+            qc = chain.dls_step(qc, columns, error, damping_sq)
+        else:
+            iteration = max_iterations
+            px, py, pz = chain.position(qc)
+            converged = (tx - px) ** 2 + (ty - py) ** 2 + (tz - pz) ** 2 < threshold_sq
+        q[chain.indices] = qc
+        return q, iteration, converged
+
+    def servo_step(self, joint_angles, target, link_index, damping=0.05):
+        """
+        One damped least squares step of `link_index` towards `target` from
+        `joint_angles` (incremental IK for velocity control). Returns
+        (joint_angles, position) where position is the first-order
+        prediction of where the step puts the link, so no extra forward
+        kinematics is needed.
+        """
+        chain = self._chain(link_index)
+        q = np.array(joint_angles, dtype=np.float64)
+        qc = [min(max(v, lo), hi) for v, lo, hi in zip(q[chain.indices].tolist(), chain.lower_list, chain.upper_list)]
+        position, columns = chain.jacobian_columns(qc)
+        error = [t - p for t, p in zip(target, position)]
+        new_qc = chain.dls_step(qc, columns, error, damping * damping)
+        q[chain.indices] = new_qc
+        # the Jacobian of joints blocked at a limit is irrelevant: they did not move
+        moved = [a - b for a, b in zip(new_qc, qc)]
+        return q, np.array([p + sum(c[axis] * m for c, m in zip(columns, moved))
+                            for axis, p in enumerate(position)])
+
+
+class _Chain:
+    """Per-joint constants of one base-to-link chain, in chain order."""
+    def __init__(self, model, link_index):
+        indices = []
+        i = link_index
+        while i >= 0:
+            indices.append(int(i))
+            i = model.parents[i]
+        self.indices = np.array(indices[::-1], dtype=np.int64)
+        idx = self.indices
+        self.revolute = model.revolute[idx].astype(np.float64)
+        self.prismatic = model.prismatic[idx].astype(np.float64)
+        self.lower = model.lower_limits[idx]
+        self.upper = model.upper_limits[idx]
+        self.axes = model.axes[idx]
+        self.rot_a = model._rot_a[idx]
+        self.rot_b = model._rot_b[idx]
+        self.rot_c = model._rot_c[idx]
+        self.trans = model._trans[idx]
+        self.trans[0] += model.base_offset
+        self.slide = model._slide[idx]
+        self.template = np.zeros((len(idx), 4, 4))
+        self.template[:, 3, 3] = 1.0
+        # the same constants as floats for the single-configuration loops
+        self.lower_list = self.lower.tolist()
+        self.upper_list = self.upper.tolist()
+        self._joints = list(zip(self.rot_a.reshape(-1, 9).tolist(), self.rot_b.reshape(-1, 9).tolist(),
+                                self.rot_c.reshape(-1, 9).tolist(), self.trans.tolist(),
+                                self.slide.tolist(), self.axes.tolist(),
+                                self.revolute.astype(bool).tolist(), self.prismatic.astype(bool).tolist()))
+        self._kinds = [joint[6:] for joint in self._joints]     # (revolute, prismatic)
+        # (angles, _walk result) of the last walk: IKSolver.solve() asks for
+        # the end position and then the Jacobian at the same angles
+        self._last_walk = None
+
+    def frames(self, q):
+        """
+        World transforms (..., K, 4, 4) for chain joint angles `q` (..., K).
+        Leading dimensions are batch dimensions.
+        """
+        angle = q * self.revolute
+        T = np.empty(q.shape + (4, 4))
+        T[...] = self.template
+        # R_origin @ Rodrigues(axis, q) = A + sin(q) B + (1 - cos(q)) C
+        T[..., :3, :3] = (self.rot_a + np.sin(angle)[..., None, None] * self.rot_b
+                          + (1.0 - np.cos(angle))[..., None, None] * self.rot_c)
+        T[..., :3, 3] = self.trans + (q * self.prismatic)[..., None] * self.slide
+        for k in range(1, q.shape[-1]):
+            np.matmul(T[..., k - 1, :, :], T[..., k, :, :], out=T[..., k, :, :])
+        return T
+
+    def jacobian(self, q):
+        """
+        End position (..., 3) and positional Jacobian (..., 3, K) for chain
+        angles `q` (..., K).
+        """
+        T = self.frames(q)
+        p = T[..., :3, 3]
+        position = p[..., -1, :].copy()
+        # the joint frame shares its origin with the child link frame
+        a = (T[..., :3, :3] @ self.axes[:, :, None])[..., 0]
+        d = position[..., None, :] - p
+        J = np.empty(q.shape[:-1] + (3, q.shape[-1]))
+        J[..., 0, :] = (a[..., 1] * d[..., 2] - a[..., 2] * d[..., 1]) * self.revolute
+        J[..., 1, :] = (a[..., 2] * d[..., 0] - a[..., 0] * d[..., 2]) * self.revolute
+        J[..., 2, :] = (a[..., 0] * d[..., 1] - a[..., 1] * d[..., 0]) * self.revolute
+        J += np.swapaxes(a, -1, -2) * self.prismatic
+        return position, J
+
+    def _walk(self, q):
+        """
+        Joint origins and world joint axes along the chain for one list of
+        chain angles `q`, composed with float arithmetic: a 3x3 numpy op
+        costs about as much as the whole per-joint update.
+        """
+        last = self._last_walk
+        if last is not None and last[0] == q:
+            return last[1]
+        r0, r1, r2, r3, r4, r5, r6, r7, r8 = 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0
+        px = py = pz = 0.0
+        origins, axes = [], []
+        for qk, (a, b, c, t, slide, axis, revolute, prismatic) in zip(q, self._joints):
+            tx, ty, tz = t
+            if revolute:
+                s, v = math.sin(qk), 1.0 - math.cos(qk)
+                l0, l1, l2 = a[0] + s * b[0] + v * c[0], a[1] + s * b[1] + v * c[1], a[2] + s * b[2] + v * c[2]
+                l3, l4, l5 = a[3] + s * b[3] + v * c[3], a[4] + s * b[4] + v * c[4], a[5] + s * b[5] + v * c[5]
+                l6, l7, l8 = a[6] + s * b[6] + v * c[6], a[7] + s * b[7] + v * c[7], a[8] + s * b[8] + v * c[8]
+            else:
+                l0, l1, l2, l3, l4, l5, l6, l7, l8 = a
+                if prismatic:
+                    tx, ty, tz = tx + qk * slide[0], ty + qk * slide[1], tz + qk * slide[2]
+            px, py, pz = (px + r0 * tx + r1 * ty + r2 * tz,
+                          py + r3 * tx + r4 * ty + r5 * tz,
+                          pz + r6 * tx + r7 * ty + r8 * tz)
+            r0, r1, r2, r3, r4, r5, r6, r7, r8 = (
+                r0 * l0 + r1 * l3 + r2 * l6, r0 * l1 + r1 * l4 + r2 * l7, r0 * l2 + r1 * l5 + r2 * l8,
+                r3 * l0 + r4 * l3 + r5 * l6, r3 * l1 + r4 * l4 + r5 * l7, r3 * l2 + r4 * l5 + r5 * l8,
+                r6 * l0 + r7 * l3 + r8 * l6, r6 * l1 + r7 * l4 + r8 * l7, r6 * l2 + r7 * l5 + r8 * l8)
+            x, y, z = axis
+            origins.append((px, py, pz))
+            axes.append((r0 * x + r1 * y + r2 * z, r3 * x + r4 * y + r5 * z, r6 * x + r7 * y + r8 * z))
+        self._last_walk = (list(q), (origins, axes))
+        return origins, axes
+
+    def position(self, q):
+        """End position (x, y, z) for one list of chain angles."""
+        return self._walk(q)[0][-1]
+
+    def jacobian_columns(self, q):
+        """
+        End position and the Jacobian as one (x, y, z) column per chain
+        joint, for one list of chain angles (float version of jacobian()).
+        """
+        origins, axes = self._walk(q)
+        px, py, pz = origins[-1]
+        columns = []
+        for (ox, oy, oz), (ax, ay, az), (revolute, prismatic) in zip(origins, axes, self._kinds):
+            if revolute:
+                dx, dy, dz = px - ox, py - oy, pz - oz
+                columns.append((ay * dz - az * dy, az * dx - ax * dz, ax * dy - ay * dx))
+            elif prismatic:
+                columns.append((ax, ay, az))
+            else:
+                columns.append((0.0, 0.0, 0.0))
+        return (px, py, pz), columns
+
+    def dls_step(self, q, columns, error, damping_sq):
+        """
+        Chain angles after one damped least squares step from `q`, clamped
+        to the limits. Joints pinned at a limit that the step pushes further
+        out are dropped and the step is solved again without them.
+        """
+        x, y, z = _damped_solve(columns, damping_sq, error)
+        dq = [cx * x + cy * y + cz * z for cx, cy, cz in columns]
+        blocked = [(v <= lo and d < 0) or (v >= hi and d > 0)
+                   for v, d, lo, hi in zip(q, dq, self.lower_list, self.upper_list)]
+        if any(blocked):
+            columns = [(0.0, 0.0, 0.0) if b else column for column, b in zip(columns, blocked)]
+            x, y, z = _damped_solve(columns, damping_sq, error)
+            dq = [cx * x + cy * y + cz * z for cx, cy, cz in columns]
+        return [min(max(v + d, lo), hi) for v, d, lo, hi in zip(q, dq, self.lower_list, self.upper_list)]
+
+
+def _take(values, indices):
+    """values[indices] as a list of floats, for a list or an array `values`."""
+    values = np.asarray(values, dtype=np.float64)
+    return values[indices].tolist()
+
+
+def _damped_solve(columns, damping_sq, error):
+    """
+    x with (J J^T + damping_sq I) x = error for J given by its 3-vector
+    `columns`; symmetric 3x3 system solved with Cramer's rule.
+    """
+    a = e = i = damping_sq
+    b1 = c = f = 0.0
+    for cx, cy, cz in columns:
+        a += cx * cx
+        b1 += cx * cy
+        c += cx * cz
+        e += cy * cy
+        f += cy * cz
+        i += cz * cz
+    x, y, z = error
+    co_a = e * i - f * f
+    co_b = f * c - b1 * i
+    co_c = b1 * f - e * c
+    det = a * co_a + b1 * co_b + c * co_c
+    return ((x * co_a + y * co_b + z * co_c) / det,
+            (x * co_b + y * (a * i - c * c) + z * (c * b1 - a * f)) / det,
+            (x * co_c + y * (b1 * c - a * f) + z * (a * e - b1 * b1)) / det)
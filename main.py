@@ -1,94 +1,402 @@
+import argparse
 import csv
+import queue
+import time
 import pygame
+from control_loop import ControlLoop, ControlSnapshot
 from ui import UI
 from ws_client import RosbridgeClient
 from joystick_handler import JoystickHandler
 from iksolver import IKSolver
+from ik_cache import load_ik_cache
+from trajectory_planner import TrajectoryPlanner, planner_settings
+from collision import collision_settings
+from model_cache import load_robot
+from input_log import InputRecorder, KeyState, sample_input
+from wheel_filter import FilteredWheelPublisher, WheelFilter, filter_settings
+from arm_trajectory import TrajectoryStreamer, trajectory_settings, trajectory_template
+from profiler import PROFILER, profiled
 
-def load_rosbridge_port(filename="config.csv"):
+def load_global_config(filename="config.csv"):
+    """讀取 CSV 中所有 type 為 global 的參數，回傳 {param: value1}"""
+    params = {}
     try:
         with open(filename, newline='') as f:
             reader = csv.DictReader(f)
             for row in reader:
-                if row["type"] == "global" and row["param"] == "rosbridge_port":
-                    return int(row["value1"])
+                if row["type"] == "global":
+                    params[row["param"]] = (row["value1"] or "").strip()
     except Exception as e:
+        print("Error loading global config from CSV:", e)
+    return params
+
+def load_rosbridge_port(filename="config.csv"):
+    try:
+        return int(load_global_config(filename).get("rosbridge_port", 9090))
+    except ValueError as e:
         print("Error loading rosbridge_port from CSV:", e)
     return 9090  # 預設值
 
-def publish_wheel(ws_client, cmd, front_topic, rear_topic, front_range, rear_range):
-    # 建立後輪與前輪的完整訊息（std_msgs/Float32MultiArray）
-    rear_msg = {
-        "layout": {
-            "dim": [{
-                "label": "rear_wheels",
-                "size": front_range[1] - front_range[0],  # 可依實際需求調整
-                "stride": front_range[1] - front_range[0]
-            }],
-            "data_offset": 0
-        },
-        "data": cmd[rear_range[0]:rear_range[1]]
-    }
-    front_msg = {
+def parse_args(argv=None, config=None):
+    """命令列參數，未指定時使用 config.csv 中的值"""
+    config = config if config is not None else load_global_config()
+    parser = argparse.ArgumentParser(description="PS5 controller robot teleop")
+    parser.add_argument("--physics-backend", choices=["direct", "gui", "shared_memory"],
+                        default=config.get("physics_backend") or "direct",
+                        help="pybullet backend for the IK solver (default: headless direct)")
+    parser.add_argument("--ik-backend", choices=["pybullet", "numpy"],
+                        default=config.get("ik_backend") or "pybullet",
+                        help="IK engine: built-in numpy damped least squares or pybullet")
+    parser.add_argument("--workspace-grid", default=config.get("workspace_grid") or None,
+                        help="workspace grid directory built by workspace.py for IK seeding")
+    parser.add_argument("--control-rate", type=float,
+                        default=float(config.get("control_rate") or 100),
+                        help="control loop rate in Hz (input sampling, IK, publishing)")
+    parser.add_argument("--ui-rate", type=float,
+                        default=float(config.get("ui_rate") or 30),
+                        help="UI redraw rate in Hz")
+    parser.add_argument("--publish-rate", type=float,
+                        default=float(config.get("publish_rate") or 50),
+                        help="max rate per topic sent to rosbridge in Hz (0: send every change)")
+    parser.add_argument("--publish-keepalive", type=float,
+                        default=float(config.get("publish_keepalive") or 1.0),
+                        help="resend unchanged messages after this many seconds")
+    parser.add_argument("--arm-command-mode", choices=["point", "trajectory"],
+                        default=config.get("arm_command_mode") or "point",
+                        help="arm commands: one JointTrajectoryPoint per frame or JointTrajectory chunks")
+    parser.add_argument("--arm-motion-profile", choices=["scurve", "trapezoid", "blend"],
+                        default=config.get("arm_motion_profile") or "scurve",
+                        help="reset / preset pose moves: limited s-curve or trapezoid trajectory, or per-frame blend")
+    parser.add_argument("--self-collision", type=parse_bool,
+                        default=parse_bool(config.get("self_collision") or "false"),
+                        help="reject / cut back arm goals whose link capsules collide (true/false)")
+    parser.add_argument("--profile", type=parse_bool,
+                        default=parse_bool(config.get("profile") or "false"),
+                        help="time the hot-path stages and show them on screen (true/false)")
+    parser.add_argument("--profile-export", default=config.get("profile_export") or None,
+                        help="write the profile on exit: .csv, otherwise Chrome trace JSON")
+    parser.add_argument("--auto-reconnect", type=parse_bool,
+                        default=parse_bool(config.get("auto_reconnect") or "true"),
+                        help="reconnect to rosbridge in the background when the link drops (true/false)")
+    parser.add_argument("--record", default=None,
+                        help="record joystick / keyboard input to this log for replay with input_log.py")
+    return parser.parse_args(argv)
+
+def parse_bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+def wheel_template(label, wheel_range):
+    """Float32MultiArray 的固定部分（layout），data 於發佈時填入"""
+    size = wheel_range[1] - wheel_range[0]
+    return {
         "layout": {
-            "dim": [{
-                "label": "front_wheels",
-                "size": rear_range[1] - rear_range[0],
-                "stride": rear_range[1] - rear_range[0]
-            }],
+            "dim": [{"label": label, "size": size, "stride": size}],
             "data_offset": 0
         },
-        "data": cmd[front_range[0]:front_range[1]]
+        "data": None
     }
-    
-    ws_client.publish(rear_topic, rear_msg)
-    ws_client.publish(front_topic, front_msg)
 
-def main():
+class WheelPublisher:
+    """
+    Wheel publish callback built once: advertises every wheel topic with a
+    message template and publishes only its slice of the command per call.
+    """
+    def __init__(self, ws_client, wheel_groups):
+        """
+        wheel_groups: (topic, (start, end), label) per topic, e.g.
+            JoystickHandler.wheel_groups
+        """
+        self.ws_client = ws_client
+        self.wheel_groups = list(wheel_groups)
+        self.slices = [(topic, slice(*wheel_range)) for topic, wheel_range, _ in self.wheel_groups]
+        self.publish_data = ws_client.publish_data
+
+    def advertise(self):
+        for topic, wheel_range, label in self.wheel_groups:
+            self.ws_client.advertise_topic(topic, "std_msgs/Float32MultiArray",
+                                           template=wheel_template(label, wheel_range))
+
+    @profiled("main.publish_wheel")
+    def __call__(self, cmd):
+        for topic, wheel_slice in self.slices:
+            self.publish_data(topic, cmd[wheel_slice])
+
+class ArmPublisher:
+    """Arm publish callback publishing `positions` through a message template."""
+    def __init__(self, ws_client, arm_topic):
+        self.ws_client = ws_client
+        self.arm_topic = arm_topic
+        self.publish_data = ws_client.publish_data
+
+    def advertise(self):
+        self.ws_client.advertise_topic(self.arm_topic, "trajectory_msgs/JointTrajectoryPoint",
+                                       template={"positions": None}, field="positions")
+
+    def __call__(self, arm_msg):
+        self.publish_data(self.arm_topic, arm_msg["positions"])
+
+class ArmTrajectoryPublisher:
+    """Arm publish callback for TrajectoryStreamer: publishes JointTrajectory points."""
+    def __init__(self, ws_client, topic, joint_names):
+        self.ws_client = ws_client
+        self.topic = topic
+        self.joint_names = list(joint_names)
+        self.publish_data = ws_client.publish_data
+
+    def advertise(self):
+        self.ws_client.advertise_topic(self.topic, "trajectory_msgs/JointTrajectory",
+                                       template=trajectory_template(self.joint_names), field="points")
+
+    def __call__(self, points):
+        self.publish_data(self.topic, points)
+
+class TeleopControl:
+    """
+    One control-thread step: handle queued button presses, sample the
+    joysticks and keyboard, run IK and publish. main() runs it in the
+    ControlLoop; benchmark.py runs it headless with virtual joysticks.
+    """
+    def __init__(self, joystick_handler, ik, wheel_publish_callback, arm_publish_callback,
+                 joysticks, joint_offset, initial_pose, get_pressed=None, recorder=None,
+                 wheel_filter=None, arm_trajectory=None, sample_on_step=True):
+        """
+        joysticks: instance id -> joystick, updated by the main thread on hotplug
+        get_pressed: keyboard state source, pygame.key.get_pressed by default
+        sample_on_step: read `joysticks` / `get_pressed` at the start of every
+            step. main() turns this off and calls sample_input() on the main
+            thread every frame instead, since pygame's joystick and keyboard
+            state must not be read from the control thread
+        recorder: optional input_log.InputRecorder; every step's input and
+            a checksum of its published commands are written to it
+        wheel_filter: optional wheel_filter.WheelFilter; wheel commands
+            become its targets and the filtered output is published every step
+        arm_trajectory: optional arm_trajectory.TrajectoryStreamer keyword
+            arguments; arm_publish_callback then receives JointTrajectory
+            points, published in chunks instead of every step
+        """
+        self.joystick_handler = joystick_handler
+        self.ik = ik
+        self.recorder = recorder
+        if recorder is not None:
+            wheel_publish_callback = recorder.digest.wrap_wheel(wheel_publish_callback)
+            arm_publish_callback = (recorder.digest.wrap_trajectory(arm_publish_callback)
+                                    if arm_trajectory is not None else
+                                    recorder.digest.wrap_arm(arm_publish_callback))
+        self.wheel_output = None
+        if wheel_filter is not None and wheel_filter.enabled:
+            self.wheel_output = FilteredWheelPublisher(wheel_filter, wheel_publish_callback)
+            wheel_publish_callback = self.wheel_output
+        self.wheel_publish_callback = wheel_publish_callback
+        self.arm_output = None
+        if arm_trajectory is not None:
+            self.arm_output = TrajectoryStreamer(ik, arm_publish_callback,
+                                                 joystick_handler.control_period, **arm_trajectory)
+            arm_publish_callback = self.arm_output
+        self.arm_publish_callback = arm_publish_callback
+        self.joysticks = joysticks
+        self.joint_offset = joint_offset
+        self.initial_pose = initial_pose
+        self.get_pressed = get_pressed or pygame.key.get_pressed
+        self.sample_on_step = sample_on_step
+        # 按鍵事件由主執行緒交給控制執行緒處理，JoystickHandler 只在控制執行緒中修改
+        self.button_presses = queue.SimpleQueue()
+        # 主執行緒取樣的搖桿與鍵盤狀態（複本），整個 tuple 一次替換；取樣前視為無輸入
+        self.input = ({}, KeyState(0))
+        self.enabled = False
+
+    def press_button(self, button):
+        """Queue a button press for the next step (callable from any thread)."""
+        self.button_presses.put(button)
+
+    def sample_input(self):
+        """
+        Copy the current joystick and keyboard state for the next step. With
+        sample_on_step off, the main thread calls this every frame.
+        """
+        self.input = sample_input(self.joysticks, self.get_pressed())
+
+    def step(self):
+        handler = self.joystick_handler
+        buttons = []
+        while True:
+            try:
+                buttons.append(self.button_presses.get_nowait())
+            except queue.Empty:
+                break
+        enabled = self.enabled
+        joysticks, keys = {}, None
+        if enabled:
+            if self.sample_on_step:
+                self.sample_input()
+            # copies, so the log holds exactly what the step saw
+            joysticks, keys = self.input
+        # 按鍵事件與長按連發（不阻塞）
+        handler.process_buttons(
+            buttons, joysticks,
+            wheel_publish_callback=self.wheel_publish_callback,
+            arm_publish_callback=self.arm_publish_callback
+        )
+        if enabled:
+            #continuously pull joystick data instead of waiting for events (for 0s)
+            if joysticks:
+                handler.process_joystick_continuous(
+                    joysticks,
+                    wheel_publish_callback=self.wheel_publish_callback,
+                    ik=self.ik
+                )
+
+            handler.process_keypress_continuous(
+                keys,
+                wheel_publish_callback=self.wheel_publish_callback,
+                arm_publish_callback=self.arm_publish_callback,
+                ik = self.ik,
+                joint_offset_degree = self.joint_offset,
+                initial_pose = self.initial_pose,
+                # 有搖桿時鍵盤放開不送零速，避免覆蓋搖桿的輪速
+                idle_wheel_publish = not joysticks
+            )
+        if self.wheel_output is not None:
+            # 平滑濾波每個控制週期推進一次
+            self.wheel_output.tick()
+        if self.arm_output is not None:
+            # 手臂軌跡依控制週期分段送出
+            self.arm_output.tick()
+        if self.recorder is not None:
+            self.recorder.write_frame(buttons, enabled, joysticks, keys)
+        return ControlSnapshot(
+            handler.velocity,
+            handler.arm_index,
+            tuple(handler.arm_angles),
+            tuple(handler.wheel_speed),
+            time.perf_counter()
+        )
+
+# 控制參數原本以 30 Hz 的每幀步長調校
+BASE_FRAME_RATE = 30.0
+
+def main(argv=None):
+    config = load_global_config()
+    args = parse_args(argv, config)
+    if args.profile or args.profile_export:
+        PROFILER.enable()
     pygame.init()
     clock = pygame.time.Clock()
     ui = UI()
     # 從 CSV 中讀取 rosbridge_port
     rosbridge_port = load_rosbridge_port()
-    ws_client = RosbridgeClient(rosbridge_port=rosbridge_port)
+    ws_client = RosbridgeClient(rosbridge_port=rosbridge_port,
+                                publish_rate=args.publish_rate,
+                                keepalive=args.publish_keepalive,
+                                auto_reconnect=args.auto_reconnect)
     joystick_handler = JoystickHandler()
 
     joysticks = {}
     initial_pose = [0, -80, 90, 90, 0, 0, 0, 0, 0, 0]
-    ik = IKSolver("robotArm_ver7.urdf", initial_pose, 6)
+    # keep arm speed independent of the control rate
+    frame_scale = BASE_FRAME_RATE / args.control_rate
+    joystick_handler.arm_move_step *= frame_scale
+    joystick_handler.control_period = 1.0 / args.control_rate
+    # reset / preset poses follow velocity and acceleration limited trajectories
+    planner = None
+    motion = planner_settings(dict(config, arm_motion_profile=args.arm_motion_profile),
+                              joystick_handler.joint_max_velocity,
+                              joystick_handler.joint_max_acceleration, len(initial_pose))
+    if motion is not None:
+        planner = TrajectoryPlanner(dt=1.0 / args.control_rate, **motion)
+    # link capsules are fitted on first use and kept in the compiled model cache next to the URDF
+    collision = collision_settings(dict(config, self_collision=str(args.self_collision)))
+    self_collision = None
+    if collision is not None:
+        self_collision = load_robot("robotArm_ver7.urdf").self_collision(**collision)
+    ik = IKSolver("robotArm_ver7.urdf", initial_pose, 6,
+                  blend_factor=1.0 - (1.0 - 0.5) ** frame_scale,
+                  physics_backend=args.physics_backend,
+                  ik_backend=args.ik_backend,
+                  workspace_grid=args.workspace_grid,
+                  ik_cache=load_ik_cache(config),
+                  planner=planner,
+                  self_collision=self_collision)
     # real_robot_joint_initial = [90, 10, 160, 90, 90, 90, 70]
     # real_robot_straight = [90, 90, 90, 0, 90, 90, 70]
     # joint_offset = [-90, -90, -70, 90, 90, 90, 70]
     # joint_offset = [-90, -90, -70, 90, 90, 90, 70]
     joint_offset = [-90, -90, -70, 0, -90, -90, -70]
 
+    # publish callbacks are created once; message envelopes are encoded at advertise time
+    wheel_publish_callback = WheelPublisher(ws_client, joystick_handler.wheel_groups)
+    arm_trajectory = trajectory_settings(dict(config, arm_command_mode=args.arm_command_mode))
+    if arm_trajectory is not None:
+        # URDF joint names unless arm_joint_names lists them
+        joint_names = ([name.strip() for name in config["arm_joint_names"].split(";")]
+                       if config.get("arm_joint_names") else ik.model.joint_names[:len(joint_offset)])
+        arm_publish_callback = ArmTrajectoryPublisher(
+            ws_client, config.get("arm_trajectory_topic") or "/robot_arm_trajectory", joint_names)
+    else:
+        arm_publish_callback = ArmPublisher(ws_client, joystick_handler.arm_topic)
+
+    wheel_filter = WheelFilter(1.0 / args.control_rate, **filter_settings(config, args.publish_rate))
+
+    recorder = None
+    if args.record:
+        recorder = InputRecorder(args.record, {
+            "control_rate": args.control_rate,
+            "ik_backend": args.ik_backend,
+            "workspace_grid": args.workspace_grid,
+            "urdf": "robotArm_ver7.urdf",
+            "initial_pose": initial_pose,
+            "joint_offset": joint_offset,
+            "arm_move_step": joystick_handler.arm_move_step,
+            "blend_factor": ik.blend,
+            "ik_cache": ik.ik_cache.settings() if ik.ik_cache is not None else None,
+            "wheel_filter": dict(filter_settings(config, args.publish_rate), dt=wheel_filter.dt),
+            "arm_trajectory": arm_trajectory,
+            "planner": planner.settings() if planner is not None else None,
+            "self_collision": collision,
+        })
+        print(f"Recording input to {args.record}")
+
+    teleop = TeleopControl(joystick_handler, ik, wheel_publish_callback, arm_publish_callback,
+                           joysticks, joint_offset, initial_pose, recorder=recorder,
+                           wheel_filter=wheel_filter, arm_trajectory=arm_trajectory,
+                           sample_on_step=False)
+
+    control = ControlLoop(profiled("control.step")(teleop.step), rate_hz=args.control_rate).start()
+
     # 初始狀態：輸入 IP 模式
     input_mode = True
     ip_input = ""
-    connection_error = ""
     rosbridge_ip = ""
 
+    # 主執行緒以較高頻率處理事件，畫面只依 ui_rate 重繪
+    ui_period = 1.0 / args.ui_rate
+    next_draw = time.perf_counter()
+    profile_lines = []
+    next_profile = next_draw
+    event_rate = max(args.ui_rate, args.control_rate)
+
     running = True
-    while running:
+    while running and control.is_alive():
         for event in pygame.event.get():
+            if recorder is not None:
+                recorder.record_event(event)
             if event.type == pygame.QUIT:
                 running = False
 
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # 視窗被遮蔽後重新顯示時整個畫面重畫
+                ui.invalidate()
+
             elif event.type == pygame.KEYDOWN:
                 # 當處於 IP 輸入模式時，累積使用者輸入
                 if input_mode:
                     if event.key == pygame.K_RETURN:
                         if ip_input:
                             rosbridge_ip = ip_input
-                            if ws_client.connect(rosbridge_ip):
-                                connection_error = ""
-                                # 連線成功後 advertise topic
-                                ws_client.advertise_topic(joystick_handler.rear_wheel_topic, "std_msgs/Float32MultiArray")
-                                ws_client.advertise_topic(joystick_handler.front_wheel_topic, "std_msgs/Float32MultiArray")
-                                # Advertise arm topic
-                                ws_client.advertise_topic(joystick_handler.arm_topic, "trajectory_msgs/JointTrajectoryPoint")
-                            else:
-                                connection_error = "Connection failed"
+                            # 背景連線，不阻塞畫面；advertise 會排隊到連線成功後送出
+                            ws_client.connect_async(rosbridge_ip)
+                            wheel_publish_callback.advertise()
+                            # Advertise arm topic
+                            arm_publish_callback.advertise()
                         input_mode = False
                         ip_input = ""
                     elif event.key == pygame.K_BACKSPACE:
@@ -100,20 +408,11 @@ def main():
                         input_mode = True
                         ip_input = ""
                     elif event.key == pygame.K_q:
-                        ws_client.disconnect()
                         running = False
 
             if not input_mode:
                 if event.type == pygame.JOYBUTTONDOWN:
-                    joystick_handler.process_button_press(
-                        event.button,
-                        wheel_publish_callback=lambda cmd: publish_wheel(ws_client, cmd,
-                            joystick_handler.front_wheel_topic,
-                            joystick_handler.rear_wheel_topic,
-                            joystick_handler.front_wheel_range,
-                            joystick_handler.rear_wheel_range),
-                        arm_publish_callback=lambda arm_msg: ws_client.publish(joystick_handler.arm_topic, arm_msg)
-                    )
+                    teleop.press_button(event.button)
                 # elif event.type == pygame.JOYAXISMOTION:
                 #     joystick_handler.process_axis_motion(
                 #         event.axis, 
@@ -134,45 +433,53 @@ def main():
                 del joysticks[event.instance_id]
                 print(f"Joystick {event.instance_id} disconnected")
         if not input_mode:
-            #continuously pull joystick data instead of waiting for events (for 0s)
-            if pygame.joystick.get_count() > 0:
-                joystick_handler.process_joystick_continuous(
-                    joysticks, 
-                    wheel_publish_callback=lambda cmd: publish_wheel(ws_client, cmd,
-                        joystick_handler.front_wheel_topic,
-                        joystick_handler.rear_wheel_topic,
-                        joystick_handler.front_wheel_range,
-                        joystick_handler.rear_wheel_range)
-                )
-            keys = pygame.key.get_pressed()
-            
-            joystick_handler.process_keypress_continuous(
-                keys,
-                wheel_publish_callback=lambda cmd: publish_wheel(ws_client, cmd,
-                    joystick_handler.front_wheel_topic,
-                    joystick_handler.rear_wheel_topic,
-                    joystick_handler.front_wheel_range,
-                    joystick_handler.rear_wheel_range),
-                arm_publish_callback=lambda arm_msg: ws_client.publish(joystick_handler.arm_topic, arm_msg),
-                ik = ik,
-                joint_offset_degree = joint_offset,
-                initial_pose = initial_pose
-            )
+            # pygame 的搖桿與鍵盤狀態只在主執行緒讀取，控制執行緒使用這份快照
+            teleop.sample_input()
+        teleop.enabled = not input_mode
 
-        connection_status = "Connected" if ws_client.ws else "Disconnected"
-        ui.draw(
-            joystick_handler.velocity,
-            rosbridge_ip,
-            connection_status,
-            connection_error,
-            input_mode,
-            ip_input,
-            joystick_handler.arm_index,
-            joystick_handler.arm_angles,
-            joystick_handler.wheel_speed
-        )
-        clock.tick(30)
+        now = time.perf_counter()
+        if now >= next_draw:
+            next_draw = max(next_draw + ui_period, now)
+            snapshot = control.snapshot
+            if snapshot is not None:
+                if PROFILER.enabled and now >= next_profile:
+                    next_profile = now + 1.0
+                    profile_lines = ["stage  p50 / p99 us"] + [
+                        f"{name}  {p50 * 1e6:.0f} / {p99 * 1e6:.0f}"
+                        for name, _, _, p50, p99, _ in PROFILER.summary()]
+                connection_status = ws_client.state.capitalize()
+                if ws_client.reconnects:
+                    connection_status += (f" ({ws_client.reconnects} reconnects, "
+                                          f"last outage {ws_client.reconnect_times[-1]:.1f} s)")
+                connection_error = f"Connection failed: {ws_client.last_error}" if ws_client.state == "failed" else ""
+                ui.draw(
+                    snapshot.velocity,
+                    rosbridge_ip,
+                    connection_status,
+                    connection_error,
+                    input_mode,
+                    ip_input,
+                    snapshot.arm_index,
+                    snapshot.arm_angles,
+                    snapshot.wheel_speed,
+                    control_stats=control.stats.format_summary(),
+                    profile_lines=profile_lines
+                )
+        clock.tick(event_rate)
 
+    control.stop()
+    ik.close()
+    print("Control loop:", control.stats.format_summary())
+    print("IK:", ik.format_stats())
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames and {recorder.events} events to {args.record}")
+    if PROFILER.enabled:
+        print(PROFILER.format_summary())
+        print(PROFILER.format_histograms())
+        if args.profile_export:
+            PROFILER.export(args.profile_export)
+            print(f"Profile written to {args.profile_export}")
     ws_client.disconnect()
     pygame.quit()
 
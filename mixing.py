@@ -0,0 +1,122 @@
+"""
+Wheel mixing for any number of controllers.
+
+Each cycle the drive axes of every joystick are read once into a row of
+[horizontal, vertical, clockwise trigger, counterclockwise trigger] with
+trigger scaling and the deadzone applied. The wheel command is one product
+of the selected row with a (wheels, 4) mixing matrix precomputed from the
+drive model (drive_model.py). Rows are 4 values for a few controllers, so
+they are plain tuples and the product is unrolled: a single numpy call
+costs more than the whole mix at this size.
+
+With more than one controller, one command per cycle is chosen by policy:
+
+    priority     the first controller (lowest instance id) with a stick
+                 or trigger outside the deadzone
+    sum          inputs of all controllers added, clipped to the axis range
+    last_active  the controller whose input changed most recently
+"""
+from drive_model import mecanum
+
+MIX_POLICIES = ("priority", "sum", "last_active")
+
+# input range after trigger scaling (triggers rest at -1 and end at 1, mapped to 0..1)
+_INPUT_MIN = (-1.0, -1.0, 0.0, 0.0)
+_INPUT_MAX = (1.0, 1.0, 1.0, 1.0)
+
+
+class WheelMixer:
+    def __init__(self, horizontal_axis, vertical_axis, clockwise_axis, counterclockwise_axis,
+                 deadzone=0.1, policy="last_active", drive_model=None):
+        """
+        *_axis: joystick axis ids of the drive inputs
+        deadzone: inputs with |value| <= deadzone (after trigger scaling) count as 0
+        policy: how several controllers are combined, one of MIX_POLICIES
+        drive_model: drive_model.DriveModel mapping motion to wheel outputs
+            (mecanum by default)
+        """
+        if policy not in MIX_POLICIES:
+            print(f"Unknown wheel mix policy '{policy}', using last_active.")
+            policy = "last_active"
+        self.axes = (horizontal_axis, vertical_axis, clockwise_axis, counterclockwise_axis)
+        self.deadzone = deadzone
+        self.policy = policy
+        self.drive_model = drive_model or mecanum()
+        # inputs [h, v, cw, ccw] -> outputs: vertical = -v (stick up is negative),
+        # rotational = cw - ccw; one coefficient row per output plus its velocity flag
+        self.matrix = tuple((b, -a, c, -c, not fixed)
+                            for (a, b, c), fixed in zip(self.drive_model.matrix, self.drive_model.fixed))
+        self._rest = (0.0,) * len(self.axes)
+        self._last_inputs = {}      # instance id -> inputs of the previous cycle
+        self._active = None         # instance id of the last active controller
+
+    def sample(self, joysticks):
+        """Read the drive axes of every joystick once. Returns (ids, input rows)."""
+        ids = sorted(joysticks)
+        return ids, [self.inputs(joysticks[i]) for i in ids]
+
+    def inputs(self, joystick):
+        """One controller's drive axes, read once, with trigger scaling and deadzone."""
+        horizontal_axis, vertical_axis, clockwise_axis, counterclockwise_axis = self.axes
+        get_axis = joystick.get_axis
+        deadzone = self.deadzone
+        horizontal = get_axis(horizontal_axis)
+        vertical = get_axis(vertical_axis)
+        clockwise = (get_axis(clockwise_axis) + 1) / 2
+        counterclockwise = (get_axis(counterclockwise_axis) + 1) / 2
+        return (horizontal if abs(horizontal) > deadzone else 0.0,
+                vertical if abs(vertical) > deadzone else 0.0,
+                clockwise if abs(clockwise) > deadzone else 0.0,
+                counterclockwise if abs(counterclockwise) > deadzone else 0.0)
+
+    def mix(self, joysticks, velocity):
+        """
+        One wheel command (list of floats, scaled by `velocity`) for all
+        `joysticks` (instance id -> joystick), or None without joysticks.
+        """
+        if not joysticks:
+            return None
+        if len(joysticks) == 1:
+            # nothing to arbitrate; keep last_active state current for hotplug
+            (instance_id, joystick), = joysticks.items()
+            selected = self.inputs(joystick)
+            if self.policy == "last_active":
+                self._last_inputs = {instance_id: selected}
+                self._active = instance_id
+        else:
+            selected = self.arbitrate(*self.sample(joysticks))
+        return self.apply(selected, velocity)
+
+    def apply(self, inputs, velocity):
+        """Wheel speeds for one input row: the mixing matrix product times velocity."""
+        h, v, cw, ccw = inputs
+        return [(a * h + b * v + c * cw + d * ccw) * (velocity if scaled else 1.0)
+                for a, b, c, d, scaled in self.matrix]
+
+    def arbitrate(self, ids, inputs):
+        """The input row that drives the wheels this cycle."""
+        if self.policy == "sum":
+            return tuple(min(max(sum(column), low), high)
+                         for column, low, high in zip(zip(*inputs), _INPUT_MIN, _INPUT_MAX))
+        if self.policy == "priority":
+            rest = self._rest
+            return next((row for row in inputs if row != rest), inputs[0])
+
+        # last_active: follow whichever controller changed last, so
+        # releasing its stick stops the robot even if another is held
+        last = self._last_inputs
+        rest = self._rest
+        # a controller plugged in at rest does not take over
+        changed = [i for i, row in zip(ids, inputs) if last.get(i, rest) != row]
+        if len(last) != len(ids):
+            for instance_id in [i for i in last if i not in ids]:
+                del last[instance_id]
+        for instance_id, row in zip(ids, inputs):
+            last[instance_id] = row
+        if changed:
+            # several changed in one cycle: prefer one that is not at rest
+            moving = [i for i in changed if last[i] != rest]
+            self._active = (moving or changed)[0]
+        if self._active not in last:
+            self._active = ids[0]
+        return last[self._active]
@@ -0,0 +1,277 @@
+"""
+Compiled robot model cache.
+
+Parsing the URDF happens once; the result is written next to the URDF in
+<urdf>.model.bin and later runs map that file instead. The self-collision
+capsules are fitted to the STL meshes only when a collision checker is
+first asked for (CompiledRobot.self_collision) and are then added to the
+same file:
+
+    b"RMDL" | u16 version | u32 header length | JSON header | padding | arrays
+
+The JSON header holds the SHA-1 of the URDF contents, the size and time of
+every mesh file, the joint / link names and types, and the offset, dtype
+and shape of each array (joint parents, origins, axes and limits, the base
+inertial offset, the link capsules). The arrays are read-only views of a
+memory map, so loading costs one small JSON parse. The file is rebuilt when
+the URDF contents or a mesh file change.
+
+The meshes themselves are only read to fit the capsules, so runs without
+self-collision never read them; pybullet loads them for the pybullet IK
+backend (collision meshes only, they set the simulated link inertia) and
+when a viewer is requested (IKSolver with the gui / shared_memory physics
+backend).
+
+    python model_cache.py build [--urdf robotArm_ver7.urdf]     (fits the capsules too)
+    python model_cache.py info [--urdf robotArm_ver7.urdf]
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+from kinematics import RobotModel
+from collision import SelfCollision, link_meshes
+
+MAGIC = b"RMDL"
+VERSION = 1
+
+_HEADER = struct.Struct("<HI")
+_ALIGN = 16
+
+# capsule arrays of SelfCollision, stored as capsule_<name>
+CAPSULE_ARRAYS = ("links", "starts", "ends", "radii", "pairs")
+
+# (urdf, cache file) -> CompiledRobot loaded by this process
+_loaded = {}
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def urdf_key(urdf_path):
+    """SHA-1 of the URDF contents."""
+    with open(urdf_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class CompiledRobot:
+    """Kinematic model and self-collision capsules of one URDF."""
+    def __init__(self, model, capsules=None, mesh_files=(), urdf_path=None, cache_path=None, key=None):
+        """
+        model: kinematics.RobotModel
+        capsules: SelfCollision capsule arrays by name (CAPSULE_ARRAYS),
+            None until fitted
+        mesh_files: mesh paths of the URDF links
+        urdf_path: URDF whose meshes the capsules are fitted to
+        cache_path / key: cache file rewritten with the capsules once they
+            are fitted, None to keep them in memory only
+        """
+        self.model = model
+        self.capsules = capsules
+        self.mesh_files = list(mesh_files)
+        self.urdf_path = urdf_path
+        self.cache_path = cache_path
+        self.key = key
+        self.capsule_error = None   # why fitting failed; not retried in this process
+
+    @classmethod
+    def compile(cls, urdf_path, fit_capsules=False):
+        """Parse `urdf_path`; the capsules are fitted on first use unless `fit_capsules`."""
+        model = RobotModel.from_urdf(urdf_path)
+        mesh_files = [path for path, _, _ in link_meshes(urdf_path).values()]
+        robot = cls(model, None, mesh_files, urdf_path)
+        if fit_capsules:
+            robot.fit_capsules()
+        return robot
+
+    def fit_capsules(self):
+        """
+        Fit the capsules to the meshes unless already done and add them to
+        the cache file. Returns False when the meshes could not be read.
+        """
+        if self.capsules is not None:
+            return True
+        if self.capsule_error is not None or self.urdf_path is None:
+            return False
+        try:
+            checker = SelfCollision.build(self.model, self.urdf_path)
+        except (OSError, ValueError) as e:
+            self.capsule_error = str(e)
+            print(f"Could not fit collision capsules to the meshes of '{self.urdf_path}': {e}")
+            return False
+        self.capsules = {name: getattr(checker, name) for name in CAPSULE_ARRAYS}
+        if self.cache_path is not None:
+            try:
+                self.save(self.cache_path, self.key)
+            except OSError as e:
+                print(f"Could not write robot model cache '{self.cache_path}': {e}")
+        return True
+
+    def self_collision(self, margin=0.0):
+        """SelfCollision on the capsules (fitted on the first call), None without meshes."""
+        if not self.fit_capsules():
+            return None
+        return SelfCollision(self.model, margin=margin, **self.capsules)
+
+    def save(self, path, key):
+        """Write the cache file (atomically: other processes may map the old one)."""
+        model = self.model
+        arrays = {
+            "parents": model.parents,
+            "origins": model.origins,
+            "axes": model.axes,
+            "lower_limits": model.lower_limits,
+            "upper_limits": model.upper_limits,
+            "base_offset": model.base_offset,
+        }
+        if self.capsules is not None:
+            arrays.update(("capsule_" + name, value) for name, value in self.capsules.items())
+        base_dir = os.path.dirname(os.path.abspath(path))
+        meshes = []
+        for mesh in self.mesh_files:
+            try:
+                stat = os.stat(mesh)
+                meshes.append([os.path.relpath(mesh, base_dir), stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                # rebuilt once the mesh shows up
+                meshes.append([os.path.relpath(mesh, base_dir), -1, -1])
+        header = {
+            "key": key,
+            "meshes": meshes,
+            "joint_names": model.joint_names,
+            "link_names": model.link_names,
+            "joint_types": model.joint_types,
+            "arrays": {},
+        }
+        blobs = []
+        offset = 0
+        for name, value in arrays.items():
+            value = np.ascontiguousarray(value)
+            header["arrays"][name] = [offset, value.dtype.str, list(value.shape)]
+            data = value.tobytes()
+            blobs.append(data + b"\0" * (_aligned(len(data)) - len(data)))
+            offset += len(blobs[-1])
+        data = json.dumps(header).encode()
+        start = len(MAGIC) + _HEADER.size + len(data)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(MAGIC + _HEADER.pack(VERSION, len(data)) + data)
+            f.write(b"\0" * (_aligned(start) - start))
+            for blob in blobs:
+                f.write(blob)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path, key=None, urdf_path=None):
+        """
+        CompiledRobot mapped from a file written by save(); None when it is
+        missing or unreadable, or `key` or a mesh file changed. Without
+        stored capsules they are fitted to the meshes of `urdf_path` on
+        first use and the file is rewritten with them.
+        """
+        try:
+            mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None
+        prefix = len(MAGIC) + _HEADER.size
+        if len(mapped) < prefix or bytes(mapped[:len(MAGIC)]) != MAGIC:
+            return None
+        version, length = _HEADER.unpack(bytes(mapped[len(MAGIC):prefix]))
+        if version != VERSION:
+            return None
+        try:
+            header = json.loads(bytes(mapped[prefix:prefix + length]))
+        except ValueError:
+            return None
+        if key is not None and header["key"] != key:
+            return None
+        base_dir = os.path.dirname(os.path.abspath(path))
+        mesh_files = []
+        for mesh, size, mtime in header["meshes"]:
+            mesh = os.path.join(base_dir, mesh)
+            try:
+                stat = os.stat(mesh)
+                current = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                current = (-1, -1)
+            if current != (size, mtime):
+                return None
+            mesh_files.append(mesh)
+        start = _aligned(prefix + length)
+        arrays = {}
+        for name, (offset, dtype, shape) in header["arrays"].items():
+            dtype = np.dtype(dtype)
+            first = start + offset
+            count = int(np.prod(shape)) * dtype.itemsize
+            arrays[name] = mapped[first:first + count].view(dtype).reshape(shape)
+        model = RobotModel(header["joint_names"], header["link_names"], header["joint_types"],
+                           arrays["parents"], arrays["origins"], arrays["axes"],
+                           arrays["lower_limits"], arrays["upper_limits"], arrays["base_offset"])
+        capsules = None
+        if "capsule_links" in arrays:
+            capsules = {name: arrays["capsule_" + name] for name in CAPSULE_ARRAYS}
+        return cls(model, capsules, mesh_files, urdf_path, path, header["key"])
+
+
+def cache_path_for(urdf_path):
+    return os.path.splitext(urdf_path)[0] + ".model.bin"
+
+
+def load_robot(urdf_path, cache_path=None):
+    """
+    CompiledRobot for `urdf_path`: shared within the process, mapped from
+    the cache file when it is current, otherwise compiled and written.
+    """
+    cache_path = cache_path or cache_path_for(urdf_path)
+    loaded_key = (os.path.abspath(urdf_path), os.path.abspath(cache_path))
+    robot = _loaded.get(loaded_key)
+    if robot is not None:
+        return robot
+    key = urdf_key(urdf_path)
+    robot = CompiledRobot.load(cache_path, key, urdf_path)
+    if robot is None:
+        robot = CompiledRobot.compile(urdf_path)
+        robot.cache_path, robot.key = cache_path, key
+        try:
+            robot.save(cache_path, key)
+        except OSError as e:
+            print(f"Could not write robot model cache '{cache_path}': {e}")
+    _loaded[loaded_key] = robot
+    return robot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compiled robot model cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="parse the URDF, fit the capsules and write the cache")
+    build.add_argument("--urdf", default="robotArm_ver7.urdf")
+    info = sub.add_parser("info", help="show the cached model (built when missing or stale)")
+    info.add_argument("--urdf", default="robotArm_ver7.urdf")
+    args = parser.parse_args(argv)
+
+    path = cache_path_for(args.urdf)
+    if args.command == "build":
+        start = time.perf_counter()
+        robot = CompiledRobot.compile(args.urdf, fit_capsules=True)
+        robot.save(path, urdf_key(args.urdf))
+        print(f"compiled in {(time.perf_counter() - start) * 1000:.1f} ms -> {path}")
+    else:
+        start = time.perf_counter()
+        robot = load_robot(args.urdf)
+        print(f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms from {path}")
+    model = robot.model
+    print(f"{model.num_joints} joints: {', '.join(model.joint_names)}")
+    print(f"base offset: {np.round(model.base_offset, 4).tolist()}")
+    if robot.capsules is None:
+        print("no collision capsules yet (fitted on the first self-collision check or by build)")
+    else:
+        print(f"{len(robot.capsules['links'])} capsules from {len(robot.mesh_files)} meshes, "
+              f"{len(robot.capsules['pairs'])} checked pairs")
+
+
+if __name__ == "__main__":
+    main()
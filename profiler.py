@@ -0,0 +1,174 @@
+"""
+Hot-path timing instrumentation.
+
+Functions decorated with @profiled("stage") are timed while the global
+PROFILER is enabled. When it is disabled the wrapper only checks one flag,
+so the decorators stay in production code.
+
+Each stage keeps a rolling window of durations for percentiles and a
+log2 histogram; completed calls are also kept as trace events that can be
+exported to CSV or to a Chrome trace (chrome://tracing, Perfetto).
+"""
+import collections
+import csv
+import functools
+import json
+import os
+import threading
+import time
+
+# histogram bucket upper bounds in microseconds: 1, 2, 4, ... 2^20 us
+HISTOGRAM_BOUNDS_US = [1 << i for i in range(21)]
+
+
+def bucket_label(index):
+    """Label of histogram bucket `index`, e.g. `<=64us`; the last one is open."""
+    if index < len(HISTOGRAM_BOUNDS_US):
+        return f"<={HISTOGRAM_BOUNDS_US[index]}us"
+    return f">{HISTOGRAM_BOUNDS_US[-1]}us"
+
+
+class StageStats:
+    def __init__(self, name, window=2000):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.durations = collections.deque(maxlen=window)
+        # stages are recorded on the control thread and summarized on the UI thread
+        self._lock = threading.Lock()
+
+    def add(self, duration):
+        with self._lock:
+            self.count += 1
+            self.total += duration
+            if duration > self.max:
+                self.max = duration
+            self.durations.append(duration)
+
+    def snapshot(self):
+        """Copy of the rolling window of durations (s)."""
+        with self._lock:
+            return list(self.durations)
+
+    def percentiles(self, *fractions):
+        values = sorted(self.snapshot())
+        if not values:
+            return [0.0] * len(fractions)
+        return [values[min(int(f * len(values)), len(values) - 1)] for f in fractions]
+
+    def histogram(self):
+        """Counts per HISTOGRAM_BOUNDS_US bucket over the rolling window."""
+        counts = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+        for duration in self.snapshot():
+            us = duration * 1e6
+            index = 0
+            while index < len(HISTOGRAM_BOUNDS_US) and us > HISTOGRAM_BOUNDS_US[index]:
+                index += 1
+            counts[index] += 1
+        return counts
+
+
+class Profiler:
+    def __init__(self, window=2000, max_events=200000):
+        """
+        window: durations kept per stage for percentiles / histograms
+        max_events: trace events kept for export (oldest dropped first)
+        """
+        self.enabled = False
+        self.window = window
+        self.stages = {}
+        self.events = collections.deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.stages = {}
+        self.events.clear()
+        self.origin = time.perf_counter()
+
+    def record(self, stage, start, end):
+        """Record one call of `stage` from perf_counter `start` to `end`."""
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages.setdefault(stage, StageStats(stage, self.window))
+        stats.add(end - start)
+        self.events.append((stage, start, end, threading.get_ident()))
+
+    def summary(self):
+        """Rows of (stage, count, mean, p50, p99, max) in seconds, by stage name."""
+        rows = []
+        for name in sorted(self.stages):
+            stats = self.stages[name]
+            p50, p99 = stats.percentiles(0.50, 0.99)
+            rows.append((name, stats.count, stats.total / stats.count if stats.count else 0.0,
+                         p50, p99, stats.max))
+        return rows
+
+    def format_summary(self):
+        lines = [f"{'stage':<38}{'count':>8}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for name, count, mean, p50, p99, worst in self.summary():
+            lines.append(f"{name:<38}{count:>8}{mean * 1e6:>10.1f}{p50 * 1e6:>10.1f}"
+                         f"{p99 * 1e6:>10.1f}{worst * 1e6:>10.1f}")
+        return "\n".join(lines)
+
+    def histograms(self):
+        """Stage name -> counts per HISTOGRAM_BOUNDS_US bucket, by stage name."""
+        return {name: self.stages[name].histogram() for name in sorted(self.stages)}
+
+    def format_histograms(self):
+        """One line per stage with the non-empty buckets, e.g. `<=64us 120`."""
+        lines = []
+        for name, counts in self.histograms().items():
+            buckets = [f"{bucket_label(i)} {count}" for i, count in enumerate(counts) if count]
+            lines.append(f"{name:<38}{', '.join(buckets)}")
+        return "\n".join(lines)
+
+    def export_csv(self, path):
+        """One row per recorded call: stage, thread, start and duration in us."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "thread", "start_us", "duration_us"])
+            for stage, start, end, tid in list(self.events):
+                writer.writerow([stage, tid, f"{(start - self.origin) * 1e6:.1f}",
+                                 f"{(end - start) * 1e6:.1f}"])
+
+    def export_chrome_trace(self, path):
+        """Complete ("X") events in the Chrome trace event JSON format."""
+        pid = os.getpid()
+        events = [{"name": stage, "cat": stage.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+                  for stage, start, end, tid in list(self.events)]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export(self, path):
+        """Export by extension: .csv or Chrome trace JSON otherwise."""
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+
+
+PROFILER = Profiler()
+
+
+def profiled(stage, profiler=PROFILER):
+    """Decorator timing every call of the function as `stage` while enabled."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(stage, start, time.perf_counter())
+        return wrapper
+    return decorate
@@ -0,0 +1,70 @@
+"""
+Arm commands with every optional solver feature off (no workspace grid,
+IK cache, planner or self-collision checker) against the original
+iksolver.py / joystick_handler.py: baseline_arm_commands.json holds the
+positions they published for an arrow-key / reset key sequence (pybullet
+IK, 0.1 m steps) and for a press of button 8.
+"""
+import json
+import math
+import os
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+pytest.importorskip("pybullet")
+
+from iksolver import IKSolver
+from joystick_handler import JoystickHandler
+
+with open(os.path.join(os.path.dirname(__file__), "data", "baseline_arm_commands.json")) as f:
+    BASELINE = json.load(f)
+
+KEYS = {"up": pygame.K_UP, "down": pygame.K_DOWN, "left": pygame.K_LEFT, "right": pygame.K_RIGHT,
+        "space": pygame.K_SPACE, "lctrl": pygame.K_LCTRL, "r": pygame.K_r}
+
+
+class Keys:
+    """pygame.key.get_pressed() stand-in with at most one key held."""
+    held = None
+
+    def __getitem__(self, key):
+        return self.held is not None and KEYS[self.held] == key
+
+
+@pytest.fixture
+def arm():
+    ik = IKSolver("robotArm_ver7.urdf", BASELINE["initial_pose"], 6, ik_backend="pybullet")
+    handler = JoystickHandler()
+    handler.arm_move_step = BASELINE["arm_move_step"]
+    yield handler, ik
+    ik.close()
+
+
+def step(handler, ik, keys, published):
+    handler.process_keypress_continuous(keys, lambda cmd: None, published.append, ik,
+                                        BASELINE["joint_offset"], BASELINE["initial_pose"])
+
+
+def test_arrow_keys_and_reset_key_match_baseline(arm):
+    handler, ik = arm
+    keys = Keys()
+    published = []
+    for held in BASELINE["keys"]:
+        keys.held = held
+        step(handler, ik, keys, published)
+    assert len(published) == len(BASELINE["positions"])
+    for frame, (msg, expected) in enumerate(zip(published, BASELINE["positions"])):
+        assert msg["positions"] == pytest.approx(expected, abs=1e-9), f"frame {frame} ({BASELINE['keys'][frame]})"
+
+
+def test_reset_button_ends_at_reset_angle(arm):
+    handler, ik = arm
+    assert handler.reset_arm_angle == BASELINE["reset_arm_angle"]
+    published = []
+    handler.process_button_press(8, lambda cmd: None, published.append)
+    for _ in range(60):
+        step(handler, ik, Keys(), published)
+    expected = BASELINE["reset_button_positions"]
+    assert published[-1]["positions"][:len(expected)] == pytest.approx(expected, abs=1e-6)
+    assert math.degrees(expected[0]) == pytest.approx(handler.reset_arm_angle)
@@ -0,0 +1,83 @@
+"""
+Capsule geometry: segment_distances against known layouts and a brute
+force over sampled points, and the fitted SelfCollision checker on the
+URDF meshes.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from collision import fit_capsule, segment_distances
+
+
+def distance(p1, q1, p2, q2):
+    return float(segment_distances(*(np.array(v, dtype=float) for v in (p1, q1, p2, q2))))
+
+
+def test_crossing_segments():
+    # perpendicular, crossing above each other's middle
+    assert distance([-1, 0, 0], [1, 0, 0], [0, -1, 0.3], [0, 1, 0.3]) == pytest.approx(0.3)
+    assert distance([-1, 0, 0], [1, 0, 0], [0, -1, 0], [0, 1, 0]) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_parallel_segments():
+    assert distance([0, 0, 0], [1, 0, 0], [0.2, 0.5, 0], [0.8, 0.5, 0]) == pytest.approx(0.5)
+    # parallel and past each other's end: closest points are the ends
+    assert distance([0, 0, 0], [1, 0, 0], [2, 0.5, 0], [3, 0.5, 0]) == pytest.approx(math.hypot(1, 0.5))
+
+
+def test_collinear_and_end_points():
+    assert distance([0, 0, 0], [1, 0, 0], [1.5, 0, 0], [3, 0, 0]) == pytest.approx(0.5)
+    # closest point of the second segment past the end of the first
+    assert distance([0, 0, 0], [1, 0, 0], [2, -1, 1], [2, 1, 1]) == pytest.approx(math.sqrt(2))
+
+
+def test_degenerate_segments():
+    # a point against a segment and against another point
+    assert distance([0.5, 1, 0], [0.5, 1, 0], [0, 0, 0], [1, 0, 0]) == pytest.approx(1.0)
+    assert distance([0, 0, 0], [0, 0, 0], [3, 4, 0], [3, 4, 0]) == pytest.approx(5.0)
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    p1, q1, p2, q2 = rng.uniform(-1, 1, (4, 200, 3))
+    result = segment_distances(p1, q1, p2, q2)
+    assert result.shape == (200,)
+    t = np.linspace(0.0, 1.0, 201)
+    for i in range(len(result)):
+        a = p1[i] + t[:, None] * (q1[i] - p1[i])
+        b = p2[i] + t[:, None] * (q2[i] - p2[i])
+        brute = np.min(np.linalg.norm(a[:, None] - b[None], axis=-1))
+        # the sampled minimum can only be larger, by at most one sample spacing
+        assert result[i] <= brute + 1e-9
+        assert brute - result[i] < 0.02
+
+
+def test_fit_capsule_encloses_points():
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(500, 3)) * [0.1, 0.02, 0.02] + [0.3, 0.0, 0.1]
+    start, end, radius = fit_capsule(points)
+    n = len(points)
+    distances = segment_distances(points, points, np.broadcast_to(start, (n, 3)), np.broadcast_to(end, (n, 3)))
+    assert np.all(distances <= radius + 1e-9)
+    # the segment runs along the long (x) axis
+    axis = (end - start) / np.linalg.norm(end - start)
+    assert abs(axis[0]) > 0.99
+
+
+def test_self_collision_on_the_arm():
+    from model_cache import CompiledRobot
+
+    robot = CompiledRobot.compile("robotArm_ver7.urdf", fit_capsules=True)
+    checker = robot.self_collision()
+    if checker is None:
+        pytest.skip("collision meshes missing")
+    zero = np.zeros(robot.model.num_joints)
+    # pairs touching in the assembled pose are not checked
+    assert not checker.in_collision(zero)
+    folded = np.radians([0, -80, 90, 90, 90, 0, 0, 0, 0, 0])
+    assert checker.in_collision(folded)
+    assert checker.colliding_pairs(folded)
+    batch = checker.in_collision(np.stack([zero, folded]))
+    assert batch.tolist() == [False, True]
@@ -0,0 +1,61 @@
+"""
+kinematics.RobotModel against pybullet: forward kinematics of every link
+for random configurations within the URDF limits, the single and batch
+APIs, and numpy IK landing on reachable targets.
+"""
+import numpy as np
+import pytest
+
+from kinematics import RobotModel
+
+URDF = "robotArm_ver7.urdf"
+
+
+@pytest.fixture(scope="module")
+def model():
+    return RobotModel.from_urdf(URDF)
+
+
+@pytest.fixture(scope="module")
+def configs(model):
+    rng = np.random.default_rng(0)
+    return rng.uniform(model.lower_limits, model.upper_limits, size=(50, model.num_joints))
+
+
+def test_forward_matches_pybullet(model, configs):
+    p = pytest.importorskip("pybullet")
+    client = p.connect(p.DIRECT)
+    try:
+        robot = p.loadURDF(URDF, basePosition=list(model.base_offset), useFixedBase=True,
+                           flags=p.URDF_IGNORE_VISUAL_SHAPES, physicsClientId=client)
+        assert p.getNumJoints(robot, physicsClientId=client) == model.num_joints
+        for q in configs:
+            for i, angle in enumerate(q):
+                p.resetJointState(robot, i, angle, physicsClientId=client)
+            for link in range(model.num_joints):
+                expected = p.getLinkState(robot, link, computeForwardKinematics=True,
+                                          physicsClientId=client)[4]
+                np.testing.assert_allclose(model.forward(q, link), expected, atol=1e-6)
+    finally:
+        p.disconnect(physicsClientId=client)
+
+
+def test_forward_batch_matches_single(model, configs):
+    batch = model.forward_batch(configs, 6)
+    single = np.array([model.forward(q, 6) for q in configs])
+    np.testing.assert_allclose(batch, single, atol=1e-12)
+
+
+def test_inverse_reaches_forward_positions(model, configs):
+    targets = model.forward_batch(configs, 6)
+    seeds = configs + 0.05
+    solved, _, converged = model.inverse_batch(targets, 6, seeds, residual_threshold=1e-5)
+    assert converged.mean() > 0.9
+    np.testing.assert_allclose(model.forward_batch(solved[converged], 6), targets[converged], atol=1e-4)
+    chain = model.chain(6)
+    assert np.all(solved[:, chain] >= model.lower_limits[chain] - 1e-9)
+    assert np.all(solved[:, chain] <= model.upper_limits[chain] + 1e-9)
+    # the single-target solver takes the same steps as the batch one
+    for target, seed, batch_q in zip(targets[:10], seeds[:10], solved[:10]):
+        q, _, _ = model.inverse(target, 6, seed, residual_threshold=1e-5)
+        np.testing.assert_allclose(q, batch_q, atol=1e-9)
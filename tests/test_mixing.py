@@ -0,0 +1,110 @@
+"""
+Wheel mixing math: drive model matrices, trigger scaling and deadzone,
+and the multi-controller policies of WheelMixer.
+"""
+import math
+
+import pytest
+
+from drive_model import DriveModel, ackermann, differential, load_drive_model, mecanum, omni
+from mixing import WheelMixer
+from virtual_joystick import VirtualJoystick
+
+# PS5 layout: left stick axes 0 / 1, triggers 4 (clockwise) / 5 (counterclockwise) rest at -1
+H, V, CW, CCW = 0, 1, 4, 5
+
+
+def stick(instance_id=0, horizontal=0.0, vertical=0.0, clockwise=0.0, counterclockwise=0.0):
+    """Joystick with trigger values given 0..1 (pressed fraction)."""
+    joystick = VirtualJoystick(instance_id)
+    joystick.set_axis(H, horizontal)
+    joystick.set_axis(V, vertical)
+    joystick.set_axis(CW, clockwise * 2 - 1)
+    joystick.set_axis(CCW, counterclockwise * 2 - 1)
+    return joystick
+
+
+def mix(joysticks, velocity=10.0, **kwargs):
+    mixer = WheelMixer(H, V, CW, CCW, **kwargs)
+    return mixer.mix({j.instance_id: j for j in joysticks}, velocity)
+
+
+def test_mecanum_directions():
+    # stick up is negative: forward
+    assert mix([stick(vertical=-1.0)]) == [10.0, 10.0, 10.0, 10.0]
+    assert mix([stick(horizontal=1.0)]) == [10.0, -10.0, -10.0, 10.0]
+    assert mix([stick(clockwise=1.0)]) == [10.0, -10.0, 10.0, -10.0]
+    assert mix([stick(counterclockwise=1.0)]) == [-10.0, 10.0, -10.0, 10.0]
+
+
+def test_mix_is_linear():
+    combined = mix([stick(horizontal=0.5, vertical=-0.5, clockwise=0.25)], velocity=2.0)
+    parts = [mix([stick(horizontal=0.5)], velocity=2.0), mix([stick(vertical=-0.5)], velocity=2.0),
+             mix([stick(clockwise=0.25)], velocity=2.0)]
+    assert combined == pytest.approx([sum(column) for column in zip(*parts)])
+
+
+def test_deadzone_and_rest():
+    assert mix([stick(horizontal=0.05, vertical=-0.1, clockwise=0.08)]) == [0.0] * 4
+    assert mix([stick()]) == [0.0] * 4
+    assert mix([]) is None
+
+
+def test_priority_policy():
+    idle, moving = stick(0), stick(1, vertical=-1.0)
+    assert mix([idle, moving], policy="priority") == [10.0] * 4
+    first = stick(0, horizontal=1.0)
+    assert mix([first, moving], policy="priority") == [10.0, -10.0, -10.0, 10.0]
+
+
+def test_sum_policy_clips_to_axis_range():
+    a, b = stick(0, vertical=-0.8), stick(1, vertical=-0.8)
+    assert mix([a, b], policy="sum") == [10.0] * 4
+    a, b = stick(0, vertical=-0.5), stick(1, horizontal=0.5)
+    assert mix([a, b], policy="sum") == pytest.approx([10.0, 0.0, 0.0, 10.0])
+
+
+def test_last_active_policy():
+    mixer = WheelMixer(H, V, CW, CCW, policy="last_active")
+    a, b = stick(0), stick(1)
+    joysticks = {0: a, 1: b}
+    b.set_axis(V, -1.0)
+    assert mixer.mix(joysticks, 1.0) == [1.0] * 4
+    # a moves later and takes over although b is still held
+    a.set_axis(H, 1.0)
+    assert mixer.mix(joysticks, 1.0) == [1.0, -1.0, -1.0, 1.0]
+    # releasing the active stick stops the robot
+    a.set_axis(H, 0.0)
+    assert mixer.mix(joysticks, 1.0) == [0.0] * 4
+    # a controller plugged in at rest does not take over
+    joysticks[2] = stick(2)
+    b.set_axis(V, -0.5)
+    assert mixer.mix(joysticks, 1.0) == [0.5] * 4
+
+
+def test_drive_models():
+    assert differential().apply(1.0, 0.0, 0.5, 2.0) == [3.0, 1.0]
+    # steering is not scaled by velocity, positive turns left for a stick to the left
+    rear_left, rear_right, steer = ackermann(30.0).apply(1.0, -1.0, 0.0, 5.0)
+    assert (rear_left, rear_right) == (5.0, 5.0)
+    assert steer == pytest.approx(math.radians(30.0))
+    # kiwi drive: driving forward, the rear wheel does not turn
+    front_left, front_right, rear = omni().apply(1.0, 0.0, 0.0, 1.0)
+    assert rear == pytest.approx(0.0, abs=1e-12)
+    assert front_left == pytest.approx(-front_right)
+    assert mecanum().stop() == [0.0] * 4
+
+
+def test_custom_drive_model():
+    rows = [{"param": "2", "value1": "1 0 -1", "value2": ""},
+            {"param": "1", "value1": "1 0 1", "value2": ""},
+            {"param": "3", "value1": "0 -0.5 0", "value2": "fixed"}]
+    model = load_drive_model("custom", rows)
+    assert model.matrix == ((1.0, 0.0, 1.0), (1.0, 0.0, -1.0), (0.0, -0.5, 0.0))
+    assert model.fixed == (False, False, True)
+    mixer = WheelMixer(H, V, CW, CCW, drive_model=model)
+    assert mixer.mix({0: stick(horizontal=1.0, vertical=-1.0)}, 4.0) == [4.0, 4.0, -0.5]
+    with pytest.raises(ValueError):
+        DriveModel("broken", [[1, 0]])
+    # unusable rows fall back to mecanum
+    assert load_drive_model("custom", []).name == "mecanum"
@@ -0,0 +1,78 @@
+"""
+TrajectoryPlanner profiles: every plan ends exactly on the goal, all
+joints arrive together and the per-joint velocity / acceleration limits
+hold; planner_settings fills per-joint limits from the config.
+"""
+import math
+
+import numpy as np
+import pytest
+
+from trajectory_planner import TrajectoryPlanner, planner_settings
+
+DT = 0.01
+VELOCITY = [60.0, 30.0, 90.0]        # deg/s
+ACCELERATION = [120.0, 60.0, 240.0]  # deg/s^2
+START = np.radians([0.0, -80.0, 90.0])
+GOAL = np.radians([45.0, -30.0, 70.0])
+
+
+@pytest.fixture(params=["trapezoid", "scurve"])
+def planner(request):
+    return TrajectoryPlanner(VELOCITY, ACCELERATION, DT, profile=request.param)
+
+
+def test_ends_on_goal(planner):
+    samples = planner.plan(START, GOAL)
+    assert len(samples) > 1
+    np.testing.assert_array_equal(samples[-1], GOAL)
+
+
+def test_no_move_for_same_pose(planner):
+    assert planner.plan(START, START).shape == (0, len(START))
+
+
+def test_joints_arrive_together(planner):
+    samples = planner.plan(START, GOAL)
+    progress = (samples - START) / (GOAL - START)
+    np.testing.assert_allclose(progress, progress[:, :1].repeat(len(START), axis=1), atol=1e-12)
+    assert np.all(np.diff(progress[:, 0]) >= 0.0)
+
+
+def test_limits_hold(planner):
+    samples = np.vstack([START, planner.plan(START, GOAL)])
+    # finite differences average over a sample period, so they stay within the peak limits
+    velocity = np.diff(samples, axis=0) / DT
+    acceleration = np.diff(velocity, axis=0) / DT
+    assert np.all(np.abs(velocity) <= np.radians(VELOCITY) * (1 + 1e-9))
+    assert np.all(np.abs(acceleration) <= np.radians(ACCELERATION) * (1 + 1e-6))
+
+
+def test_trapezoid_duration():
+    # joint 2 is the slowest: 50 deg at 30 deg/s and 60 deg/s^2 -> 50/30 + 30/60 s
+    planner = TrajectoryPlanner(VELOCITY, ACCELERATION, DT, profile="trapezoid")
+    _, _, duration = planner.scaling(GOAL - START)
+    assert duration == pytest.approx(50.0 / 30.0 + 30.0 / 60.0)
+    assert len(planner.plan(START, GOAL)) == math.ceil(duration / DT - 1e-9)
+
+
+def test_scurve_starts_smoothly():
+    trapezoid = TrajectoryPlanner(VELOCITY, ACCELERATION, DT, profile="trapezoid").plan(START, GOAL)
+    scurve = TrajectoryPlanner(VELOCITY, ACCELERATION, DT, profile="scurve").plan(START, GOAL)
+    # acceleration ramps up from zero instead of jumping to the limit
+    assert abs(scurve[0, 1] - START[1]) < 0.1 * abs(trapezoid[0, 1] - START[1])
+    assert len(scurve) > len(trapezoid)
+
+
+def test_settings_round_trip():
+    planner = TrajectoryPlanner(VELOCITY, ACCELERATION, DT, profile="trapezoid")
+    copy = TrajectoryPlanner(**planner.settings())
+    np.testing.assert_array_equal(copy.plan(START, GOAL), planner.plan(START, GOAL))
+
+
+def test_planner_settings():
+    config = {"arm_motion_profile": "trapezoid", "arm_max_velocity": "50", "arm_max_acceleration": "100"}
+    settings = planner_settings(config, [None, 20.0], [40.0], 3)
+    assert settings == {"max_velocity": [50.0, 20.0, 50.0], "max_acceleration": [40.0, 100.0, 100.0],
+                        "profile": "trapezoid"}
+    assert planner_settings({"arm_motion_profile": "blend"}, [], [], 3) is None
@@ -0,0 +1,102 @@
+"""
+RosbridgeClient against the stand-in rosbridge: queued advertise and
+publish, coalescing of unchanged payloads, and reconnecting after the
+server drops the link (topics re-advertised, latest message replayed).
+"""
+import time
+
+import pytest
+
+pytest.importorskip("websocket")
+
+from fake_rosbridge import FakeRosbridge
+from ws_client import RosbridgeClient
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def server():
+    server = FakeRosbridge().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    client = RosbridgeClient(rosbridge_port=server.port, publish_rate=0, keepalive=10.0,
+                             backoff_initial=0.05, backoff_max=0.2, log_interval=0.0)
+    assert client.connect("127.0.0.1")
+    yield client
+    client.disconnect()
+
+
+def published(server, topic):
+    return [m["msg"]["data"] for m in server.decoded_messages()
+            if m["op"] == "publish" and m["topic"] == topic]
+
+
+def test_advertise_and_publish(server, client):
+    client.advertise_topic("/wheel", "std_msgs/Float32MultiArray", template={"data": None})
+    client.publish_data("/wheel", [1.0, 2.0])
+    assert server.wait_for(2)
+    messages = server.decoded_messages()
+    assert messages[0] == {"op": "advertise", "topic": "/wheel", "type": "std_msgs/Float32MultiArray"}
+    assert messages[1] == {"op": "publish", "topic": "/wheel", "msg": {"data": [1.0, 2.0]}}
+
+
+def test_unchanged_payload_is_suppressed(server, client):
+    client.advertise_topic("/wheel", "std_msgs/Float32MultiArray")
+    for _ in range(5):
+        client.publish("/wheel", {"data": [0.5]})
+        time.sleep(0.01)
+    client.publish("/wheel", {"data": [0.25]})
+    assert wait_until(lambda: published(server, "/wheel")[-1:] == [[0.25]])
+    assert published(server, "/wheel") == [[0.5], [0.25]]
+    assert client.suppressed >= 4
+
+
+def test_reconnect_replays_topics_and_latest_message(server, client):
+    client.advertise_topic("/wheel", "std_msgs/Float32MultiArray")
+    client.advertise_topic("/robot_arm", "std_msgs/Float32MultiArray")
+    client.publish("/wheel", {"data": [1.0]})
+    client.publish("/robot_arm", {"data": [0.1, 0.2]})
+    assert server.wait_for(4)
+
+    server.drop_clients()
+    server.clear()
+    # the drop is noticed on the next send; keep publishing like the control loop
+    value = 1.0
+    while client.reconnects == 0 and value < 500:
+        value += 1.0
+        client.publish("/wheel", {"data": [value]})
+        time.sleep(0.01)
+    assert client.reconnects == 1
+    assert client.state == "connected"
+    assert server.connections == 2
+
+    assert wait_until(lambda: published(server, "/robot_arm") and published(server, "/wheel"))
+    messages = server.decoded_messages()
+    advertised = [m["topic"] for m in messages if m["op"] == "advertise"]
+    assert advertised[:2] == ["/wheel", "/robot_arm"]
+    # every topic comes back with its newest message, even one not published since the drop
+    assert published(server, "/robot_arm") == [[0.1, 0.2]]
+    client.publish("/wheel", {"data": [-1.0]})
+    assert wait_until(lambda: published(server, "/wheel")[-1] == [-1.0])
+
+
+def test_failed_connect_without_reconnect():
+    server = FakeRosbridge().start()
+    port = server.port
+    server.stop()
+    client = RosbridgeClient(rosbridge_port=port, auto_reconnect=False, connect_timeout=1)
+    assert not client.connect("127.0.0.1")
+    assert client.state == "failed"
+    assert client.last_error
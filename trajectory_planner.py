@@ -0,0 +1,134 @@
+"""
+Time-parameterized joint trajectories for pose moves (reset, preset poses).
+
+A move from `start` to `goal` is a straight line in joint space,
+q(t) = start + (goal - start) * s(t), with one time scaling s(t) from 0 to
+1 shared by all joints so they arrive together. The scaling is as fast as
+the slowest joint allows: its peak rate and acceleration are the smallest
+limit / distance over the moving joints.
+
+    trapezoid   constant acceleration, cruise, constant deceleration
+    scurve      acceleration ramps up and down smoothly (sin^2 pulses
+                peaking at the limit), no step in acceleration
+
+The whole trajectory is computed at once with NumPy, sampled at the
+control period; IKSolver.update() then plays one sample per control cycle,
+so the time to reach a pose depends on the limits, not the frame rate.
+"""
+import math
+
+import numpy as np
+
+PROFILES = ("trapezoid", "scurve")
+
+
+class TrajectoryPlanner:
+    def __init__(self, max_velocity, max_acceleration, dt, profile="scurve"):
+        """
+        max_velocity: per joint velocity limits (deg/s)
+        max_acceleration: per joint acceleration limits (deg/s^2)
+        dt: control period (s), the sample period of planned trajectories
+        profile: "trapezoid" or "scurve"
+        """
+        if profile not in PROFILES:
+            print(f"Unknown motion profile '{profile}', using scurve.")
+            profile = "scurve"
+        self.max_velocity = np.radians(np.asarray(max_velocity, dtype=float))
+        self.max_acceleration = np.radians(np.asarray(max_acceleration, dtype=float))
+        self.dt = dt
+        self.profile = profile
+
+    def settings(self):
+        """Constructor arguments, e.g. for an input log header."""
+        return {
+            "max_velocity": np.degrees(self.max_velocity).tolist(),
+            "max_acceleration": np.degrees(self.max_acceleration).tolist(),
+            "dt": self.dt,
+            "profile": self.profile,
+        }
+
+    def scaling(self, distance):
+        """
+        (peak rate, ramp time, duration) of s(t) for joint distances (radians).
+        Joints beyond the configured limits use the last limit.
+        """
+        distance = np.abs(np.asarray(distance, dtype=float))
+        n = len(distance)
+        velocity = self._per_joint(self.max_velocity, n)
+        acceleration = self._per_joint(self.max_acceleration, n)
+        moving = distance > 1e-9
+        if not moving.any():
+            return 0.0, 0.0, 0.0
+        rate = float(np.min(velocity[moving] / distance[moving]))
+        peak = float(np.min(acceleration[moving] / distance[moving]))
+        # a sin^2 pulse averages half its peak
+        average = peak if self.profile == "trapezoid" else 0.5 * peak
+        if rate * rate / average > 1.0:
+            # no cruise phase: accelerate to the middle and brake
+            rate = math.sqrt(average)
+        ramp = rate / average
+        return rate, ramp, 2.0 * ramp + (1.0 - rate * ramp) / rate
+
+    def plan(self, start, goal):
+        """
+        Joint angles (N, joints) radians at dt, 2 dt, ... until the goal;
+        the last sample is exactly `goal`. Empty when start == goal.
+        """
+        start = np.asarray(start, dtype=float)
+        goal = np.asarray(goal, dtype=float)
+        distance = goal - start
+        rate, ramp, duration = self.scaling(distance)
+        if duration <= 0.0:
+            return np.empty((0, len(start)))
+        t = np.arange(1, int(math.ceil(duration / self.dt - 1e-9)) + 1) * self.dt
+        t = np.minimum(t, duration)
+        s = np.where(t < ramp, self._ramp(t, rate, ramp),
+                     np.where(t > duration - ramp, 1.0 - self._ramp(duration - t, rate, ramp),
+                              rate * (t - 0.5 * ramp)))
+        s[-1] = 1.0
+        return start + s[:, None] * distance
+
+    def _ramp(self, t, rate, ramp):
+        """s(t) while accelerating from rest for `ramp` seconds up to `rate`."""
+        t = np.clip(t, 0.0, ramp)
+        if self.profile == "trapezoid":
+            return rate * t * t / (2.0 * ramp)
+        return rate * (t * t / (2.0 * ramp) + ramp * (np.cos(2.0 * math.pi * t / ramp) - 1.0)
+                       / (4.0 * math.pi ** 2))
+
+    @staticmethod
+    def _per_joint(limits, n):
+        if len(limits) >= n:
+            return limits[:n]
+        return np.concatenate([limits, np.full(n - len(limits), limits[-1])])
+
+
+def planner_settings(config, joint_velocity, joint_acceleration, num_joints):
+    """
+    TrajectoryPlanner limits from the config: joint rows give per joint
+    limits (None where missing), the globals arm_max_velocity /
+    arm_max_acceleration the rest. Returns keyword arguments (without dt),
+    or None when arm_motion_profile is "blend" (the old per-frame blend).
+    """
+    profile = (config.get("arm_motion_profile") or "scurve").strip().lower()
+    if profile == "blend":
+        return None
+
+    def number(name, default):
+        try:
+            return float(config.get(name) or default)
+        except ValueError:
+            print(f"Invalid {name} '{config.get(name)}' in config, using {default}.")
+            return default
+    velocity = number("arm_max_velocity", 60.0)
+    acceleration = number("arm_max_acceleration", 120.0)
+    joint_velocity = list(joint_velocity or [])
+    joint_acceleration = list(joint_acceleration or [])
+    return {
+        "max_velocity": [joint_velocity[i] if i < len(joint_velocity) and joint_velocity[i] else velocity
+                         for i in range(num_joints)],
+        "max_acceleration": [joint_acceleration[i]
+                             if i < len(joint_acceleration) and joint_acceleration[i] else acceleration
+                             for i in range(num_joints)],
+        "profile": profile,
+    }
@@ -1,61 +1,189 @@
 # ui.py
+import collections
+import time
 import pygame
 import math
+from profiler import profiled
+
+BACKGROUND = (0, 0, 0)
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREY = (160, 160, 160)
+
+class Label:
+    """
+    One line of text at a fixed position. Rendered surfaces are cached by
+    (text, color) so values that come back (velocity, selected joint) are
+    not rendered again; the label is only redrawn when its text changes.
+    """
+    def __init__(self, font, pos, cache_size=32):
+        self.font = font
+        self.pos = pos
+        self.text = None
+        self.color = None
+        self.surface = None
+        self.rect = pygame.Rect(pos, (0, 0))
+        self.dirty = False
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+    def set(self, text, color=WHITE):
+        if text == self.text and color == self.color:
+            return
+        self.text = text
+        self.color = color
+        self.dirty = True
+
+    def render(self):
+        """Surface for the current text, from the cache when possible."""
+        if not self.text:
+            return None
+        key = (self.text, self.color)
+        surface = self._cache.get(key)
+        if surface is None:
+            surface = self.font.render(self.text, True, self.color)
+            self._cache[key] = surface
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return surface
+
+    def draw(self, screen, force=False):
+        """
+        Redraw when the text changed (or `force`). Returns the screen rects
+        touched: the old text area (cleared) and the new one.
+        """
+        if not (self.dirty or force):
+            return []
+        old_rect = self.rect
+        screen.fill(BACKGROUND, old_rect)
+        self.surface = self.render()
+        if self.surface is not None:
+            self.rect = screen.blit(self.surface, self.pos)
+        else:
+            self.rect = pygame.Rect(self.pos, (0, 0))
+        self.dirty = False
+        return [old_rect.union(self.rect)]
 
 class UI:
-    def __init__(self):
+    def __init__(self, overlay_interval=0.5):
+        """
+        overlay_interval: seconds between updates of the frame-time overlay
+        """
         pygame.font.init()
         self.screen = pygame.display.set_mode((800, 600))
         pygame.display.set_caption("PS5 Controller UI")
         self.font = pygame.font.SysFont("Arial", 24)
+        self.small_font = pygame.font.SysFont("Arial", 16)
+
+        self.velocity_label = Label(self.font, (10, 10))
+        self.connection_label = Label(self.font, (10, 40))
+        self.error_label = Label(self.font, (10, 70))
+        self.mode_label = Label(self.font, (10, 100))
+        self.index_label = Label(self.font, (10, 140))
+        self.joint_labels = []
+        self.profile_labels = []
+        self.wheel_label = Label(self.font, (10, 400))
+        self.stats_label = Label(self.small_font, (10, 440))
+        self.overlay_label = Label(self.small_font, (10, 570))
+        self.labels = [self.velocity_label, self.connection_label, self.error_label,
+                       self.mode_label, self.index_label, self.wheel_label,
+                       self.stats_label, self.overlay_label]
+
+        # 畫面耗時統計（frame-time overlay）
+        self.overlay_interval = overlay_interval
+        self.draw_times = collections.deque(maxlen=120)
+        self.dirty_pixels = collections.deque(maxlen=120)
+        self.next_overlay = 0.0
+        self.full_redraw = True
 
-    def draw(self, velocity, rosbridge_ip, connection_status, connection_error, input_mode, ip_input, arm_index, arm_angles, wheel_speed):
-        self.screen.fill((0, 0, 0))
+    def invalidate(self):
+        """Redraw everything on the next frame (e.g. after the window was exposed)."""
+        self.full_redraw = True
+
+    def _joint_label(self, i):
+        while len(self.joint_labels) <= i:
+            label = Label(self.font, (10, 180 + len(self.joint_labels) * 30))
+            self.joint_labels.append(label)
+            self.labels.append(label)
+        return self.joint_labels[i]
+
+    def _profile_label(self, i):
+        while len(self.profile_labels) <= i:
+            label = Label(self.small_font, (420, 140 + len(self.profile_labels) * 20))
+            self.profile_labels.append(label)
+            self.labels.append(label)
+        return self.profile_labels[i]
+
+    @profiled("ui.draw")
+    def draw(self, velocity, rosbridge_ip, connection_status, connection_error, input_mode, ip_input, arm_index, arm_angles, wheel_speed, control_stats=None, profile_lines=None):
+        start = time.perf_counter()
 
         # 顯示速度
-        velocity_text = self.font.render(f"Velocity: {velocity}", True, (255, 255, 255))
-        self.screen.blit(velocity_text, (10, 10))
+        self.velocity_label.set(f"Velocity: {velocity}")
 
         # 顯示連線資訊
-        connection_text = self.font.render(f"ROSBridge ({rosbridge_ip}): {connection_status}", True, (255, 255, 255))
-        self.screen.blit(connection_text, (10, 40))
+        self.connection_label.set(f"ROSBridge ({rosbridge_ip}): {connection_status}")
 
         # 顯示錯誤訊息（若有）
-        if connection_error:
-            error_text = self.font.render(f"Error: {connection_error}", True, (255, 0, 0))
-            self.screen.blit(error_text, (10, 70))
+        self.error_label.set(f"Error: {connection_error}" if connection_error else "", RED)
 
         # 輸入模式提示
         if input_mode:
-            ip_input_text = self.font.render(f"Enter IP: {ip_input}", True, (255, 255, 255))
-            self.screen.blit(ip_input_text, (10, 100))
+            self.mode_label.set(f"Enter IP: {ip_input}")
         else:
-            mode_text = self.font.render("Press 'I' to change IP, 'Q' to quit", True, (255, 255, 255))
-            self.screen.blit(mode_text, (10, 100))
+            self.mode_label.set("Press 'I' to change IP, 'Q' to quit")
 
         # 顯示當前手臂索引
-        index_text = self.font.render(f"Current Arm Index: {arm_index}", True, (255, 255, 255))
-        self.screen.blit(index_text, (10, 140))
+        self.index_label.set(f"Current Arm Index: {arm_index}")
 
         # 顯示各關節角度，並用顏色及符號指示當前索引
-        start_y = 180
         for i, angle in enumerate(arm_angles):
             if i == arm_index:
                 # 當前索引用紅色與 "> " 指示
-                angle_text = self.font.render(
-                    f"> Joint {i}: {math.degrees(angle):.2f}°",
-                    True,
-                    (255, 0, 0)
-                )
+                self._joint_label(i).set(f"> Joint {i}: {math.degrees(angle):.2f}°", RED)
             else:
-                angle_text = self.font.render(
-                    f"  Joint {i}: {math.degrees(angle):.2f}°",
-                    True,
-                    (255, 255, 255)
-                )
-            self.screen.blit(angle_text, (10, start_y + i * 30))
+                self._joint_label(i).set(f"  Joint {i}: {math.degrees(angle):.2f}°", WHITE)
+        for label in self.joint_labels[len(arm_angles):]:
+            label.set("")
+
+        self.wheel_label.set(f"Wheel Speed: {wheel_speed}")
 
-        wheel_speed_text = self.font.render(f"Wheel Speed: {wheel_speed}", True, (255, 255, 255))
-        self.screen.blit(wheel_speed_text, (10, 400))
+        # 控制迴圈頻率與抖動
+        self.stats_label.set(f"Control: {control_stats}" if control_stats else "", GREY)
+
+        # 各階段耗時（profiler 開啟時）
+        profile_lines = profile_lines or []
+        for i, line in enumerate(profile_lines):
+            self._profile_label(i).set(line, GREY)
+        for label in self.profile_labels[len(profile_lines):]:
+            label.set("")
+
+        # frame-time overlay, refreshed at a low rate so it does not dirty every frame
+        if start >= self.next_overlay and self.draw_times:
+            self.next_overlay = start + self.overlay_interval
+            times = sorted(self.draw_times)
+            self.overlay_label.set(
+                f"UI draw: mean {sum(times) / len(times) * 1000:.2f} ms, "
+                f"max {times[-1] * 1000:.2f} ms, "
+                f"dirty {sum(self.dirty_pixels) / len(self.dirty_pixels) / (800 * 600) * 100:.1f}% of screen",
+                GREY)
+
+        if self.full_redraw:
+            self.screen.fill(BACKGROUND)
+            for label in self.labels:
+                label.draw(self.screen, force=True)
+            pygame.display.flip()
+            self.full_redraw = False
+            dirty_pixels = 800 * 600
+        else:
+            rects = []
+            for label in self.labels:
+                rects.extend(label.draw(self.screen))
+            if rects:
+                pygame.display.update(rects)
+            dirty_pixels = sum(rect.w * rect.h for rect in rects)
 
-        pygame.display.flip()
+        self.draw_times.append(time.perf_counter() - start)
+        self.dirty_pixels.append(dirty_pixels)
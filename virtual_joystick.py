@@ -0,0 +1,152 @@
+"""
+Scripted stand-in for a pygame joystick (no hardware needed).
+
+VirtualJoystick answers the same calls JoystickHandler makes on a
+pygame.joystick.Joystick. An InputScript is a timeline of axis / button
+events that a player thread applies to a VirtualJoystick at their
+scheduled times; button presses are also reported through a callback,
+the way main.py receives JOYBUTTONDOWN events.
+
+Script files are CSV with the columns time,kind,index,value where kind
+is "axis" or "button":
+
+    time,kind,index,value
+    0.50,axis,1,-0.8
+    1.00,button,10,1
+    1.05,button,10,0
+"""
+import csv
+import threading
+import time
+
+# PS5 controller under SDL: sticks rest at 0, triggers (axes 4 and 5) at -1
+PS5_REST_AXES = (0.0, 0.0, 0.0, 0.0, -1.0, -1.0)
+
+
+class VirtualJoystick:
+    def __init__(self, instance_id=0, axes=PS5_REST_AXES, num_buttons=15, name="Virtual Joystick"):
+        self.instance_id = instance_id
+        self.name = name
+        self.rest_axes = tuple(axes)
+        self.axes = list(axes)
+        self.buttons = [0] * num_buttons
+
+    # pygame.joystick.Joystick interface
+    def init(self):
+        pass
+
+    def get_instance_id(self):
+        return self.instance_id
+
+    def get_name(self):
+        return self.name
+
+    def get_numaxes(self):
+        return len(self.axes)
+
+    def get_numbuttons(self):
+        return len(self.buttons)
+
+    def get_axis(self, index):
+        return self.axes[index]
+
+    def get_button(self, index):
+        return self.buttons[index]
+
+    # scripting
+    def set_axis(self, index, value):
+        self.axes[index] = float(value)
+
+    def set_button(self, index, pressed):
+        self.buttons[index] = 1 if pressed else 0
+
+    def reset(self):
+        """Sticks and triggers back to rest, all buttons released."""
+        self.axes = list(self.rest_axes)
+        self.buttons = [0] * len(self.buttons)
+
+
+class InputScript:
+    def __init__(self, events=()):
+        """events: (time s, kind "axis"/"button", index, value) tuples"""
+        self.events = sorted(events, key=lambda event: event[0])
+
+    @property
+    def duration(self):
+        return self.events[-1][0] if self.events else 0.0
+
+    @classmethod
+    def load(cls, path):
+        events = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                kind = row["kind"].strip()
+                if kind not in ("axis", "button"):
+                    raise ValueError(f"Unknown event kind '{kind}' in {path}")
+                events.append((float(row["time"]), kind, int(row["index"]), float(row["value"])))
+        return cls(events)
+
+    def save(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "kind", "index", "value"])
+            for t, kind, index, value in self.events:
+                writer.writerow([f"{t:.6f}", kind, index, value])
+
+    def play(self, joystick, on_button=None, on_event=None, speed=1.0):
+        """
+        Apply the events to `joystick` in a background thread, starting now.
+
+        on_button: callback(button) for every button press (value going to 1)
+        on_event: callback(perf_counter, event) right after an event applied
+        speed: time scale, 2.0 plays twice as fast
+        Returns the started ScriptPlayer.
+        """
+        return ScriptPlayer(self, joystick, on_button, on_event, speed).start()
+
+
+class ScriptPlayer:
+    def __init__(self, script, joystick, on_button=None, on_event=None, speed=1.0):
+        self.script = script
+        self.joystick = joystick
+        self.on_button = on_button
+        self.on_event = on_event
+        self.speed = speed
+        self.lateness = []          # how late each event was applied (s)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="input-script", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        start = time.perf_counter()
+        for event in self.script.events:
+            deadline = start + event[0] / self.speed
+            # Event.wait sleeps the bulk of the wait; spin the last ms for accuracy
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                if self._stop.wait(remaining - 0.001 if remaining > 0.002 else 0):
+                    return
+            _, kind, index, value = event
+            if kind == "axis":
+                self.joystick.set_axis(index, value)
+            else:
+                self.joystick.set_button(index, value)
+                if value and self.on_button is not None:
+                    self.on_button(index)
+            now = time.perf_counter()
+            self.lateness.append(now - deadline)
+            if self.on_event is not None:
+                self.on_event(now, event)
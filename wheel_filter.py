@@ -0,0 +1,145 @@
+"""
+Wheel command smoothing between JoystickHandler and the wheel publisher.
+
+Wheel commands from the handler become targets; every control cycle the
+filter moves its output toward them and publishes the result:
+
+    smoothing   exponential smoothing of the target, time constant (s)
+    slew_rate   maximum change of a wheel command per second
+    jerk        maximum change of that rate per second (s-curve ramps);
+                the ramp slows down in time to stop at the target
+
+Each stage is off when its parameter is 0. State is two floats per wheel
+(output and its rate of change), and the filter steps with the fixed
+control period, so a replayed input log gives the same output.
+
+lead publishes the output the filter will reach `lead` seconds later
+instead of the current one. With a publish rate below the control rate
+the robot holds each command for a whole publish period; a lead of half
+that period centres the held value on the ramp, so the publish rate can
+be lowered without the commands lagging behind.
+"""
+import math
+
+
+class WheelFilter:
+    def __init__(self, dt, smoothing=0.0, slew_rate=0.0, jerk=0.0, lead=0.0):
+        """
+        dt: control period (s)
+        smoothing: exponential smoothing time constant (s)
+        slew_rate: max command change per second
+        jerk: max change of the command rate per second (needs slew_rate)
+        lead: publish the output predicted this many seconds ahead
+        """
+        self.dt = dt
+        self.smoothing = smoothing
+        self.slew_rate = slew_rate
+        self.jerk = jerk if slew_rate else 0.0
+        self.alpha = 1.0 - math.exp(-dt / smoothing) if smoothing > 0 else 1.0
+        self.lead_steps = int(round(lead / dt)) if lead > 0 else 0
+        self.targets = None
+        self.smoothed = None
+        self.values = None
+        self.rates = None
+
+    @property
+    def enabled(self):
+        return self.smoothing > 0 or self.slew_rate > 0
+
+    def set_target(self, cmd):
+        self.targets = list(cmd)
+        if self.values is None or len(self.values) != len(self.targets):
+            # first command (or a different wheel count): start there
+            self.smoothed = list(self.targets)
+            self.values = list(self.targets)
+            self.rates = [0.0] * len(self.targets)
+
+    def step(self):
+        """Advance one control period. Returns the command to publish."""
+        if self.values is None:
+            return None
+        self.smoothed, self.values, self.rates = self._advance(self.smoothed, self.values, self.rates)
+        if not self.lead_steps:
+            return list(self.values)
+        smoothed, values, rates = self.smoothed, self.values, self.rates
+        for _ in range(self.lead_steps):
+            smoothed, values, rates = self._advance(smoothed, values, rates)
+        return values
+
+    def _advance(self, smoothed, values, rates):
+        alpha, dt = self.alpha, self.dt
+        slew, jerk = self.slew_rate, self.jerk
+        new_smoothed, new_values, new_rates = [], [], []
+        for target, s, value, rate in zip(self.targets, smoothed, values, rates):
+            s += alpha * (target - s)
+            if abs(target - s) < 1e-9:
+                s = target
+            if not slew:
+                new_smoothed.append(s)
+                new_values.append(s)
+                new_rates.append(0.0)
+                continue
+            error = s - value
+            # rate that reaches the target this period, within the slew limit
+            wanted = max(-slew, min(slew, error / dt))
+            if jerk:
+                step = jerk * dt
+                # brake in time: the rate that can still be ramped down to 0 over |error|
+                brake = max(0.0, math.sqrt(2.0 * jerk * abs(error)) - step)
+                wanted = max(-brake, min(brake, wanted))
+                rate += max(-step, min(step, wanted - rate))
+                if abs(error) <= step * dt and abs(rate) <= step:
+                    # close enough to finish within one jerk step
+                    rate = error / dt
+            else:
+                rate = wanted
+            value += rate * dt
+            if (s - value) * error <= 0:
+                # reached or passed the target
+                value, rate = s, 0.0
+            new_smoothed.append(s)
+            new_values.append(value)
+            new_rates.append(rate)
+        return new_smoothed, new_values, new_rates
+
+
+class FilteredWheelPublisher:
+    """
+    Wheel publish callback for JoystickHandler: commands set the filter
+    target, tick() (once per control cycle) publishes the filtered output
+    when it changed.
+    """
+    def __init__(self, wheel_filter, publish):
+        self.filter = wheel_filter
+        self.publish = publish
+        self.last = None
+
+    def __call__(self, cmd):
+        self.filter.set_target(cmd)
+
+    def tick(self):
+        cmd = self.filter.step()
+        if cmd is not None and cmd != self.last:
+            self.last = cmd
+            self.publish(cmd)
+
+
+def filter_settings(config, publish_rate=0.0):
+    """
+    WheelFilter keyword arguments from the global config (missing values
+    are 0). wheel_lead "auto" is half the publish period.
+    """
+    def number(name):
+        try:
+            return float(config.get(name) or 0.0)
+        except ValueError:
+            print(f"Invalid {name} '{config.get(name)}' in config, using 0.")
+            return 0.0
+    lead = (config.get("wheel_lead") or "").strip().lower()
+    return {
+        "smoothing": number("wheel_smoothing"),
+        "slew_rate": number("wheel_slew_rate"),
+        "jerk": number("wheel_jerk"),
+        "lead": 0.5 / publish_rate if lead == "auto" and publish_rate else
+                0.0 if lead == "auto" else number("wheel_lead"),
+    }
@@ -0,0 +1,248 @@
+"""
+Precomputed reachability grid of an arm workspace.
+
+The workspace is sampled offline with batched forward kinematics and
+voxelized. Every reachable voxel keeps one seed joint configuration (the
+sample closest to the voxel centre, refined onto it with IK), so the IK
+solver can start next to any target and reject unreachable targets with a
+single array lookup.
+
+On disk a grid is a directory of .npy files, loaded memory-mapped:
+    index.npy      (X, Y, Z) int32, row into seeds.npy or -1 if unreachable
+    seeds.npy      (M, J) float32 seed joint angles (radians)
+    positions.npy  (M, 3) float32 end-effector position of each seed
+    meta.json      origin, voxel size, end-effector index, joint count, model
+                   key and build settings
+
+The model key is a SHA-1 of the kinematic chain the grid was sampled from.
+IKSolver checks it, the end-effector index and the joint count when it
+loads a grid and rebuilds the grid with the stored settings when the URDF
+or the end effector changed, so stale seeds are never used.
+
+Build a grid:
+    python workspace.py build --urdf robotArm_ver7.urdf --link 6 --out workspace_grid
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from kinematics import RobotModel
+
+GRID_FILES = ("index.npy", "seeds.npy", "positions.npy")
+
+# WorkspaceGrid.build keyword arguments stored in meta.json to rebuild a stale grid
+BUILD_SETTINGS = ("voxel_size", "samples", "margin", "refine", "seed")
+
+# 26-connected neighbourhood used to grow the reachable set by `margin` voxels
+_NEIGHBOURS = np.array([(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+                        if (i, j, k) != (0, 0, 0)], dtype=np.int64)
+
+
+def model_key(model):
+    """SHA-1 of the kinematic chain of `model`: joint tree, origins, axes and limits."""
+    digest = hashlib.sha1(json.dumps([model.joint_names, model.joint_types]).encode())
+    for array in (model.parents, model.origins, model.axes, model.lower_limits,
+                  model.upper_limits, model.base_offset):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class StaleGridError(ValueError):
+    """A saved grid does not match the model / end effector it is loaded for."""
+
+
+class WorkspaceGrid:
+    def __init__(self, index, seeds, positions, origin, voxel_size, link_index,
+                 key=None, settings=None):
+        """
+        index: (X, Y, Z) int array, row of the voxel seed or -1
+        seeds: (M, J) seed joint angles, positions: (M, 3) their FK positions
+        origin: world position of the corner of voxel (0, 0, 0)
+        voxel_size: voxel edge length (m)
+        link_index: link the grid was built for
+        key: model_key() of the model the grid was built from
+        settings: build() arguments (BUILD_SETTINGS) the grid was built with
+        """
+        self.index = index
+        self.seeds = seeds
+        self.positions = positions
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.voxel_size = float(voxel_size)
+        self.link_index = int(link_index)
+        self.key = key
+        self.settings = dict(settings or {})
+        self.shape = np.array(index.shape, dtype=np.int64)
+
+    @classmethod
+    def build(cls, model, link_index, voxel_size=0.02, samples=200000,
+              margin=1, refine=True, seed=0, batch_size=50000):
+        """
+        Sample `samples` random joint configurations within the limits,
+        voxelize their end-effector positions and keep one seed per voxel.
+        margin: grow the reachable set by this many voxels so targets just
+            outside the sampled shell are still tried
+        refine: run IK from each seed onto its voxel centre
+        """
+        rng = np.random.default_rng(seed)
+        voxel_size = float(voxel_size)
+        q = rng.uniform(model.lower_limits, model.upper_limits,
+                        size=(samples, model.num_joints))
+        positions = np.concatenate([model.forward_batch(q[i:i + batch_size], link_index)
+                                    for i in range(0, samples, batch_size)])
+
+        origin = positions.min(axis=0) - (margin + 0.5) * voxel_size
+        shape = np.floor((positions.max(axis=0) - origin) / voxel_size).astype(np.int64) + margin + 2
+        cells = np.floor((positions - origin) / voxel_size).astype(np.int64)
+        flat = np.ravel_multi_index(cells.T, shape)
+
+        # per voxel, the sample closest to the voxel centre
+        centres = origin + (cells + 0.5) * voxel_size
+        dist = np.einsum("ni,ni->n", positions - centres, positions - centres)
+        order = np.lexsort((dist, flat))
+        voxels, first = np.unique(flat[order], return_index=True)
+        best = order[first]
+        seeds = q[best]
+        seed_positions = positions[best]
+
+        if refine:
+            targets = origin + (np.stack(np.unravel_index(voxels, shape), axis=1) + 0.5) * voxel_size
+            refined, _, converged = model.inverse_batch(
+                targets, link_index, seeds, residual_threshold=1e-4, max_iterations=50)
+            seeds[converged] = refined[converged]
+            seed_positions[converged] = targets[converged]
+
+        index = np.full(int(np.prod(shape)), -1, dtype=np.int32)
+        index[voxels] = np.arange(len(voxels), dtype=np.int32)
+        index = index.reshape(shape)
+        for _ in range(margin):
+            index = _dilate(index)
+        settings = {"voxel_size": voxel_size, "samples": samples, "margin": margin,
+                    "refine": refine, "seed": seed}
+        return cls(index, seeds.astype(np.float32), seed_positions.astype(np.float32),
+                   origin, voxel_size, link_index, model_key(model), settings)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "index.npy"), np.ascontiguousarray(self.index))
+        np.save(os.path.join(path, "seeds.npy"), np.ascontiguousarray(self.seeds))
+        np.save(os.path.join(path, "positions.npy"), np.ascontiguousarray(self.positions))
+        meta = {
+            "origin": self.origin.tolist(),
+            "voxel_size": self.voxel_size,
+            "link_index": self.link_index,
+            "num_joints": int(self.seeds.shape[1]),
+            "key": self.key,
+            "settings": self.settings,
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, model=None, link_index=None, mmap=True):
+        """
+        Load a saved grid; arrays are memory-mapped read-only by default.
+        With `model` / `link_index`, raises StaleGridError when the grid was
+        built for another model, end effector or joint count.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if model is not None:
+            if meta.get("key") != model_key(model):
+                raise StaleGridError(f"'{path}' was built from another robot model")
+            if meta.get("num_joints") != model.num_joints:
+                raise StaleGridError(f"'{path}' has {meta.get('num_joints')} joints, "
+                                     f"the model {model.num_joints}")
+        if link_index is not None and meta["link_index"] != link_index:
+            raise StaleGridError(f"'{path}' was built for link {meta['link_index']}, not {link_index}")
+        mode = "r" if mmap else None
+        index, seeds, positions = (np.load(os.path.join(path, name), mmap_mode=mode)
+                                   for name in GRID_FILES)
+        return cls(index, seeds, positions, meta["origin"], meta["voxel_size"], meta["link_index"],
+                   meta.get("key"), meta.get("settings"))
+
+    @classmethod
+    def load_or_rebuild(cls, path, model, link_index):
+        """
+        load() checked against `model` / `link_index`; a stale grid is
+        rebuilt with the settings it was built with and saved over it.
+        """
+        try:
+            return cls.load(path, model, link_index)
+        except StaleGridError as e:
+            print(f"Workspace grid {e}, rebuilding it.")
+        with open(os.path.join(path, "meta.json")) as f:
+            stored = json.load(f).get("settings") or {}
+        settings = {name: stored[name] for name in BUILD_SETTINGS if name in stored}
+        start = time.perf_counter()
+        grid = cls.build(model, link_index, **settings)
+        grid.save(path)
+        print(f"Rebuilt workspace grid '{path}' in {time.perf_counter() - start:.1f} s")
+        return cls.load(path, model, link_index)
+
+    def voxel(self, position):
+        """Row of the voxel containing `position` in seeds, or -1."""
+        x = (position[0] - self.origin[0]) / self.voxel_size
+        y = (position[1] - self.origin[1]) / self.voxel_size
+        z = (position[2] - self.origin[2]) / self.voxel_size
+        if x < 0 or y < 0 or z < 0:
+            return -1
+        i, j, k = int(x), int(y), int(z)
+        if i >= self.shape[0] or j >= self.shape[1] or k >= self.shape[2]:
+            return -1
+        return int(self.index[i, j, k])
+
+    def reachable(self, position):
+        return self.voxel(position) >= 0
+
+    def seed(self, position):
+        """
+        (seed joint angles, seed end-effector position) for the voxel
+        containing `position`, or None when it is unreachable.
+        """
+        row = self.voxel(position)
+        if row < 0:
+            return None
+        return np.asarray(self.seeds[row], dtype=np.float64), np.asarray(self.positions[row], dtype=np.float64)
+
+
+def _dilate(index):
+    """Give empty voxels next to reachable ones the seed of that neighbour."""
+    grown = index.copy()
+    padded = np.pad(index, 1, constant_values=-1)
+    nx, ny, nz = index.shape
+    for di, dj, dk in _NEIGHBOURS:
+        neighbour = padded[1 + di:1 + di + nx, 1 + dj:1 + dj + ny, 1 + dk:1 + dk + nz]
+        fill = (grown < 0) & (neighbour >= 0)
+        grown[fill] = neighbour[fill]
+    return grown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Workspace reachability grid")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="sample the workspace and save a seed grid")
+    build.add_argument("--urdf", default="robotArm_ver7.urdf")
+    build.add_argument("--link", type=int, default=6, help="end-effector link index")
+    build.add_argument("--out", default="workspace_grid")
+    build.add_argument("--voxel-size", type=float, default=0.02)
+    build.add_argument("--samples", type=int, default=200000)
+    build.add_argument("--margin", type=int, default=1)
+    build.add_argument("--no-refine", action="store_true")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    model = RobotModel.from_urdf(args.urdf)
+    grid = WorkspaceGrid.build(model, args.link, voxel_size=args.voxel_size,
+                               samples=args.samples, margin=args.margin,
+                               refine=not args.no_refine)
+    grid.save(args.out)
+    reachable = int((grid.index >= 0).sum())
+    print(f"Saved {args.out}: {tuple(grid.index.shape)} voxels of {grid.voxel_size} m, "
+          f"{reachable} reachable, {len(grid.seeds)} seeds, "
+          f"built in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
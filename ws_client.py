@@ -1,59 +1,375 @@
 # ws_client.py
-import json
+import collections
+import threading
+import time
 import websocket
+from encoding import JsonEncoder, MessageTemplate
+from profiler import profiled
 
 class RosbridgeClient:
-    def __init__(self, rosbridge_port=9090):
+    def __init__(self, rosbridge_port=9090, max_queue=256, connect_timeout=3,
+                 coalesce=True, publish_rate=50.0, keepalive=1.0,
+                 auto_reconnect=True,
+                 backoff_initial=0.5, backoff_max=10.0, log_interval=5.0):
+        """
+        rosbridge_port: rosbridge websocket port
+        max_queue: outbound messages kept while the link is slow; when full
+            the oldest message is dropped
+        connect_timeout: websocket connect / send timeout (s)
+        coalesce: keep only the latest message per topic and skip payloads
+            identical to the last one sent on that topic
+        publish_rate: coalesced topics are flushed at most this often (Hz),
+            0 flushes on every publish
+        keepalive: an unchanged payload is still resent after this many
+            seconds so subscribers with timeouts stay alive
+        auto_reconnect: after an established connection drops, reconnect in
+            the background, re-advertise every topic and republish the
+            latest message of each topic
+        backoff_initial / backoff_max: reconnect delay bounds (s); the delay
+            doubles after every failed attempt
+        log_interval: repeated errors of one kind are printed at most once
+            per this many seconds
+        """
         self.rosbridge_port = rosbridge_port
         self.rosbridge_ip = ""
+        self.ws_url = ""
         self.ws = None
+        self.connect_timeout = connect_timeout
+        # disconnected / connecting / connected / reconnecting / failed
+        self.state = "disconnected"
+        self.last_error = ""
+        self.coalesce = coalesce
+        self.flush_period = 1.0 / publish_rate if publish_rate else 0.0
+        self.keepalive = keepalive
+        self.encoder = JsonEncoder()
+        self.templates = {}     # topic -> MessageTemplate
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0      # overwritten by a newer message before the flush
+        self.suppressed = 0     # identical to the last payload sent
+        self.auto_reconnect = auto_reconnect
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.log_interval = log_interval
+        self.reconnects = 0
+        self.reconnect_times = collections.deque(maxlen=100)   # outage durations (s)
+
+        self._queue = collections.deque(maxlen=max_queue)
+        self._latest = {}       # topic -> newest unsent publish text
+        self._last_sent = {}    # topic -> (text, send time)
+        self._next_flush = 0.0
+        self._cond = threading.Condition()
+        self._sender = None
+        self._session = 0
+        self._advertised = {}       # topic -> advertise text, re-sent on reconnect
+        self._last_published = {}   # topic -> latest publish text, replayed on reconnect
+        self._log_times = {}        # error kind -> (last print time, repeats since)
 
     def connect(self, ip):
-        self.rosbridge_ip = ip
-        self.ws_url = f"ws://{ip}:{self.rosbridge_port}"
+        """Connect and wait for the result. Returns True when connected."""
+        session = self._start_session(ip)
+        self._open(session)
+        return self.state == "connected"
+
+    def connect_async(self, ip):
+        """
+        Connect in the background and return immediately. Messages
+        advertised or published meanwhile are queued and sent once the
+        connection is up; check `state` / `last_error` for the result.
+        """
+        session = self._start_session(ip)
+        threading.Thread(target=self._open, args=(session,),
+                         name="rosbridge-connect", daemon=True).start()
+
+    def _start_session(self, ip):
+        self.disconnect()
+        with self._cond:
+            self._session += 1
+            self.rosbridge_ip = ip
+            self.ws_url = f"ws://{ip}:{self.rosbridge_port}"
+            self.state = "connecting"
+            self.last_error = ""
+            return self._session
+
+    def _open(self, session):
         try:
-            self.ws = websocket.create_connection(self.ws_url, timeout=3)
-            print(f"Connected to rosbridge via websocket at {self.ws_url}")
-            return True
+            ws = websocket.create_connection(self.ws_url, timeout=self.connect_timeout)
         except Exception as e:
+            retry = False
+            with self._cond:
+                if session == self._session:
+                    self.last_error = str(e)
+                    self._clear_pending()
+                    # rosbridge may not be up yet: retry like after a dropped connection
+                    retry = self.auto_reconnect
+                    self.state = "reconnecting" if retry else "failed"
+                    self._cond.notify_all()
+            print(f"Failed to connect to rosbridge at {self.ws_url}: {e}"
+                  + (", retrying in the background" if retry else ""))
+            if retry:
+                threading.Thread(target=self._reconnect_loop, args=(session, None),
+                                 name="rosbridge-reconnect", daemon=True).start()
+            return
+        if self._attach(session, ws):
+            print(f"Connected to rosbridge via websocket at {self.ws_url}")
+
+    def _attach(self, session, ws, replay=False):
+        """
+        Make `ws` the live connection and start its sender thread. With
+        `replay`, re-advertise every topic and republish its latest message.
+        """
+        with self._cond:
+            if session != self._session:
+                # disconnected or reconnected elsewhere while connecting
+                ws.close()
+                return False
+            if replay:
+                # topics first, then the newest state of every topic
+                self._queue.extend(self._advertised.values())
+                self._last_sent.clear()
+                if self.coalesce:
+                    self._latest.update(self._last_published)
+                else:
+                    self._queue.extend(self._last_published.values())
+                self._next_flush = 0.0
+            self.ws = ws
+            self.state = "connected"
+            self._sender = threading.Thread(target=self._send_loop, args=(session, ws),
+                                            name="rosbridge-sender", daemon=True)
+            self._sender.start()
+            self._cond.notify_all()
+        return True
+
+    def _connection_lost(self, session, error):
+        """Called by the sender thread when a send fails."""
+        with self._cond:
+            if session != self._session:
+                return
             self.ws = None
-            print(f"Failed to connect to rosbridge at {self.ws_url}: {e}")
-            return False
+            self.last_error = str(error)
+            self._queue.clear()
+            if not self.auto_reconnect:
+                self.state = "failed"
+                self._clear_pending()
+                self._cond.notify_all()
+                return
+            self.state = "reconnecting"
+            self._cond.notify_all()
+        self._log("send", f"Connection to rosbridge lost: {error}")
+        threading.Thread(target=self._reconnect_loop, args=(session, time.perf_counter()),
+                         name="rosbridge-reconnect", daemon=True).start()
 
-    def disconnect(self):
-        if self.ws:
+    def _reconnect_loop(self, session, lost_at):
+        """
+        Retry with backoff until connected or the session ends. lost_at:
+        when the connection dropped, None if it never came up.
+        """
+        delay = self.backoff_initial
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: session != self._session, delay):
+                    return
             try:
-                self.ws.close()
+                ws = websocket.create_connection(self.ws_url, timeout=self.connect_timeout)
+            except Exception as e:
+                with self._cond:
+                    if session == self._session:
+                        self.last_error = str(e)
+                self._log("reconnect", f"Reconnect to rosbridge at {self.ws_url} failed, "
+                                       f"retrying in {min(delay * 2, self.backoff_max):.1f} s: {e}")
+                delay = min(delay * 2, self.backoff_max)
+                continue
+            if self._attach(session, ws, replay=True):
+                if lost_at is None:
+                    print(f"Connected to rosbridge via websocket at {self.ws_url}")
+                    return
+                outage = time.perf_counter() - lost_at
+                with self._cond:
+                    self.reconnects += 1
+                    self.reconnect_times.append(outage)
+                print(f"Reconnected to rosbridge at {self.ws_url} after {outage:.1f} s")
+            return
+
+    def _log(self, kind, message):
+        """Print `message` at most once per log_interval for each error kind."""
+        now = time.monotonic()
+        last, repeats = self._log_times.get(kind, (None, 0))
+        if last is not None and now - last < self.log_interval:
+            self._log_times[kind] = (last, repeats + 1)
+            return
+        if repeats:
+            message += f" (repeated {repeats} times)"
+        self._log_times[kind] = (now, 0)
+        print(message)
+
+    def disconnect(self, flush_timeout=0.5):
+        """Close the connection, first giving queued messages `flush_timeout` s to go out."""
+        with self._cond:
+            ws, sender = self.ws, self._sender
+            if ws is not None and self.pending():
+                self._next_flush = 0.0
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: not self.pending(), flush_timeout)
+            self._session += 1
+            self.ws = None
+            self._sender = None
+            self.state = "disconnected"
+            self._clear_pending()
+            self._advertised.clear()
+            self._last_published.clear()
+            self._cond.notify_all()
+        if sender is not None and sender is not threading.current_thread():
+            sender.join(self.connect_timeout)
+        if ws:
+            try:
+                ws.close()
                 print("Disconnected from rosbridge.")
             except Exception as e:
                 print(f"Error closing websocket: {e}")
-        self.ws = None
 
-    def advertise_topic(self, topic, msg_type):
-        if not self.ws:
+    def pending(self):
+        """Number of queued, unsent messages."""
+        return len(self._queue) + len(self._latest)
+
+    def _clear_pending(self):
+        self._queue.clear()
+        self._latest.clear()
+        self._last_sent.clear()
+
+    def _enqueue(self, text):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(text)
+            self._cond.notify_all()
+
+    def _store_latest(self, topic, text):
+        with self._cond:
+            latest = self._latest
+            if topic in latest:
+                self.coalesced += 1
+            # the sender only sleeps without a timeout while nothing is pending
+            wake = not latest
+            latest[topic] = text
+            if wake:
+                self._cond.notify_all()
+
+    def _take_due(self, now):
+        """Coalesced messages to send now, skipping unchanged payloads."""
+        due = []
+        for topic, text in self._latest.items():
+            last = self._last_sent.get(topic)
+            if last is not None and last[0] == text and now - last[1] < self.keepalive:
+                self.suppressed += 1
+                continue
+            self._last_sent[topic] = (text, now)
+            due.append(text)
+        self._latest.clear()
+        self._next_flush = now + self.flush_period
+        return due
+
+    def _next_batch(self, session):
+        """
+        Wait for the next messages to send: queued messages first (in
+        order, one at a time), then a flush of the coalesced topics.
+        Returns (texts, from_queue) or None when the session ended.
+        """
+        with self._cond:
+            while session == self._session:
+                if self._queue:
+                    return [self._queue[0]], True
+                timeout = None
+                if self._latest:
+                    now = time.perf_counter()
+                    if now >= self._next_flush:
+                        due = self._take_due(now)
+                        if due:
+                            return due, False
+                        self._cond.notify_all()
+                        continue
+                    timeout = self._next_flush - now
+                self._cond.wait(timeout)
+            return None
+
+    def _send_loop(self, session, ws):
+        while True:
+            batch = self._next_batch(session)
+            if batch is None:
+                return
+            texts, from_queue = batch
+            try:
+                for text in texts:
+                    ws.send(text)
+            except Exception as e:
+                self._connection_lost(session, e)
+                return
+            with self._cond:
+                # dequeue only after the send so disconnect() can flush
+                if from_queue and self._queue and self._queue[0] is texts[0]:
+                    self._queue.popleft()
+                self.sent += len(texts)
+                self._cond.notify_all()
+
+    def advertise_topic(self, topic, msg_type, template=None, field="data"):
+        """
+        Advertise `topic`. With `template` (the static message body), the
+        publish envelope is encoded once here and publish_data() only
+        encodes the `field` value.
+        """
+        if template is not None:
+            self.templates[topic] = MessageTemplate(self.encoder, topic, template, field)
+        if self.state not in ("connecting", "connected", "reconnecting"):
             return
         advertise_msg = {
             "op": "advertise",
             "topic": topic,
             "type": msg_type
         }
-        try:
-            self.ws.send(json.dumps(advertise_msg))
-            # print(f"Advertised topic {topic} with type {msg_type}")
-        except Exception as e:
-            print(f"Failed to advertise topic {topic}: {e}")
+        text = self.encoder.encode(advertise_msg)
+        self._advertised[topic] = text
+        if self.state != "reconnecting":
+            self._enqueue(text)
+        # print(f"Advertised topic {topic} with type {msg_type}")
 
+    @profiled("ws.publish")
     def publish(self, topic, msg):
-        if not self.ws:
-            print("Websocket connection not established.")
+        """
+        Hand a message to the sender thread; never blocks on the network.
+        With coalescing only the newest message per topic is kept until the
+        next flush.
+        """
+        if self.state not in ("connecting", "connected", "reconnecting"):
+            self._log("publish", "Websocket connection not established.")
             return
         publish_msg = {
             "op": "publish",
             "topic": topic,
             "msg": msg
         }
-        try:
-            self.ws.send(json.dumps(publish_msg))
-            # print(f"Published to {topic}")
-        except Exception as e:
-            print(f"Failed to publish on {topic}: {e}")
+        self._publish_text(topic, self.encoder.encode(publish_msg))
+        # print(f"Published to {topic}")
+
+    @profiled("ws.publish_data")
+    def publish_data(self, topic, data):
+        """
+        Publish only the data field of a topic advertised with a template.
+        Falls back to publish(topic, {"data": data}) without one.
+        """
+        template = self.templates.get(topic)
+        if template is None:
+            self.publish(topic, {"data": data})
+            return
+        if self.state not in ("connecting", "connected", "reconnecting"):
+            self._log("publish", "Websocket connection not established.")
+            return
+        self._publish_text(topic, template.render(data))
+
+    def _publish_text(self, topic, text):
+        self._last_published[topic] = text
+        if self.state == "reconnecting":
+            # nothing to send to; the latest message is replayed on reconnect
+            return
+        if self.coalesce:
+            self._store_latest(topic, text)
+        else:
+            self._enqueue(text)